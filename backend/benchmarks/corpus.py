@@ -0,0 +1,107 @@
+"""Воспроизводимый корпус запросов и планов для бенчмарков"""
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+TABLES = [f"table_{i}" for i in range(200)]
+
+
+@dataclass
+class BenchQuery:
+    category: str
+    sql: str
+    plan: Dict[str, Any] = field(default_factory=dict)
+
+
+def _scan(rng: random.Random, table: str) -> Dict[str, Any]:
+    node_type = rng.choice(["Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan"])
+    node = {
+        "Node Type": node_type,
+        "Relation Name": table,
+        "Alias": table,
+        "Plan Rows": rng.randint(1, 500_000),
+        "Total Cost": round(rng.uniform(1, 50_000), 2),
+    }
+    if node_type == "Seq Scan":
+        node["Filter"] = f"(status = 'active'::text)"
+    return node
+
+
+def _join_plan(rng: random.Random, tables: List[str]) -> Dict[str, Any]:
+    """Левостороннее дерево соединений над сканами tables"""
+    node = _scan(rng, tables[0])
+    for table in tables[1:]:
+        node = {
+            "Node Type": rng.choice(["Hash Join", "Merge Join", "Nested Loop"]),
+            "Plan Rows": rng.randint(1, 1_000_000),
+            "Total Cost": round(node["Total Cost"] + rng.uniform(10, 100_000), 2),
+            "Plans": [node, {"Node Type": "Hash", "Plan Rows": 1000, "Total Cost": 10.0, "Plans": [_scan(rng, table)]}],
+        }
+    return {"Plan": node}
+
+
+def short_oltp(rng: random.Random) -> BenchQuery:
+    table = rng.choice(TABLES)
+    sql = f"SELECT id, name, status FROM {table} WHERE id = {rng.randint(1, 10**6)}"
+    return BenchQuery("short_oltp", sql, {"Plan": _scan(rng, table)})
+
+
+def join_report(rng: random.Random, joins: int = 20) -> BenchQuery:
+    tables = rng.sample(TABLES, joins + 1)
+    lines = [f"SELECT t0.id, t0.created_at, count(*) AS total", f"FROM {tables[0]} t0"]
+    for i, table in enumerate(tables[1:], start=1):
+        lines.append(f"LEFT JOIN {table} t{i} ON t{i}.parent_id = t{i - 1}.id")
+    lines.append("WHERE t0.created_at >= '2024-01-01' AND t0.status = 'active'")
+    lines.append("GROUP BY t0.id, t0.created_at ORDER BY total DESC")
+    return BenchQuery("join_report", "\n".join(lines), _join_plan(rng, tables))
+
+
+def orm_generated(rng: random.Random, target_bytes: int = 2_000_000) -> BenchQuery:
+    """Запрос в стиле ORM: длинный список колонок и огромный IN по идентификаторам"""
+    table = rng.choice(TABLES)
+    columns = ", ".join(f'"{table}"."column_{i}" AS "{table}_column_{i}"' for i in range(200))
+    ids = []
+    size = len(columns)
+    while size < target_bytes:
+        value = str(rng.randint(1, 10**9))
+        ids.append(value)
+        size += len(value) + 2
+    sql = f'SELECT {columns} FROM "{table}" WHERE "{table}"."id" IN ({", ".join(ids)})'
+    return BenchQuery("orm_generated", sql, {"Plan": _scan(rng, table)})
+
+
+def n_plus_one_script(rng: random.Random, statements: int = 200) -> BenchQuery:
+    table = rng.choice(TABLES)
+    sql = ";\n".join(f"SELECT * FROM {table} WHERE id = {rng.randint(1, 10**6)}" for _ in range(statements)) + ";"
+    return BenchQuery("n_plus_one", sql, {"Plan": _scan(rng, table)})
+
+
+def build_corpus(seed: int = 42, scale: float = 1.0) -> Dict[str, List[BenchQuery]]:
+    rng = random.Random(seed)
+    return {
+        "short_oltp": [short_oltp(rng) for _ in range(max(1, int(200 * scale)))],
+        "join_report": [join_report(rng) for _ in range(max(1, int(30 * scale)))],
+        "orm_generated": [orm_generated(rng, int(2_000_000 * scale)) for _ in range(2)],
+        "n_plus_one": [n_plus_one_script(rng) for _ in range(max(1, int(20 * scale)))],
+    }
+
+
+def catalog_rows(relations: int = 2000, seed: int = 42) -> Dict[str, List[tuple]]:
+    """Строки системных представлений для подставного соединения"""
+    rng = random.Random(seed)
+    names = [f"table_{i}" for i in range(relations)]
+    return {
+        "pg_settings": [(f"setting_{i}", str(i), None, "user") for i in range(350)],
+        "pg_stat_user_tables": [
+            ("public", name, rng.randint(0, 10**7), rng.randint(0, 10**5), rng.randint(0, 10**5),
+             None, None, "10 MB", "8 MB")
+            for name in names
+        ],
+        "pg_stat_user_indexes": [
+            ("public", name, f"{name}_pkey", rng.randint(0, 10**6), 0, 0, "2 MB", ["id"]) for name in names
+        ],
+        "pg_stat_activity": [
+            (1000 + i, "app", "service", "10.0.0.1", None, "active", "SELECT 1") for i in range(50)
+        ],
+        "pg_statio_user_tables": [("public", name, 1, 2, 3, 4) for name in names],
+    }
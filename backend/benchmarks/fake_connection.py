@@ -0,0 +1,79 @@
+"""Подставное соединение: записанные планы EXPLAIN и строки каталога без Postgres"""
+import asyncio
+import re
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from core.analysis.fingerprint import fingerprint
+
+_EXPLAIN_RE = re.compile(r"^\s*EXPLAIN\s*\([^)]*\)\s*", re.IGNORECASE)
+_CATALOG_RE = re.compile(r"FROM\s+(pg_\w+)", re.IGNORECASE)
+
+
+class FakeCursor:
+    def __init__(self, connection: "FakeConnection"):
+        self._connection = connection
+        self._rows: List[tuple] = []
+
+    async def __aenter__(self) -> "FakeCursor":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        return None
+
+    async def execute(self, query: str, params: Optional[Dict[str, Any]] = None, prepare: Optional[bool] = None) -> None:
+        if self._connection.latency:
+            await asyncio.sleep(self._connection.latency)
+
+        explain = _EXPLAIN_RE.match(query)
+        if explain:
+            plan = self._connection.plans.get(fingerprint(query[explain.end():]), {"Plan": {}})
+            self._rows = [([plan],)]
+            return
+
+        catalog = _CATALOG_RE.search(query)
+        rows = self._connection.catalog.get(catalog.group(1), []) if catalog else []
+        relations = (params or {}).get("relations")
+        if relations is not None:
+            wanted = set(relations)
+            rows = [row for row in rows if row[1] in wanted]
+        self._rows = rows
+
+    async def fetchone(self) -> Optional[tuple]:
+        return self._rows[0] if self._rows else None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in self._rows:
+            yield row
+
+
+class FakeInfo:
+    server_version = 160000  # EXPLAIN (GENERIC_PLAN) для запросов с параметрами
+
+
+class FakeConnection:
+    def __init__(self, plans: Dict[str, Dict[str, Any]], catalog: Dict[str, List[tuple]], latency: float = 0.0):
+        self.plans = plans
+        self.catalog = catalog
+        self.latency = latency  # имитация сетевой задержки на запрос, сек
+        self.info = FakeInfo()
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self)
+
+    async def rollback(self) -> None:
+        return None
+
+
+class FakePool:
+    """Замена AsyncConnectionPool: каждое соединение - одно и то же подставное"""
+
+    def __init__(self, connection: FakeConnection):
+        self._connection = connection
+
+    @asynccontextmanager
+    async def connection(self):
+        yield self._connection
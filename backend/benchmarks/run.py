@@ -0,0 +1,270 @@
+"""
+Бенчмарки конвейера анализа: разбор запроса, индекс плана, каждое правило,
+analyze_with_rules, загрузка контекста, analyze_one и analyze_many.
+Postgres не нужен - используются записанные планы и подставное соединение.
+benchmarks/baseline.json снят с параметрами по умолчанию; сравнение падает и на
+стадиях, которые завершились ошибкой или которых нет в базе, - после добавления
+стадий или смены машины базу нужно пересохранить.
+
+    cd backend
+    python -m benchmarks.run --save benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.25
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from sqlparse.exceptions import SQLParseError  # noqa: E402
+
+from benchmarks.corpus import BenchQuery, build_corpus, catalog_rows  # noqa: E402
+from benchmarks.fake_connection import FakeConnection, FakePool  # noqa: E402
+from core.analysis.analyzer import SQLAnalyzer  # noqa: E402
+from core.analysis.context import get_database_context  # noqa: E402
+from core.analysis.fingerprint import fingerprint  # noqa: E402
+from core.analysis.plan_cache import PlanCache  # noqa: E402
+from core.analysis.plan_index import PlanIndex  # noqa: E402
+from core.analysis.query import ParsedQuery  # noqa: E402
+from core.analysis.rules import registry  # noqa: E402
+from core.analysis.rules.analyze_with_rules import analyze_with_rules  # noqa: E402
+from core.analysis.rules.triggers import rule_name  # noqa: E402
+from core.models.lint_request import LintRequests  # noqa: E402
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples: List[float], items: int, failures: int = 0) -> Dict[str, float]:
+    total = sum(samples)
+    return {
+        "samples": len(samples),
+        "failures": failures,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "throughput": items / total if total > 0 else 0.0,
+    }
+
+
+def prepared_query(sql: str, strict: bool = False) -> ParsedQuery:
+    """
+    Разобранный запрос с прогретыми представлениями - чтобы мерить только само правило.
+    Слишком длинный для sqlparse запрос без strict остаётся неразобранным: правило
+    упрётся в тот же предел, это и меряется
+    """
+    query = ParsedQuery(sql)
+    error = None
+    for attr in ("statements", "tokens", "keywords", "token_types", "upper_text", "normalized", "statement_texts"):
+        try:
+            getattr(query, attr)
+        except SQLParseError as e:
+            error = e
+    if error is not None and strict:
+        raise error
+    return query
+
+
+def timed(func: Callable[[], Any]) -> Tuple[float, bool]:
+    """
+    Время вызова и упал ли он на пределе sqlparse. В анализаторе такая ошибка
+    не роняет запрос - правило просто пропускается, - поэтому время до отказа
+    тоже замеряется, а число отказов сравнивается с базой
+    """
+    started = time.perf_counter()
+    try:
+        func()
+    except SQLParseError:
+        return time.perf_counter() - started, True
+    return time.perf_counter() - started, False
+
+
+def bench(
+    queries: List[BenchQuery],
+    func: Callable[[BenchQuery, Any], Any],
+    repeat: int,
+    setup: Optional[Callable[[BenchQuery], Any]] = None
+) -> Dict[str, float]:
+    samples = []
+    failures = 0
+    for _ in range(repeat):
+        for item in queries:
+            prepared = setup(item) if setup else None
+            elapsed, failed = timed(lambda: func(item, prepared))
+            samples.append(elapsed)
+            failures += failed
+    return summarize(samples, len(samples), failures)
+
+
+async def bench_async(queries: List[BenchQuery], func, repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        for item in queries:
+            started = time.perf_counter()
+            await func(item)
+            samples.append(time.perf_counter() - started)
+    return summarize(samples, len(samples))
+
+
+async def record(results: Dict[str, Dict[str, Any]], stage: str, measurement) -> None:
+    """Результат стадии; если стадия падает, записываем ошибку вместо замеров"""
+    try:
+        results[stage] = await measurement if asyncio.iscoroutine(measurement) else measurement()
+    except Exception as e:
+        print(f"  {stage} failed: {e}", file=sys.stderr)
+        results[stage] = {"error": f"{type(e).__name__}: {e}"}
+
+
+async def run_benchmarks(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    corpus = build_corpus(seed=args.seed, scale=args.scale)
+    plans = {fingerprint(q.sql): q.plan for queries in corpus.values() for q in queries}
+    connection = FakeConnection(plans, catalog_rows(args.relations, seed=args.seed), latency=args.latency)
+
+    # Кэш планов выключен: меряем полный путь EXPLAIN -> правила
+    analyzer = SQLAnalyzer(pool=FakePool(connection), plan_cache=PlanCache(0))  # type: ignore
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for category, queries in corpus.items():
+        repeat = 1 if category == "orm_generated" else args.repeat
+        print(f"  {category}: {len(queries)} queries x {repeat}", file=sys.stderr)
+
+        await record(results, f"{category}/parse",
+                     lambda: bench(queries, lambda q, _: prepared_query(q.sql, strict=True), repeat))
+        await record(results, f"{category}/plan_index",
+                     lambda: bench(queries, lambda q, _: PlanIndex(q.plan), repeat))
+
+        plans_index = {id(q): PlanIndex(q.plan) for q in queries}
+        for rule_func in registry.rules:
+            await record(results, f"{category}/rule:{rule_name(rule_func)}", lambda rule_func=rule_func: bench(
+                queries,
+                lambda q, query: rule_func(query, plans_index[id(q)], {}),
+                repeat,
+                setup=lambda q: prepared_query(q.sql)
+            ))
+
+        await record(results, f"{category}/analyze_with_rules",
+                     lambda: bench(queries, lambda q, _: analyze_with_rules(q.sql, q.plan, {}), repeat))
+        await record(results, f"{category}/analyze_one",
+                     bench_async(queries, lambda q: analyzer._analyze(q.sql, connection), repeat))  # type: ignore
+
+    await record(results, "context/get_database_context", bench_async(
+        [BenchQuery("context", "")], lambda _: get_database_context(connection), args.repeat * 4  # type: ignore
+    ))
+
+    bulk = [q.sql for q in corpus["short_oltp"]]
+    started = time.perf_counter()
+    await analyzer.analyze_many(LintRequests(sql_query=bulk))
+    elapsed = time.perf_counter() - started
+    results["bulk/analyze_many"] = {
+        "samples": 1,
+        "p50_ms": elapsed * 1000,
+        "p95_ms": elapsed * 1000,
+        "p99_ms": elapsed * 1000,
+        "throughput": len(bulk) / elapsed,
+    }
+    return results
+
+
+def compare(
+    current: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    metric: str,
+    threshold: float,
+    min_delta_ms: float
+) -> List[str]:
+    """
+    Стадии, у которых metric вырос больше чем на threshold (и больше чем на min_delta_ms)
+    или стало больше отказов. Упавшая стадия и стадия без пары в базе - тоже регрессия:
+    иначе она молча выпадает из проверки
+    """
+    regressions = []
+    for stage in baseline.keys() - current.keys():
+        regressions.append(f"{stage}: missing from the current run")
+    for stage, stats in current.items():
+        if "error" in stats:
+            regressions.append(f"{stage}: fails ({stats['error']})")
+            continue
+        if stage not in baseline:
+            regressions.append(f"{stage}: not in the baseline, save a new one")
+            continue
+        if "error" in baseline[stage]:
+            regressions.append(f"{stage}: failed in the baseline ({baseline[stage]['error']}), save a new one")
+            continue
+        if stats.get("failures", 0) > baseline[stage].get("failures", 0):
+            regressions.append(
+                f"{stage}: {stats['failures']} failed calls, baseline {baseline[stage].get('failures', 0)}"
+            )
+        before, after = baseline[stage][metric], stats[metric]
+        if after - before > min_delta_ms and after > before * (1 + threshold):
+            regressions.append(f"{stage}: {metric} {before:.3f}ms -> {after:.3f}ms (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_report(results: Dict[str, Dict[str, Any]]) -> None:
+    width = max(len(stage) for stage in results)
+    print(f"{'stage':<{width}}  {'p50 ms':>10}  {'p95 ms':>10}  {'p99 ms':>10}  {'items/s':>10}")
+    for stage, stats in results.items():
+        if "error" in stats:
+            print(f"{stage:<{width}}  failed: {stats['error']}")
+            continue
+        failures = f"  ({stats['failures']} failed)" if stats.get("failures") else ""
+        print(f"{stage:<{width}}  {stats['p50_ms']:>10.3f}  {stats['p95_ms']:>10.3f}  "
+              f"{stats['p99_ms']:>10.3f}  {stats['throughput']:>10.1f}{failures}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Analyzer pipeline benchmarks")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", type=float, default=1.0, help="corpus size multiplier")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the corpus per stage")
+    parser.add_argument("--relations", type=int, default=2000, help="tables in the fake catalog")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake round-trip latency, seconds")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--baseline", help="compare against a saved baseline")
+    parser.add_argument("--metric", choices=["p50_ms", "p95_ms", "p99_ms"], default="p50_ms")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore smaller absolute slowdowns")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmarks(args))
+    print_report(results)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({
+            "meta": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "seed": args.seed,
+                "scale": args.scale,
+            },
+            "results": results,
+        }, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["results"]
+        regressions = compare(results, baseline, args.metric, args.threshold, args.min_delta_ms)
+        if regressions:
+            print("\nRegressions:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
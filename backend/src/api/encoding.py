@@ -0,0 +1,145 @@
+from typing import Any, Dict, List, Optional, Union
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, TypeAdapter
+
+from core.models.analysis_result import AnalysisResult
+
+try:
+    import msgpack
+except ImportError:  # необязательная зависимость: pip install backend[msgpack]
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+COLUMNAR_JSON = "application/vnd.sql-analysis.columnar+json"
+COLUMNAR_MSGPACK = "application/vnd.sql-analysis.columnar+msgpack"
+
+_ALIASES = {"application/x-msgpack": MSGPACK}
+_COLUMNAR = {COLUMNAR_JSON, COLUMNAR_MSGPACK}
+
+_results_adapter = TypeAdapter(List[AnalysisResult])
+_columnar_adapter = TypeAdapter(Dict[str, Any])
+
+Content = Union[BaseModel, List[AnalysisResult]]
+
+
+def _supported(columnar: bool) -> List[str]:
+    types = [JSON, COLUMNAR_JSON] if columnar else [JSON]
+    if msgpack is not None:
+        types += [MSGPACK, COLUMNAR_MSGPACK] if columnar else [MSGPACK]
+    return types
+
+
+def negotiate(accept: Optional[str], columnar: bool = True) -> str:
+    """
+    Формат ответа по заголовку Accept с учётом q. Без заголовка или с */* -
+    обычный JSON. columnar=False - эндпоинт отдаёт не список результатов
+    """
+    supported = _supported(columnar)
+    if not accept:
+        return JSON
+
+    ranges = []
+    for position, item in enumerate(accept.split(",")):
+        media_range, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranges.append((-quality, position, _ALIASES.get(media_range.lower(), media_range.lower())))
+
+    for _, _, media_range in sorted(ranges):
+        if media_range in ("*/*", "application/*"):
+            return JSON
+        if media_range in supported:
+            return media_range
+    raise HTTPException(
+        status_code=406,
+        detail=f"Supported response types: {', '.join(supported)}"
+    )
+
+
+def to_columnar(results: List[AnalysisResult]) -> Dict[str, Any]:
+    """
+    Колоночная форма списка результатов: повторяющиеся строки (сообщения,
+    рекомендации, переписанные запросы) хранятся один раз в strings,
+    в колонках - их номера. Диагностики всех результатов лежат в общих колонках,
+    result - номер результата. rules_trace и comparison есть, только если запрошены.
+    """
+    strings: List[str] = []
+    ids: Dict[str, int] = {}
+
+    def intern(value: Optional[str]) -> Optional[int]:
+        if value is None:
+            return None
+        index = ids.get(value)
+        if index is None:
+            index = ids[value] = len(strings)
+            strings.append(value)
+        return index
+
+    diagnoses: Dict[str, List[Any]] = {
+        "result": [], "line": [], "col": [], "severity": [], "message": [], "recommendation": [], "rule": []
+    }
+    for index, result in enumerate(results):
+        for diagnose in result.lint_diagnoses:
+            diagnoses["result"].append(index)
+            diagnoses["line"].append(diagnose.line)
+            diagnoses["col"].append(diagnose.col)
+            diagnoses["severity"].append(intern(diagnose.severity))
+            diagnoses["message"].append(intern(diagnose.message))
+            diagnoses["recommendation"].append(intern(diagnose.recommendation))
+            diagnoses["rule"].append(intern(diagnose.rule))
+
+    columns: Dict[str, List[Any]] = {
+        "summary_recommendation": [intern(result.summary_recommendation) for result in results],
+        "error": [intern(result.error) for result in results],
+    }
+    if any(result.rules_trace is not None for result in results):
+        columns["rules_trace"] = [
+            [trace.model_dump(mode="json") for trace in result.rules_trace] if result.rules_trace is not None else None
+            for result in results
+        ]
+    if any(result.comparison is not None for result in results):
+        columns["comparison"] = [
+            result.comparison.model_dump(mode="json") if result.comparison is not None else None
+            for result in results
+        ]
+
+    return {"format": "columnar", "version": 1, "count": len(results), "strings": strings,
+            "results": columns, "diagnoses": diagnoses}
+
+
+def render(content: Content, media_type: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Ответ в выбранном формате. Модели сериализуются pydantic напрямую в байты,
+    без jsonable_encoder и повторной проверки по response_model
+    """
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if media_type in _COLUMNAR:
+        results = content if isinstance(content, list) else [content]
+        columnar = to_columnar(results)  # type: ignore
+        body = (
+            _columnar_adapter.dump_json(columnar) if media_type == COLUMNAR_JSON
+            else msgpack.packb(columnar)  # type: ignore
+        )
+        return Response(body, media_type=media_type, headers=headers)
+
+    if media_type == MSGPACK:
+        data = (
+            content.model_dump(mode="json") if isinstance(content, BaseModel)
+            else _results_adapter.dump_python(content, mode="json")
+        )
+        return Response(msgpack.packb(data), media_type=media_type, headers=headers)  # type: ignore
+
+    body = (
+        content.model_dump_json().encode() if isinstance(content, BaseModel)
+        else _results_adapter.dump_json(content)
+    )
+    return Response(body, media_type=JSON, headers=headers)
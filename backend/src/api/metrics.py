@@ -0,0 +1,11 @@
+from core.metrics import metrics as registry
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+
+metrics = APIRouter()
+
+
+@metrics.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
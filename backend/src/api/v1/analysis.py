@@ -1,29 +1,206 @@
-from core.analysis.analyzer import analyzer
+from typing import AsyncIterator, Dict, List, Literal, Optional
+
+from api.encoding import negotiate, render
+from core.analysis.plan_baseline import plan_baselines
+from core.analysis.result_store import result_store
+from core.analysis.workload import analyze_workload, read_pg_stat_statements, read_statements_csv
+from core.models.analysis_result import AnalysisResult
+from core.models.index_advice import BulkIndexAdvice
 from core.models.lint_request import LintRequest, LintRequests
-from core.pool import get_conn
-from fastapi import APIRouter, Depends
+from core.models.plan_regression import PlanRegressionReport
+from core.models.workload import WorkloadReport
+from core.targets import Target, get_conn, get_target
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
 
 
 analysis = APIRouter(prefix="/analysis")
 
 
-@analysis.post("/", status_code=200)
+@analysis.post("/", status_code=200, response_model=AnalysisResult)
 async def analyse_single_query(
     lint_request: LintRequest,
+    trace: bool = False,
+    compare: bool = False,
+    accept: Optional[str] = Header(None),
+    target: Target = Depends(get_target),
     conn=Depends(get_conn)
 ):
-    return await analyzer.analyze_one(
+    """
+    compare=true - замерить исходный и переписанный запрос через EXPLAIN (ANALYZE, BUFFERS)
+    в откатываемой транзакции; более медленный переписанный запрос не рекомендуется.
+    Формат ответа выбирается заголовком Accept: JSON (по умолчанию), MessagePack
+    или колоночный (application/vnd.sql-analysis.columnar+json|msgpack)
+    """
+    media_type = negotiate(accept)
+    result = await target.analyzer.analyze_one(
         lint_request, 
-        conn
+        conn,
+        trace,
+        compare
     )
+    return render(result, media_type)
 
 
-@analysis.post("/bulk", status_code=200)
+@analysis.post("/bulk", status_code=200, response_model=List[AnalysisResult])
 async def analyse_multiple_queries(
     lint_request: LintRequests,
-    conn=Depends(get_conn)
+    trace: bool = False,
+    incremental: bool = True,
+    accept: Optional[str] = Header(None),
+    target: Target = Depends(get_target)
 ):
-    return await analyzer.analyze_many(
+    """
+    Повторяющиеся запросы анализируются один раз; сколько работы сэкономлено,
+    видно в заголовках X-Bulk-*. Если задан RESULT_STORE_PATH, неизменившиеся
+    запросы берутся из хранилища результатов (incremental=false - анализ заново).
+    Формат ответа - как у одиночного анализа
+    """
+    media_type = negotiate(accept)
+    stats: Dict[str, float] = {}
+    if result_store is not None and incremental:
+        results = await target.analyzer.analyze_incremental(
+            lint_request, result_store, namespace=target.name, trace=trace, stats=stats
+        )
+    else:
+        results = await target.analyzer.analyze_many(lint_request, trace, stats=stats)
+    headers = {
+        "X-Bulk-Queries": str(stats["queries"]),
+        "X-Bulk-Distinct-Queries": str(stats["distinct_queries"]),
+        "X-Bulk-Distinct-Fingerprints": str(stats["distinct_fingerprints"]),
+        "X-Bulk-Dedup-Ratio": f"{stats['dedup_ratio']:.2f}",
+    }
+    if "store_hits" in stats:
+        headers["X-Bulk-Store-Hits"] = str(stats["store_hits"])
+        headers["X-Bulk-Store-Misses"] = str(stats["store_misses"])
+    return render(results, media_type, headers)
+
+
+@analysis.post("/bulk/indexes", status_code=200, response_model=BulkIndexAdvice)
+async def advise_bulk_indexes(
+    lint_request: LintRequests,
+    trace: bool = False,
+    limit: int = Query(20, ge=1, le=200),
+    accept: Optional[str] = Header(None),
+    target: Target = Depends(get_target)
+):
+    """
+    Bulk-анализ со сводными рекомендациями по индексам: похожие кандидаты
+    объединяются, уже покрытые существующими индексами отбрасываются
+    """
+    media_type = negotiate(accept, columnar=False)
+    return render(await target.analyzer.advise_indexes(lint_request, trace, limit), media_type)
+
+
+@analysis.post("/bulk/regressions", status_code=200, response_model=PlanRegressionReport)
+async def check_bulk_plan_regressions(
+    lint_request: LintRequests,
+    trace: bool = False,
+    update_baseline: bool = False,
+    cost_ratio: Optional[float] = Query(None, gt=1.0),
+    accept: Optional[str] = Header(None),
+    target: Target = Depends(get_target)
+):
+    """
+    Bulk-анализ и сравнение планов с базой из PLAN_BASELINE_PATH: регрессии - рост
+    стоимости больше cost_ratio раз и ухудшение сканирований или соединений.
+    update_baseline=true записывает текущие планы как новую базу
+    """
+    if plan_baselines is None:
+        raise HTTPException(status_code=409, detail="Plan baselines are not configured (PLAN_BASELINE_PATH)")
+    media_type = negotiate(accept, columnar=False)
+    report = await target.analyzer.check_plan_regressions(
         lint_request,
-        conn
+        plan_baselines,
+        namespace=target.name,
+        trace=trace,
+        cost_ratio=cost_ratio,
+        update_baseline=update_baseline,
+        store=result_store
     )
+    return render(report, media_type, {"X-Plan-Regressions": str(len(report.regressions))})
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse без фонового ожидания disconnect: тело запроса читается
+    одновременно с отправкой ответа, и слушатель disconnect забирал бы его куски
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+async def _read_lines(request: Request) -> AsyncIterator[str]:
+    """Строки тела запроса по мере поступления (в т.ч. chunked upload)"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buffer:
+        yield buffer.decode("utf-8")
+
+
+@analysis.post("/bulk/stream", status_code=200)
+async def analyse_query_stream(
+    request: Request,
+    trace: bool = False,
+    target: Target = Depends(get_target)
+):
+    """
+    Принимает NDJSON (по объекту {"sql_query": ..., "request_id": ...} на строку)
+    и отдаёт NDJSON с результатом на каждую строку по мере готовности
+    """
+    async def encode() -> AsyncIterator[str]:
+        # Ответ отдаётся после выхода из зависимостей - держим цель занятой до конца потока
+        with target.in_use():
+            async for result in target.analyzer.analyze_stream(_read_lines(request), trace):
+                yield result.model_dump_json() + "\n"
+
+    return _DuplexStreamingResponse(encode(), media_type="application/x-ndjson")
+
+
+@analysis.post("/workload", status_code=200, response_model=WorkloadReport)
+async def analyse_workload(
+    order_by: Literal["total", "mean"] = "total",
+    limit: int = Query(50, ge=1, le=1000),
+    accept: Optional[str] = Header(None),
+    target: Target = Depends(get_target)
+):
+    """
+    Анализ самых затратных запросов из pg_stat_statements целевой БД;
+    диагностики ранжируются по времени затронутых запросов
+    """
+    media_type = negotiate(accept, columnar=False)
+    async with target.pool.connection() as conn:
+        try:
+            statements, workload_time = await read_pg_stat_statements(conn, order_by, limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return render(await analyze_workload(target.analyzer, statements, workload_time, order_by), media_type)
+
+
+@analysis.post("/workload/csv", status_code=200, response_model=WorkloadReport)
+async def analyse_workload_csv(
+    request: Request,
+    order_by: Literal["total", "mean"] = "total",
+    limit: int = Query(50, ge=1, le=1000),
+    accept: Optional[str] = Header(None),
+    target: Target = Depends(get_target)
+):
+    """То же по CSV-выгрузке pg_stat_statements в теле запроса"""
+    media_type = negotiate(accept, columnar=False)
+    try:
+        text = (await request.body()).decode("utf-8")
+        statements, workload_time = read_statements_csv(text, order_by, limit)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return render(await analyze_workload(target.analyzer, statements, workload_time, order_by), media_type)
@@ -0,0 +1,80 @@
+import asyncio
+from typing import Optional
+
+from api.encoding import negotiate, render
+from core.jobs import job_store, jobs as job_runner
+from core.models.job import JobResults, JobStatus
+from core.models.lint_request import LintRequests
+from core.settings import settings
+from core.targets import DEFAULT_TARGET, targets
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+
+
+jobs = APIRouter(prefix="/jobs")
+
+
+async def _get_job(job_id: str) -> JobStatus:
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+
+@jobs.post("/", status_code=202)
+async def submit_job(
+    lint_request: LintRequests,
+    request: Request,
+    response: Response,
+    trace: bool = False,
+    target: Optional[str] = None
+) -> JobStatus:
+    """
+    Пачка запросов анализируется в фоне. Прогресс - GET /jobs/{id},
+    результаты постранично - GET /jobs/{id}/results
+    """
+    target = target or DEFAULT_TARGET
+    if target not in targets.names():
+        raise HTTPException(status_code=404, detail=f"Unknown target database: {target}")
+    if len(lint_request.sql_query) > settings.JOB_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"A job accepts at most {settings.JOB_MAX_QUERIES} queries")
+
+    job = await job_runner.submit(target, lint_request.sql_query, trace)
+    response.headers["Location"] = str(request.url_for("job_status", job_id=job.id))
+    return job
+
+
+@jobs.get("/{job_id}", status_code=200)
+async def job_status(job_id: str) -> JobStatus:
+    return await _get_job(job_id)
+
+
+@jobs.get("/{job_id}/results", status_code=200, response_model=JobResults)
+async def job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    accept: Optional[str] = Header(None)
+):
+    """Результаты по позициям входной пачки; у ещё не проанализированных result = null"""
+    media_type = negotiate(accept, columnar=False)
+    job = await _get_job(job_id)
+    items = await asyncio.to_thread(job_store.results, job_id, offset, limit)
+    return render(JobResults.model_construct(job=job, offset=offset, items=items), media_type)
+
+
+@jobs.post("/{job_id}/cancel", status_code=200)
+async def cancel_job(job_id: str) -> JobStatus:
+    """Готовые результаты сохраняются, задание можно возобновить"""
+    if not await job_runner.cancel(job_id):
+        job = await _get_job(job_id)
+        raise HTTPException(status_code=409, detail=f"Job is {job.state} and cannot be cancelled")
+    return await _get_job(job_id)
+
+
+@jobs.post("/{job_id}/resume", status_code=200)
+async def resume_job(job_id: str) -> JobStatus:
+    """Возобновляет отменённое или упавшее задание с необработанных запросов"""
+    if not await job_runner.resume(job_id):
+        job = await _get_job(job_id)
+        raise HTTPException(status_code=409, detail=f"Job is {job.state} and cannot be resumed")
+    return await _get_job(job_id)
@@ -1,6 +1,10 @@
 from api.v1.analysis import analysis
+from api.v1.jobs import jobs
+from api.v1.status import status
 from fastapi import APIRouter
 
 v1 = APIRouter(prefix="/v1")
 
 v1.include_router(analysis)
+v1.include_router(status)
+v1.include_router(jobs)
@@ -0,0 +1,43 @@
+import asyncio
+
+from core.analysis.rules import RuleLoadError, registry
+from core.targets import Target, get_target, targets
+from fastapi import APIRouter, Depends, HTTPException
+
+
+status = APIRouter(prefix="/status")
+
+
+@status.get("/context", status_code=200)
+async def context_status(target: Target = Depends(get_target)):
+    return target.context_snapshot.status()
+
+
+@status.get("/plan-cache", status_code=200)
+async def plan_cache_status(target: Target = Depends(get_target)):
+    return target.plan_cache.stats()
+
+
+@status.get("/pool", status_code=200)
+async def pool_status(target: Target = Depends(get_target)):
+    return target.pool.get_stats()
+
+
+@status.get("/targets", status_code=200)
+async def targets_status():
+    return targets.status()
+
+
+@status.get("/rules", status_code=200)
+async def rules_status():
+    return registry.status()
+
+
+@status.post("/rules/reload", status_code=200)
+async def reload_rules():
+    """Перезагрузить изменённые модули правил; при ошибке остаются прежние правила"""
+    try:
+        reloaded = await asyncio.to_thread(registry.reload_changed)
+    except RuleLoadError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"reloaded": reloaded, **registry.status()}
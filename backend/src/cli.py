@@ -0,0 +1,348 @@
+"""
+Пакетный анализ SQL без запуска API (для CI).
+
+    uv run python cli.py queries/ extra.sql batch.jsonl --format sarif -o report.sarif --fail-on HIGH
+
+Офлайн-режим без Postgres: сначала снимок контекста и планов с живой БД,
+затем анализ по снимку.
+
+    uv run python cli.py queries/ --export-snapshot snapshot.db
+    uv run python cli.py queries/ --snapshot snapshot.db
+
+Инкрементальный анализ: результаты неизменившихся запросов берутся из файла
+хранилища, анализируются только новые и изменившиеся.
+
+    uv run python cli.py queries/ --store results.db
+
+Проверка регрессий планов: на основной ветке база метрик планов обновляется,
+на ветках с изменениями планы сравниваются с ней (выход 1 при регрессии).
+
+    uv run python cli.py queries/ --baseline plans.db --update-baseline
+    uv run python cli.py queries/ --baseline plans.db --cost-ratio 3
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from core.analysis.analyzer import SQLAnalyzer
+from core.analysis.fingerprint import fingerprint
+from core.analysis.offline import OfflineSnapshot
+from core.analysis.plan_baseline import PlanBaselineStore
+from core.analysis.result_store import ResultStore
+from core.models.analysis_result import AnalysisResult
+from core.models.lint_request import LintRequests, parse_ndjson_line
+from core.models.plan_regression import PlanRegression, PlanRegressionReport
+from core.pool import pool
+from core.settings import settings
+
+SEVERITY_ORDER = {"LOW": 1, "MEDIUM": 2, "HIGH": 3}
+SARIF_LEVELS = {"LOW": "note", "MEDIUM": "warning", "HIGH": "error"}
+
+
+@dataclass
+class QuerySource:
+    path: str
+    line: int  # строка файла, с которой начинается запрос
+    sql_query: str
+    request_id: Optional[str] = None
+    is_sql_file: bool = True  # позиции диагностик совпадают с позициями в файле
+
+
+def collect_sources(paths: List[str]) -> Iterator[QuerySource]:
+    """Запросы из .sql файлов (файл - один запрос), JSONL файлов и директорий с ними"""
+    for raw_path in paths:
+        path = Path(raw_path)
+        if path.is_dir():
+            files = sorted(p for p in path.rglob("*") if p.suffix in (".sql", ".jsonl"))
+        else:
+            files = [path]
+
+        for file in files:
+            if file.suffix == ".jsonl":
+                yield from _read_jsonl(file)
+                continue
+            text = file.read_text(encoding="utf-8")
+            if text.strip():
+                yield QuerySource(path=str(file), line=1, sql_query=text)
+
+
+def _read_jsonl(file: Path) -> Iterator[QuerySource]:
+    with file.open(encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            lint_request = parse_ndjson_line(line)
+            yield QuerySource(
+                path=str(file),
+                line=line_number,
+                sql_query=lint_request.sql_query,
+                request_id=lint_request.request_id,
+                is_sql_file=False
+            )
+
+
+def _regressions_by_fingerprint(report: Optional[PlanRegressionReport]) -> Dict[str, PlanRegression]:
+    return {regression.fingerprint: regression for regression in report.regressions} if report else {}
+
+
+def write_jsonl(
+    sources: List[QuerySource],
+    results: List[AnalysisResult],
+    out: TextIO,
+    report: Optional[PlanRegressionReport] = None
+) -> None:
+    regressions = _regressions_by_fingerprint(report)
+    for index, (source, result) in enumerate(zip(sources, results)):
+        record = {
+            "index": index,
+            "path": source.path,
+            "line": source.line,
+            "request_id": source.request_id,
+            **result.model_dump(mode="json", exclude_none=True),
+        }
+        regression = regressions.get(fingerprint(source.sql_query)) if regressions else None
+        if regression is not None:
+            record["plan_changes"] = [change.model_dump(mode="json", exclude_none=True) for change in regression.changes]
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def write_sarif(
+    sources: List[QuerySource],
+    results: List[AnalysisResult],
+    out: TextIO,
+    report: Optional[PlanRegressionReport] = None
+) -> None:
+    rules: Dict[str, Dict[str, Any]] = {}
+    sarif_results = []
+
+    # Регрессия плана - одна на отпечаток, указывается у первого запроса с ним
+    regressions = _regressions_by_fingerprint(report)
+    for source in sources:
+        regression = regressions.pop(fingerprint(source.sql_query), None) if regressions else None
+        if regression is None:
+            continue
+        rules.setdefault("plan-regression", {"id": "plan-regression"})
+        sarif_results.append({
+            "ruleId": "plan-regression",
+            "level": "error",
+            "message": {"text": "Query plan got worse: " + "; ".join(
+                change.message for change in regression.changes if change.regression
+            )},
+            "locations": [_sarif_location(source, 1, 1)],
+        })
+
+    for source, result in zip(sources, results):
+        if result.error:
+            sarif_results.append({
+                "ruleId": "analysis-error",
+                "level": "error",
+                "message": {"text": f"Query could not be analyzed: {result.error}"},
+                "locations": [_sarif_location(source, 1, 1)],
+            })
+            rules.setdefault("analysis-error", {"id": "analysis-error"})
+            continue
+
+        for diagnose in result.lint_diagnoses:
+            rule_id = diagnose.rule or "unknown"
+            rules.setdefault(rule_id, {"id": rule_id})
+            text = diagnose.message
+            if diagnose.recommendation:
+                text += f". {diagnose.recommendation}"
+            sarif_results.append({
+                "ruleId": rule_id,
+                "level": SARIF_LEVELS.get(diagnose.severity, "warning"),
+                "message": {"text": text},
+                "locations": [_sarif_location(source, diagnose.line, diagnose.col)],
+            })
+
+    sarif = {
+        "version": "2.1.0",
+        "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+        "runs": [{
+            "tool": {"driver": {"name": "sql-linter", "rules": list(rules.values())}},
+            "results": sarif_results,
+        }],
+    }
+    json.dump(sarif, out, ensure_ascii=False, indent=2)
+    out.write("\n")
+
+
+def _sarif_location(source: QuerySource, line: int, col: int) -> Dict[str, Any]:
+    # В JSONL запрос занимает одну строку файла - указываем только её
+    region = {"startLine": line, "startColumn": col} if source.is_sql_file else {"startLine": source.line}
+    return {"physicalLocation": {"artifactLocation": {"uri": source.path}, "region": region}}
+
+
+def exit_code(results: List[AnalysisResult], fail_on: str, report: Optional[PlanRegressionReport] = None) -> int:
+    """
+    2 - есть запросы, которые не удалось проанализировать; 1 - есть диагностики
+    не ниже fail_on или регрессии планов
+    """
+    if any(result.error for result in results):
+        return 2
+    if report is not None and report.regressions:
+        return 1
+    if fail_on == "never":
+        return 0
+    threshold = SEVERITY_ORDER[fail_on]
+    for result in results:
+        for diagnose in result.lint_diagnoses:
+            if SEVERITY_ORDER.get(diagnose.severity, 0) >= threshold:
+                return 1
+    return 0
+
+
+async def export(args: argparse.Namespace) -> int:
+    sources = list(collect_sources(args.paths))
+
+    await pool.open()
+    await pool.wait()
+    try:
+        stats = await SQLAnalyzer().export_snapshot(
+            args.export_snapshot,
+            [source.sql_query for source in sources],
+            concurrency=args.concurrency
+        )
+    finally:
+        await pool.close()
+
+    print(f"Snapshot written to {args.export_snapshot}: {stats['plans']} plans, "
+          f"{stats['failed']} queries failed to EXPLAIN", file=sys.stderr)
+    return 0
+
+
+def _stdout_to_stderr() -> None:
+    """
+    Инициализатор процессов правил: отчёт может писаться в stdout, поэтому
+    вывод правил (в том числе сторонних, через print) уходит в stderr
+    """
+    sys.stdout = sys.stderr
+
+
+async def analyze(
+    args: argparse.Namespace,
+    sources: List[QuerySource]
+) -> Tuple[List[AnalysisResult], Optional[PlanRegressionReport]]:
+    snapshot = OfflineSnapshot.load(args.snapshot) if args.snapshot else None
+    if snapshot is None:
+        await pool.open()
+        await pool.wait()
+    try:
+        # spawn, а не fork: в родительском процессе уже работают цикл событий и потоки пула
+        with ProcessPoolExecutor(
+            max_workers=args.jobs, mp_context=get_context("spawn"), initializer=_stdout_to_stderr
+        ) as executor:
+            cli_analyzer = SQLAnalyzer(rules_executor=executor, snapshot=snapshot)
+            lint_requests = LintRequests(sql_query=[source.sql_query for source in sources])
+            stats: Dict[str, float] = {}
+            store = ResultStore(args.store, settings.RESULT_STORE_MAX_ENTRIES) if args.store else None
+            report = None
+            if args.baseline:
+                report = await cli_analyzer.check_plan_regressions(
+                    lint_requests,
+                    PlanBaselineStore(args.baseline),
+                    concurrency=args.concurrency,
+                    cost_ratio=args.cost_ratio,
+                    update_baseline=args.update_baseline,
+                    store=store,
+                    stats=stats
+                )
+                results = report.results
+            elif store is not None:
+                results = await cli_analyzer.analyze_incremental(
+                    lint_requests, store, concurrency=args.concurrency, stats=stats
+                )
+            else:
+                results = await cli_analyzer.analyze_many(
+                    lint_requests, concurrency=args.concurrency, stats=stats
+                )
+            if store is not None:
+                print(f"{stats['store_hits']} queries unchanged, {stats['store_misses']} analyzed",
+                      file=sys.stderr)
+            print(f"{stats['distinct_fingerprints']} distinct query shapes out of {stats['queries']} "
+                  f"queries (dedup x{stats['dedup_ratio']:.2f})", file=sys.stderr)
+            if report is not None:
+                print(f"{len(report.regressions)} plan regressions in {report.checked} plans with a baseline, "
+                      f"{report.new} without; {report.updated} baselines written", file=sys.stderr)
+                for regression in report.regressions:
+                    print(f"  {regression.sql_query[:80]!r}: " + "; ".join(
+                        change.message for change in regression.changes if change.regression
+                    ), file=sys.stderr)
+            return results, report
+    finally:
+        if snapshot is None:
+            await pool.close()
+        else:
+            snapshot.close()
+
+
+async def run(args: argparse.Namespace) -> int:
+    if args.export_snapshot:
+        return await export(args)
+
+    sources = list(collect_sources(args.paths))
+    started = time.perf_counter()
+    # stdout - только для отчёта: случайный вывод при анализе сломал бы JSONL и SARIF
+    with contextlib.redirect_stdout(sys.stderr):
+        results, report = await analyze(args, sources)
+    elapsed = time.perf_counter() - started
+
+    out = open(args.output, "w", encoding="utf-8") if args.output != "-" else sys.stdout
+    try:
+        if args.format == "sarif":
+            write_sarif(sources, results, out, report)
+        else:
+            write_jsonl(sources, results, out, report)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+    print(f"Analyzed {len(results)} queries in {elapsed:.2f}s ({rate:.1f} q/s)", file=sys.stderr)
+    return exit_code(results, args.fail_on, report)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Batch SQL analysis for CI")
+    parser.add_argument("paths", nargs="+", help=".sql files, .jsonl files or directories")
+    parser.add_argument("--format", choices=["jsonl", "sarif"], default="jsonl")
+    parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    parser.add_argument("--fail-on", choices=["HIGH", "MEDIUM", "LOW", "never"], default="HIGH",
+                        help="exit with 1 if any diagnose has this severity or higher")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="processes for the rule pass")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="concurrent EXPLAIN queries (default: ANALYSIS_CONCURRENCY)")
+    parser.add_argument("--store", metavar="PATH",
+                        help="reuse results of unchanged queries from PATH and store new ones there")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="compare query plans with baselines in PATH, exit with 1 on plan regressions")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="write current plans to --baseline as the new baseline")
+    parser.add_argument("--cost-ratio", type=float, default=None,
+                        help="plan cost growth treated as a regression (default: PLAN_REGRESSION_COST_RATIO)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--snapshot", help="analyze offline against a snapshot file, without a database")
+    mode.add_argument("--export-snapshot", metavar="PATH",
+                      help="write database context and EXPLAIN plans for the inputs to PATH and exit")
+    args = parser.parse_args(argv)
+    if args.update_baseline and not args.baseline:
+        parser.error("--update-baseline requires --baseline")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from psycopg import OperationalError
+from psycopg_pool import PoolTimeout, TooManyRequests
+
+from core.metrics import metrics
+from core.settings import settings
+from utils.logger import logger
+
+rejected_total = metrics.counter(
+    "sql_analysis_rejected_total", "Requests shed because the pool was saturated", ("reason",)
+)
+deadline_exceeded_total = metrics.counter(
+    "sql_analysis_deadline_exceeded_total", "Analyses cancelled by ANALYSIS_DEADLINE"
+)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+@asynccontextmanager
+async def deadline(seconds: Optional[float] = None) -> AsyncIterator[None]:
+    """
+    Ограничение времени анализа. По истечении задача отменяется, psycopg
+    при отмене отправляет cancel на сервер - EXPLAIN и запросы контекста прерываются
+    """
+    seconds = settings.ANALYSIS_DEADLINE if seconds is None else seconds
+    if seconds <= 0:
+        yield
+        return
+    try:
+        async with asyncio.timeout(seconds):
+            yield
+    except TimeoutError:
+        deadline_exceeded_total.inc()
+        raise DeadlineExceeded(f"Analysis exceeded the deadline of {seconds:g}s")
+
+
+def is_transient(error: Exception) -> bool:
+    """Перегрузка пула, дедлайн или недоступность БД: запрос имеет смысл повторить позже"""
+    return isinstance(error, (TooManyRequests, PoolTimeout, DeadlineExceeded, OperationalError))
+
+
+def _overloaded(reason: str, detail: str) -> JSONResponse:
+    rejected_total.inc(reason)
+    logger.warning(f"Request rejected ({reason}): {detail}")
+    return JSONResponse(
+        status_code=429,
+        content={"detail": detail},
+        headers={"Retry-After": str(settings.OVERLOAD_RETRY_AFTER)}
+    )
+
+
+def install_admission_handlers(app: FastAPI) -> None:
+    """429 с Retry-After при переполненной очереди пула, 504 при превышении дедлайна"""
+
+    @app.exception_handler(TooManyRequests)
+    async def too_many_requests(request: Request, exc: TooManyRequests):
+        return _overloaded("queue_full", "Too many requests are waiting for a database connection")
+
+    @app.exception_handler(PoolTimeout)
+    async def pool_timeout(request: Request, exc: PoolTimeout):
+        return _overloaded("pool_timeout", "No database connection became available in time")
+
+    @app.exception_handler(DeadlineExceeded)
+    async def deadline_exceeded(request: Request, exc: DeadlineExceeded):
+        return JSONResponse(status_code=504, content={"detail": str(exc)})
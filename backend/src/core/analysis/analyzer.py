@@ -1,44 +1,749 @@
-from typing import Any, Dict, List
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, FrozenSet, List, Optional, Set, Tuple
 
 from psycopg import AsyncConnection
+from psycopg_pool import AsyncConnectionPool
 
-from core.models.analysis_result import AnalysisResult
-from core.models.lint_request import LintRequest, LintRequests
-from core.analysis.context import get_database_context
+from core.models.analysis_result import AnalysisResult, StreamAnalysisResult
+from core.models.index_advice import BulkIndexAdvice
+from core.models.plan_regression import PlanRegression, PlanRegressionReport
+from core.models.lint_diagnose import LintDiagnose
+from core.models.lint_request import LintRequest, LintRequests, parse_ndjson_line
+from core.models.rule_trace import RuleTrace
+from core.admission import deadline
+from core.analysis.compare import compare_execution
+from core.analysis.context import (
+    DatabaseContext,
+    filter_section,
+    get_database_context,
+    load_section,
+)
+from core.analysis.fingerprint import fingerprint, query_parameters
+from core.analysis.generic_plan import generic_planner
+from core.analysis.index_advisor import advise_indexes
+from core.analysis.offline import OfflineSnapshot, write_snapshot
+from core.analysis.plan_baseline import PlanBaselineStore, PlanMetrics, diff_plans
+from core.analysis.plan_cache import PlanCache, plan_cache
+from core.analysis.plan_index import PlanIndex
+from core.analysis.result_store import ResultStore, catalog_version, query_key
+from core.analysis.rules import registry as rule_registry
+from core.analysis.snapshot import ContextSnapshotService, context_snapshot
 from core.analysis.rules.analyze_with_rules import analyze_with_rules
+from core.metrics import Timings, analyses_total, record_pool_wait, rule_seconds, slow_analyses_total
+from core.pool import pool
+from core.settings import settings
+from utils.logger import logger
+
+
+def _run_rules(
+    sql_query: str,
+    plan: PlanIndex,
+    context: Any,
+    trace: bool
+) -> Tuple[str, List[LintDiagnose], Optional[List[RuleTrace]], Dict[str, float], float]:
+    """
+    Проход правил; функция уровня модуля, чтобы её можно было выполнить в другом процессе.
+    Последним возвращается время прохода, измеренное там же, - без ожидания в очереди
+    """
+    started = time.perf_counter()
+    rules_trace: Optional[List[RuleTrace]] = [] if trace else None
+    rule_timings: Dict[str, float] = {}
+    recommendation, lint_diagnoses = analyze_with_rules(sql_query, plan, context, rules_trace, rule_timings)
+    return recommendation, lint_diagnoses, rules_trace, rule_timings, time.perf_counter() - started
+
+
+class _ContextLoader:
+    """
+    Загрузчик секций для DatabaseContext: контекст пачки, снимок в памяти, каталог.
+    После aclose() (анализ завершён или прерван дедлайном) запросы к БД больше не
+    отправляются, а начатые отменяются - соединение возвращается в пул.
+    """
+
+    def __init__(
+        self,
+        conn: AsyncConnection,
+        loop: asyncio.AbstractEventLoop,
+        batch_context: Optional[Dict[str, Any]],
+        timings: Timings,
+        snapshot: ContextSnapshotService
+    ):
+        self.conn = conn
+        self.snapshot = snapshot
+        self.loop = loop
+        self.batch_context = batch_context
+        self.timings = timings
+        self._closed = False
+        self._pending: Set[concurrent.futures.Future] = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, name: str, relations: FrozenSet[str]) -> Any:
+        with self.timings.stage("context"):
+            return self._fetch(name, relations)
+
+    def _fetch(self, name: str, relations: FrozenSet[str]) -> Any:
+        if self.batch_context is not None:
+            return filter_section(name, self.batch_context[name], relations)
+
+        section = self.snapshot.section(name)
+        if section is not None:
+            return filter_section(name, section, relations)
+
+        # Правила выполняются в отдельном потоке, запрос к БД уходит в цикл событий
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError(f"Analysis is finished, context section {name} is not loaded")
+                future = asyncio.run_coroutine_threadsafe(load_section(self.conn, name, relations), self.loop)
+                self._pending.add(future)
+            try:
+                return future.result()
+            finally:
+                with self._lock:
+                    self._pending.discard(future)
+        raise RuntimeError(f"Context section {name} can't be loaded from the event loop thread")
+
+    async def aclose(self) -> None:
+        with self._lock:
+            self._closed = True
+            pending = list(self._pending)
+        for future in pending:
+            future.cancel()
+        await asyncio.gather(*(asyncio.wrap_future(future) for future in pending), return_exceptions=True)
 
 
 class SQLAnalyzer():
+    def __init__(
+        self,
+        rules_executor: Optional[Executor] = None,
+        snapshot: Optional[OfflineSnapshot] = None,
+        pool: AsyncConnectionPool = pool,
+        context_snapshot: ContextSnapshotService = context_snapshot,
+        plan_cache: PlanCache = plan_cache
+    ):
+        # По умолчанию правила выполняются в потоке и читают контекст лениво.
+        # С пулом процессов контекст передаётся готовым словарём по отношениям из плана
+        self.rules_executor = rules_executor
+        # Офлайн-режим: контекст и планы берутся из файла снимка, без соединения с БД
+        self.snapshot = snapshot
+        # Ресурсы целевой БД; по умолчанию - БД из настроек (см. core.targets)
+        self.pool = pool
+        self.context_snapshot = context_snapshot
+        self.plan_cache = plan_cache
+
+    @asynccontextmanager
+    async def _connection(self, timings: Optional[Timings] = None) -> AsyncIterator[Optional[AsyncConnection]]:
+        if self.snapshot is not None:
+            yield None
+            return
+        started = time.perf_counter()
+        async with self.pool.connection() as conn:
+            record_pool_wait(time.perf_counter() - started, timings)
+            yield conn
+
     async def _get_explain_plan(self, conn: AsyncConnection, query: str) -> Dict[str, Any]:
+        parameters = query_parameters(query) if "$" in query else 0
+        if parameters:
+            # Запрос с $1, $2 (из приложения или pg_stat_statements) в обычном EXPLAIN не выполнится
+            return await generic_planner.explain(conn, query, parameters)
         async with conn.cursor() as cur:
             await cur.execute(f"EXPLAIN (FORMAT JSON) {query}")
             result = await cur.fetchone()
 
-            return result[0] # type: ignore
+            # EXPLAIN (FORMAT JSON) возвращает список из одного плана
+            explain = result[0] # type: ignore
+            return explain[0] if isinstance(explain, list) else explain
 
-    async def analyze_one(self, lint_request: LintRequest, conn: AsyncConnection) -> AnalysisResult:
-        plan = await self._get_explain_plan(conn, lint_request.sql_query)
-        context =  await get_database_context(conn)
+    async def _get_table_stats(
+        self,
+        conn: AsyncConnection,
+        relations: FrozenSet[str],
+        batch_context: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Статистика таблиц для проверки кэша планов"""
+        if batch_context is not None:
+            return batch_context["table_stats"]
+        table_stats = self.context_snapshot.section("table_stats")
+        if table_stats is not None:
+            return table_stats
+        return await load_section(conn, "table_stats", relations)
 
-        recommendation, lint_diagnoses = analyze_with_rules(
-            lint_request.sql_query,
-            plan,
-            context
-        )
+    async def _get_plan(
+        self,
+        conn: AsyncConnection,
+        query: str,
+        batch_context: Optional[Dict[str, Any]] = None,
+        timings: Optional[Timings] = None
+    ) -> PlanIndex:
+        """Индексированный план из кэша по отпечатку запроса, при промахе - EXPLAIN"""
+        timings = timings if timings is not None else Timings()
+
+        if self.snapshot is not None:
+            # Запросы без записанного плана проверяются только правилами по тексту
+            with timings.stage("explain"):
+                return PlanIndex(self.snapshot.plan(query))
+
+        if not self.plan_cache.enabled:
+            with timings.stage("explain"):
+                return PlanIndex(await self._get_explain_plan(conn, query))
+
+        key = fingerprint(query)
 
-        return AnalysisResult(
+        cached = await self.plan_cache.lookup(key)
+        table_stats = {}
+        if cached is not None:
+            with timings.stage("context"):
+                table_stats = await self._get_table_stats(conn, cached.relations, batch_context)
+        plan = await self.plan_cache.get(key, cached, table_stats)
+        if plan is not None:
+            return plan
+
+        with timings.stage("explain"):
+            plan = PlanIndex(await self._get_explain_plan(conn, query))
+        with timings.stage("context"):
+            table_stats = await self._get_table_stats(conn, plan.relations, batch_context)
+        await self.plan_cache.put(key, plan, plan.relations, table_stats)
+        return plan
+
+    async def _analyze(
+        self,
+        sql_query: str,
+        conn: AsyncConnection,
+        batch_context: Optional[Dict[str, Any]] = None,
+        trace: bool = False,
+        timings: Optional[Timings] = None,
+        plan: Optional[PlanIndex] = None
+    ) -> AnalysisResult:
+        timings = timings if timings is not None else Timings()
+        try:
+            result = await self._analyze_timed(sql_query, conn, batch_context, trace, timings, plan)
+        except Exception:
+            analyses_total.inc("error")
+            raise
+        else:
+            analyses_total.inc("ok")
+            return result
+        finally:
+            elapsed = timings.active
+            if settings.SLOW_ANALYSIS_THRESHOLD > 0 and elapsed >= settings.SLOW_ANALYSIS_THRESHOLD:
+                slow_analyses_total.inc()
+                logger.warning(
+                    f"Slow analysis {elapsed * 1000:.1f}ms ({timings.summary()}): {sql_query[:200]!r}"
+                )
+
+    async def _analyze_timed(
+        self,
+        sql_query: str,
+        conn: AsyncConnection,
+        batch_context: Optional[Dict[str, Any]],
+        trace: bool,
+        timings: Timings,
+        plan: Optional[PlanIndex] = None
+    ) -> AnalysisResult:
+        if batch_context is None and self.snapshot is not None:
+            batch_context = self.snapshot.context
+
+        if plan is None:
+            plan = await self._get_plan(conn, sql_query, batch_context, timings)
+        loop = asyncio.get_running_loop()
+
+        if self.rules_executor is None:
+            loader = _ContextLoader(conn, loop, batch_context, timings, self.context_snapshot)
+            try:
+                with timings.stage("rules"):
+                    recommendation, lint_diagnoses, rules_trace, rule_timings, _ = await asyncio.to_thread(
+                        _run_rules, sql_query, plan, DatabaseContext(loader, plan.relations), trace
+                    )
+            finally:
+                await loader.aclose()
+        else:
+            with timings.stage("context"):
+                full_context = batch_context if batch_context is not None else await self._get_batch_context()
+                context = {
+                    name: filter_section(name, section, plan.relations)
+                    for name, section in full_context.items()
+                }
+            started = time.perf_counter()
+            recommendation, lint_diagnoses, rules_trace, rule_timings, rules_elapsed = await loop.run_in_executor(
+                self.rules_executor, _run_rules, sql_query, plan, context, trace
+            )
+            # Запуск процесса, очередь и передача данных - отдельно от времени правил
+            # и не в счёт порога медленного анализа
+            timings.add("rules", rules_elapsed)
+            timings.add("executor_wait", max(0.0, time.perf_counter() - started - rules_elapsed), wait=True)
+            # Метрики, записанные в другом процессе, сюда не попадают
+            for name, seconds in rule_timings.items():
+                rule_seconds.observe(seconds, name)
+        timings.rules.update(rule_timings)
+
+        # Диагностики уже проверены при создании правилами - без повторной валидации
+        return AnalysisResult.model_construct(
             lint_diagnoses=lint_diagnoses,
-            summary_recommendation=recommendation
+            summary_recommendation=recommendation,
+            rules_trace=rules_trace
+        )
+
+    async def analyze_one(
+        self,
+        lint_request: LintRequest,
+        conn: AsyncConnection,
+        trace: bool = False,
+        compare: bool = False
+    ) -> AnalysisResult:
+        async with deadline():
+            result = await self._analyze(lint_request.sql_query, conn, trace=trace)
+        # Запрос с параметрами без их значений выполнить нельзя - сравнения нет
+        if (
+            compare
+            and self.snapshot is None
+            and not query_parameters(lint_request.sql_query)
+            and result.summary_recommendation.strip() != lint_request.sql_query.strip()
+        ):
+            # Переписанный запрос, который оказался медленнее, не рекомендуем
+            result.comparison = await compare_execution(conn, lint_request.sql_query, result.summary_recommendation)
+            if not result.comparison.rewrite_accepted:
+                result.summary_recommendation = lint_request.sql_query
+        return result
+
+    async def _get_batch_context(self) -> Dict[str, Any]:
+        """Контекст БД, общий для всех запросов пачки"""
+        if self.snapshot is not None:
+            return self.snapshot.context
+        if self.context_snapshot.ready:
+            return self.context_snapshot.get()
+        async with self.pool.connection() as conn:
+            return await get_database_context(conn)
+
+    @staticmethod
+    def _error_result(sql_query: str, error: Exception) -> AnalysisResult:
+        logger.warning(f"Bulk item analysis failed: {error}")
+        return AnalysisResult.model_construct(
+            lint_diagnoses=[],
+            summary_recommendation=sql_query,
+            error=str(error)
+        )
+
+    async def _analyze_group(
+        self,
+        sql_queries: List[str],
+        batch_context: Dict[str, Any],
+        semaphore: asyncio.Semaphore,
+        trace: bool = False,
+        errors: Optional[Dict[str, Exception]] = None
+    ) -> Tuple[Optional[PlanIndex], List[AnalysisResult]]:
+        """
+        Анализ запросов пачки с одинаковым отпечатком: план получается один раз,
+        правила запускаются для каждого текста, так как позиции и переписанный
+        запрос зависят от литералов. Большая группа делится на части по
+        ANALYSIS_GROUP_SIZE, которые анализируются параллельно на разных соединениях
+        с общим планом. Если план группы получить не удалось, каждый запрос получает
+        свой. Ошибка не прерывает пачку - она возвращается в результате.
+        """
+        size = max(settings.ANALYSIS_GROUP_SIZE, 1)
+        chunks = [sql_queries[start:start + size] for start in range(0, len(sql_queries), size)]
+        group_plan: asyncio.Future = asyncio.get_running_loop().create_future()
+
+        def failed(sql_query: str, error: Exception) -> AnalysisResult:
+            if errors is not None:
+                errors[sql_query] = error
+            return self._error_result(sql_query, error)
+
+        async def run(chunk: List[str], first: bool) -> List[AnalysisResult]:
+            # План ждём до семафора: иначе части могли бы занять все слоты раньше первой
+            plan = None if first else await group_plan
+            try:
+                async with semaphore:
+                    timings = Timings()
+                    try:
+                        async with self._connection(timings) as conn:
+                            if first:
+                                plan = await self._get_group_plan(conn, chunk[0], batch_context, timings)
+                                group_plan.set_result(plan)
+
+                            results = []
+                            for sql_query in chunk:
+                                try:
+                                    async with deadline():
+                                        results.append(await self._analyze(
+                                            sql_query, conn, batch_context, trace, timings, plan  # type: ignore
+                                        ))
+                                except Exception as e:
+                                    results.append(failed(sql_query, e))
+                                    await self._recover(conn)
+                                timings = Timings()
+                            return results
+                    except Exception as e:
+                        return [failed(sql_query, e) for sql_query in chunk]
+            finally:
+                if first and not group_plan.done():
+                    group_plan.set_result(None)
+
+        chunked = await asyncio.gather(*(run(chunk, index == 0) for index, chunk in enumerate(chunks)))
+        return group_plan.result(), [result for results in chunked for result in results]
+
+    async def _get_group_plan(
+        self,
+        conn: Optional[AsyncConnection],
+        sql_query: str,
+        batch_context: Dict[str, Any],
+        timings: Timings
+    ) -> Optional[PlanIndex]:
+        """
+        План группы по её первому запросу. None - EXPLAIN не удался (например, из-за литерала
+        этого запроса): тогда остальные запросы группы получают планы по отдельности
+        """
+        try:
+            async with deadline():
+                return await self._get_plan(conn, sql_query, batch_context, timings)  # type: ignore
+        except Exception as e:
+            logger.warning(f"Group plan failed, falling back to per-query plans: {e}")
+            await self._recover(conn)
+            return None
+
+    @staticmethod
+    async def _recover(conn: Optional[AsyncConnection]) -> None:
+        """Откат прерванной ошибкой транзакции, чтобы следующие запросы на соединении выполнялись"""
+        if conn is None:
+            return
+        try:
+            await conn.rollback()
+        except Exception as e:
+            logger.warning(f"Rollback after failed analysis failed: {e}")
+
+    async def analyze_many(
+        self,
+        lint_requests: LintRequests,
+        trace: bool = False,
+        concurrency: Optional[int] = None,
+        stats: Optional[Dict[str, float]] = None,
+        plans: Optional[Dict[str, Tuple[PlanIndex, int]]] = None,
+        batch_context: Optional[Dict[str, Any]] = None,
+        errors: Optional[Dict[str, Exception]] = None
+    ) -> List[AnalysisResult]:
+        """
+        Одинаковые тексты анализируются один раз, тексты с одинаковым отпечатком
+        (тот же запрос с другими литералами) делят один EXPLAIN. Если передан stats,
+        в него записывается, во сколько раз сократилась работа, если plans -
+        план и число входных запросов на каждый отпечаток, если errors -
+        исключения запросов, результат которых - ошибка.
+        """
+        if batch_context is None:
+            batch_context = await self._get_batch_context()
+        semaphore = asyncio.Semaphore(concurrency or settings.ANALYSIS_CONCURRENCY)
+
+        groups: Dict[str, List[str]] = {}
+        for sql_query in dict.fromkeys(lint_requests.sql_query):
+            groups.setdefault(fingerprint(sql_query), []).append(sql_query)
+
+        grouped = await asyncio.gather(*(
+            self._analyze_group(sql_queries, batch_context, semaphore, trace, errors)
+            for sql_queries in groups.values()
+        ))
+        by_query = {
+            sql_query: result
+            for sql_queries, (_, results) in zip(groups.values(), grouped)
+            for sql_query, result in zip(sql_queries, results)
+        }
+
+        if plans is not None:
+            counts = Counter(fingerprint(sql_query) for sql_query in lint_requests.sql_query)
+            for key, (plan, _) in zip(groups, grouped):
+                if plan is not None:
+                    plans[key] = (plan, counts[key])
+
+        if stats is not None:
+            total = len(lint_requests.sql_query)
+            stats.update({
+                "queries": total,
+                "distinct_queries": len(by_query),
+                "distinct_fingerprints": len(groups),
+                "dedup_ratio": total / len(groups) if groups else 1.0,
+            })
+
+        return self._fan_out(lint_requests.sql_query, by_query)
+
+    @staticmethod
+    def _fan_out(sql_queries: List[str], by_query: Dict[str, AnalysisResult]) -> List[AnalysisResult]:
+        """Результаты в порядке входных запросов; повторы получают копию"""
+        seen: Set[str] = set()
+        results = []
+        for sql_query in sql_queries:
+            result = by_query[sql_query]
+            results.append(result.model_copy(deep=True) if sql_query in seen else result)
+            seen.add(sql_query)
+        return results
+
+    async def analyze_incremental(
+        self,
+        lint_requests: LintRequests,
+        store: ResultStore,
+        namespace: str = "default",
+        trace: bool = False,
+        concurrency: Optional[int] = None,
+        stats: Optional[Dict[str, float]] = None,
+        plans: Optional[Dict[str, Tuple[PlanIndex, int]]] = None
+    ) -> List[AnalysisResult]:
+        """
+        Bulk-анализ с хранилищем результатов: запросы, у которых не изменились текст,
+        набор правил и версия каталога по отношениям плана, берутся из хранилища,
+        анализируются только остальные. В stats - та же статистика дедупликации,
+        что у analyze_many, по всей пачке, плюс store_hits и store_misses, в plans -
+        планы проанализированных.
+        """
+        batch_context = await self._get_batch_context()
+        rules_version = rule_registry.version
+        sql_queries = list(dict.fromkeys(lint_requests.sql_query))
+        fingerprints = {sql_query: fingerprint(sql_query) for sql_query in sql_queries}
+        keys = {sql_query: query_key(sql_query, namespace, rules_version, trace) for sql_query in sql_queries}
+        stored = await asyncio.to_thread(store.get_many, list(keys.values()))
+
+        versions: Dict[FrozenSet[str], str] = {}
+
+        def version_of(relations: FrozenSet[str]) -> str:
+            if relations not in versions:
+                versions[relations] = catalog_version(relations, batch_context)
+            return versions[relations]
+
+        by_query: Dict[str, AnalysisResult] = {}
+        for sql_query in sql_queries:
+            entry = stored.get(keys[sql_query])
+            if entry is not None and entry[1] == version_of(entry[0]):
+                by_query[sql_query] = AnalysisResult.model_validate_json(entry[2])
+
+        changed = [sql_query for sql_query in sql_queries if sql_query not in by_query]
+        if changed:
+            plans = plans if plans is not None else {}
+            results = await self.analyze_many(
+                LintRequests.model_construct(sql_query=changed),
+                trace,
+                concurrency,
+                plans=plans,
+                batch_context=batch_context
+            )
+            entries = []
+            for sql_query, result in zip(changed, results):
+                by_query[sql_query] = result
+                key = fingerprints[sql_query]
+                # Ошибки (дедлайн, недоступная БД) не сохраняем - в следующий раз запрос проанализируется заново
+                if result.error is None and key in plans:
+                    relations = plans[key][0].relations
+                    entries.append((keys[sql_query], key, relations, version_of(relations), result.model_dump_json()))
+            # Правила перезагрузили во время анализа - результаты могли получиться разными наборами
+            if rule_registry.version == rules_version:
+                await asyncio.to_thread(store.put_many, entries)
+
+        if stats is not None:
+            total = len(lint_requests.sql_query)
+            distinct_fingerprints = len(set(fingerprints.values()))
+            stats.update({
+                "queries": total,
+                "distinct_queries": len(sql_queries),
+                "distinct_fingerprints": distinct_fingerprints,
+                "dedup_ratio": total / distinct_fingerprints if distinct_fingerprints else 1.0,
+                "store_hits": len(sql_queries) - len(changed),
+                "store_misses": len(changed),
+            })
+        return self._fan_out(lint_requests.sql_query, by_query)
+
+    async def advise_indexes(
+        self,
+        lint_requests: LintRequests,
+        trace: bool = False,
+        limit: int = 20
+    ) -> BulkIndexAdvice:
+        """Bulk-анализ и сводные рекомендации по индексам для всей пачки"""
+        plans: Dict[str, Tuple[PlanIndex, int]] = {}
+        batch_context = await self._get_batch_context()
+        results = await self.analyze_many(lint_requests, trace, plans=plans, batch_context=batch_context)
+        indexes, covered = advise_indexes(
+            plans,
+            batch_context.get("index_stats") or [],
+            batch_context.get("table_stats") or {},
+            limit
         )
+        return BulkIndexAdvice.model_construct(indexes=indexes, covered=covered, results=results)
 
-    async def analyze_many(self, lint_requests: LintRequests, conn: AsyncConnection) -> List[AnalysisResult]: # type: ignore
-        result = []
+    async def check_plan_regressions(
+        self,
+        lint_requests: LintRequests,
+        baselines: PlanBaselineStore,
+        namespace: str = "default",
+        trace: bool = False,
+        concurrency: Optional[int] = None,
+        cost_ratio: Optional[float] = None,
+        min_cost: Optional[float] = None,
+        update_baseline: bool = False,
+        store: Optional[ResultStore] = None,
+        stats: Optional[Dict[str, float]] = None
+    ) -> PlanRegressionReport:
+        """
+        Bulk-анализ (инкрементальный, если передан store) и сравнение плана каждого
+        отпечатка с сохранённой базой. update_baseline - записать текущие планы как новую базу
+        """
+        cost_ratio = cost_ratio if cost_ratio is not None else settings.PLAN_REGRESSION_COST_RATIO
+        min_cost = min_cost if min_cost is not None else settings.PLAN_REGRESSION_MIN_COST
+        batch_context = await self._get_batch_context()
+        plans: Dict[str, Tuple[PlanIndex, int]] = {}
+        if store is not None:
+            results = await self.analyze_incremental(
+                lint_requests, store, namespace, trace, concurrency, stats=stats, plans=plans
+            )
+        else:
+            results = await self.analyze_many(
+                lint_requests, trace, concurrency, stats=stats, plans=plans, batch_context=batch_context
+            )
 
+        samples: Dict[str, str] = {}
+        counts: Counter = Counter()
         for sql_query in lint_requests.sql_query:
-            lint_request = LintRequest(sql_query=sql_query)
+            key = fingerprint(sql_query)
+            samples.setdefault(key, sql_query)
+            counts[key] += 1
 
-            result.extend(await self.analyze_one(lint_request, conn))
+        # Планы запросов, взятых из хранилища результатов: обычно попадание в кэш планов
+        semaphore = asyncio.Semaphore(concurrency or settings.ANALYSIS_CONCURRENCY)
 
-        return result
+        async def fetch(key: str) -> None:
+            async with semaphore:
+                try:
+                    async with self._connection() as conn:
+                        async with deadline():
+                            plans[key] = (await self._get_plan(conn, samples[key], batch_context), counts[key])  # type: ignore
+                except Exception as e:
+                    logger.warning(f"Plan regression check skipped for {samples[key][:200]!r}: {e}")
+
+        await asyncio.gather(*(fetch(key) for key in samples if key not in plans))
+
+        metrics = {key: PlanMetrics.of(plan) for key, (plan, _) in plans.items()}
+        stored = await asyncio.to_thread(baselines.get_many, namespace, list(metrics))
+        regressions = []
+        for key, current in metrics.items():
+            baseline = stored.get(key)
+            if baseline is None:
+                continue
+            changes = diff_plans(baseline, current, cost_ratio, min_cost)
+            if any(change.regression for change in changes):
+                regressions.append(PlanRegression(
+                    fingerprint=key,
+                    sql_query=samples[key],
+                    queries=counts[key],
+                    baseline_cost=baseline.cost,
+                    cost=current.cost,
+                    baseline_rows=baseline.rows,
+                    rows=current.rows,
+                    changes=changes
+                ))
+        regressions.sort(key=lambda regression: regression.cost / max(regression.baseline_cost, 1e-9), reverse=True)
+
+        updated = 0
+        if update_baseline:
+            updated = await asyncio.to_thread(
+                baselines.put_many, namespace, [(key, samples[key], value) for key, value in metrics.items()]
+            )
+        return PlanRegressionReport.model_construct(
+            regressions=regressions,
+            checked=len(stored),
+            new=len(metrics) - len(stored),
+            updated=updated,
+            results=results
+        )
+
+    async def analyze_stream(
+        self,
+        lines: AsyncIterator[str],
+        trace: bool = False
+    ) -> AsyncIterator[StreamAnalysisResult]:
+        """
+        Потоковый bulk: строки NDJSON читаются по мере поступления, результаты
+        отдаются по мере готовности с индексом исходной строки. Принятых, но ещё
+        не отданных запросов не больше STREAM_WINDOW - чтение входа ждёт окно.
+        """
+        batch_context = await self._get_batch_context()
+        window = asyncio.Semaphore(settings.STREAM_WINDOW)
+        semaphore = asyncio.Semaphore(settings.ANALYSIS_CONCURRENCY)
+        results: asyncio.Queue[Optional[StreamAnalysisResult]] = asyncio.Queue()
+        tasks: Set[asyncio.Task] = set()
+
+        async def run(index: int, line: str) -> None:
+            try:
+                lint_request = parse_ndjson_line(line)
+            except ValueError as e:
+                result = AnalysisResult(lint_diagnoses=[], summary_recommendation="", error=f"Invalid input line: {e}")
+                await results.put(StreamAnalysisResult.model_construct(index=index, **dict(result)))
+                return
+
+            _, [result] = await self._analyze_group([lint_request.sql_query], batch_context, semaphore, trace)
+            # Результат уже собран из проверенных моделей - без повторной валидации
+            await results.put(StreamAnalysisResult.model_construct(
+                index=index,
+                request_id=lint_request.request_id,
+                **dict(result)
+            ))
+
+        async def produce() -> None:
+            try:
+                index = 0
+                async for line in lines:
+                    if not line.strip():
+                        continue
+                    await window.acquire()
+                    task = asyncio.create_task(run(index, line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    index += 1
+                await asyncio.gather(*tasks)
+            finally:
+                await results.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                result = await results.get()
+                if result is None:
+                    break
+                yield result
+                window.release()
+            await producer
+        finally:
+            # Клиент отключился или вход оборвался - останавливаем всё, что ещё в работе
+            producer.cancel()
+            for task in list(tasks):
+                task.cancel()
+
+    async def export_snapshot(
+        self,
+        path: str,
+        queries: List[str],
+        concurrency: Optional[int] = None
+    ) -> Dict[str, int]:
+        """Сохраняет контекст БД и планы EXPLAIN для queries (по одному на форму запроса) в файл"""
+        async with self.pool.connection() as conn:
+            context = await get_database_context(conn)
+            server_version = str(conn.info.server_version)
+
+        distinct = {fingerprint(query): query for query in queries}
+        semaphore = asyncio.Semaphore(concurrency or settings.ANALYSIS_CONCURRENCY)
+
+        async def explain(query: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    async with self.pool.connection() as conn:
+                        return await self._get_explain_plan(conn, query)
+                except Exception as e:
+                    logger.warning(f"Snapshot EXPLAIN failed: {e}")
+                    return None
+
+        explained = await asyncio.gather(*(explain(query) for query in distinct.values()))
+        plans = {key: plan for key, plan in zip(distinct, explained) if plan is not None}
+
+        await asyncio.to_thread(write_snapshot, path, context, plans, server_version)
+        return {"plans": len(plans), "failed": len(distinct) - len(plans)}
 
 analyzer = SQLAnalyzer()
@@ -0,0 +1,122 @@
+from statistics import median
+from typing import Any, Dict, List, Optional
+
+from psycopg import AsyncConnection, errors
+
+from core.analysis.query import ParsedQuery
+from core.models.execution_comparison import ExecutionComparison, ExecutionStats
+from core.settings import settings
+
+
+async def _explain_analyze(conn: AsyncConnection, statement: str) -> Dict[str, Any]:
+    async with conn.cursor() as cur:
+        await cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}")
+        result = await cur.fetchone()
+        explain = result[0]  # type: ignore
+        return explain[0] if isinstance(explain, list) else explain
+
+
+async def measure_execution(
+    conn: AsyncConnection,
+    query: str,
+    runs: int,
+    timeout_ms: int
+) -> ExecutionStats:
+    """
+    Выполняет запрос runs раз (плюс один прогревочный) через EXPLAIN ANALYZE.
+    Всё происходит в транзакции, которая всегда откатывается, поэтому
+    изменяющие запросы не оставляют следов. Несколько выражений в запросе
+    выполняются по очереди, их время складывается.
+    """
+    statements = ParsedQuery.of(query).statement_texts
+    execution: List[float] = []
+    planning: List[float] = []
+    buffers: Dict[str, int] = {}
+
+    async with conn.transaction(force_rollback=True):
+        await conn.execute(
+            "SELECT set_config('statement_timeout', %s, true)", (str(timeout_ms),)
+        )
+        for run in range(runs + 1):
+            run_execution = run_planning = 0.0
+            run_buffers = {"hit": 0, "read": 0, "temp": 0}
+            for statement in statements:
+                explain = await _explain_analyze(conn, statement)
+                plan = explain.get("Plan", {})
+                run_execution += explain.get("Execution Time", 0.0)
+                run_planning += explain.get("Planning Time", 0.0)
+                run_buffers["hit"] += plan.get("Shared Hit Blocks", 0)
+                run_buffers["read"] += plan.get("Shared Read Blocks", 0)
+                run_buffers["temp"] += plan.get("Temp Read Blocks", 0) + plan.get("Temp Written Blocks", 0)
+            if run == 0:
+                continue  # прогрев: кэши каталога и буферов
+            execution.append(run_execution)
+            planning.append(run_planning)
+            buffers = run_buffers
+
+    return ExecutionStats(
+        runs=runs,
+        median_ms=median(execution),
+        min_ms=min(execution),
+        planning_ms=median(planning),
+        shared_hit_blocks=buffers["hit"],
+        shared_read_blocks=buffers["read"],
+        temp_blocks=buffers["temp"]
+    )
+
+
+async def compare_execution(
+    conn: AsyncConnection,
+    original: str,
+    rewritten: str,
+    runs: Optional[int] = None,
+    timeout_ms: Optional[int] = None,
+    tolerance: Optional[float] = None
+) -> ExecutionComparison:
+    """
+    Замеряет исходный и переписанный запрос и выносит вердикт.
+    Переписанный запрос отклоняется, если он медленнее или не выполнился.
+    """
+    runs = max(1, runs or settings.COMPARE_RUNS)
+    timeout_ms = timeout_ms or settings.COMPARE_STATEMENT_TIMEOUT_MS
+    tolerance = settings.COMPARE_TOLERANCE if tolerance is None else tolerance
+
+    try:
+        rewritten_stats = await measure_execution(conn, rewritten, runs, timeout_ms)
+    except Exception as e:
+        return ExecutionComparison(verdict="failed", rewrite_accepted=False, error=f"Rewritten query: {e}")
+
+    try:
+        original_stats = await measure_execution(conn, original, runs, timeout_ms)
+    except errors.QueryCanceled as e:
+        # Исходный запрос не уложился в statement_timeout, а переписанный уложился
+        return ExecutionComparison(
+            rewritten=rewritten_stats,
+            verdict="faster",
+            rewrite_accepted=True,
+            error=f"Original query: {e}"
+        )
+    except Exception as e:
+        # Ошибка исходного запроса (синтаксис, права, соединение) ничего не говорит о переписанном
+        return ExecutionComparison(
+            rewritten=rewritten_stats,
+            verdict="failed",
+            rewrite_accepted=False,
+            error=f"Original query: {e}"
+        )
+
+    before, after = original_stats.median_ms, rewritten_stats.median_ms
+    if after < before * (1 - tolerance):
+        verdict = "faster"
+    elif after > before * (1 + tolerance):
+        verdict = "slower"
+    else:
+        verdict = "same"
+
+    return ExecutionComparison(
+        original=original_stats,
+        rewritten=rewritten_stats,
+        speedup=before / after if after > 0 else None,
+        verdict=verdict,
+        rewrite_accepted=verdict != "slower"
+    )
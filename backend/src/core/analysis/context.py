@@ -1,19 +1,14 @@
 # backend/src/core/analysis/context.py
-from typing import Any, Dict
+from typing import Any, Awaitable, Callable, Collection, Dict, FrozenSet, Iterator, Mapping, Optional
 
 from psycopg import AsyncConnection
 
-# TODO: добавить получение базовой информации о бд
 
 async def get_database_context(connection: AsyncConnection) -> Dict[str, Any]:
     """Получает полный контекст БД для использования в правилах"""
-    context = {
-        "settings": await get_db_settings(connection),
-        "table_stats": await get_table_statistics(connection),
-        "index_stats": await get_index_statistics(connection),
-        "activity": await get_current_activity(connection),
-        "io_stats": await get_io_statistics(connection)
-    }
+    context = {}
+    for name, loader in SECTION_LOADERS.items():
+        context[name] = await loader(connection)
     return context
 
 async def get_db_settings(connection: AsyncConnection):
@@ -34,8 +29,8 @@ async def get_db_settings(connection: AsyncConnection):
             }
         return settings
 
-async def get_table_statistics(connection: AsyncConnection):
-    """Статистика по таблицам"""
+async def get_table_statistics(connection: AsyncConnection, relations: Optional[Collection[str]] = None):
+    """Статистика по таблицам (только по relations, если они переданы)"""
     async with connection.cursor() as cur:
         await cur.execute("""
             SELECT 
@@ -49,8 +44,9 @@ async def get_table_statistics(connection: AsyncConnection):
                 pg_size_pretty(pg_total_relation_size(relid)) as total_size,
                 pg_size_pretty(pg_relation_size(relid)) as table_size
             FROM pg_stat_user_tables
+            WHERE %(relations)s::text[] IS NULL OR relname = ANY(%(relations)s)
             ORDER BY schemaname, relname
-        """)
+        """, {"relations": _relations_param(relations)})
         
         tables = {}
         async for row in cur:
@@ -66,8 +62,8 @@ async def get_table_statistics(connection: AsyncConnection):
             }
         return tables
 
-async def get_index_statistics(connection: AsyncConnection):
-    """Статистика использования индексов"""
+async def get_index_statistics(connection: AsyncConnection, relations: Optional[Collection[str]] = None):
+    """Статистика использования индексов (только по relations, если они переданы)"""
     async with connection.cursor() as cur:
         await cur.execute("""
             SELECT 
@@ -77,10 +73,19 @@ async def get_index_statistics(connection: AsyncConnection):
                 idx_scan as index_scans,
                 idx_tup_read as tuples_read,
                 idx_tup_fetch as tuples_fetched,
-                pg_size_pretty(pg_relation_size(indexrelid)) as index_size
-            FROM pg_stat_user_indexes
+                pg_size_pretty(pg_relation_size(s.indexrelid)) as index_size,
+                -- Колонки индекса по порядку; выражения (attnum = 0) пропускаются
+                ARRAY(
+                    SELECT a.attname::text
+                    FROM unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord)
+                    JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+                    ORDER BY k.ord
+                ) as columns
+            FROM pg_stat_user_indexes s
+            JOIN pg_index i ON i.indexrelid = s.indexrelid
+            WHERE %(relations)s::text[] IS NULL OR relname = ANY(%(relations)s)
             ORDER BY schemaname, relname, indexrelname
-        """)
+        """, {"relations": _relations_param(relations)})
         
         indexes = []
         async for row in cur:
@@ -91,12 +96,13 @@ async def get_index_statistics(connection: AsyncConnection):
                 'scans': row[3],
                 'tuples_read': row[4],
                 'tuples_fetched': row[5],
-                'size': row[6]
+                'size': row[6],
+                'columns': row[7]
             })
         return indexes
 
-async def get_io_statistics(connection: AsyncConnection):
-    """Статистика ввода/вывода"""
+async def get_io_statistics(connection: AsyncConnection, relations: Optional[Collection[str]] = None):
+    """Статистика ввода/вывода (только по relations, если они переданы)"""
     async with connection.cursor() as cur:
         await cur.execute("""
             SELECT 
@@ -107,8 +113,9 @@ async def get_io_statistics(connection: AsyncConnection):
                 idx_blks_read,
                 idx_blks_hit
             FROM pg_statio_user_tables
+            WHERE %(relations)s::text[] IS NULL OR relname = ANY(%(relations)s)
             ORDER BY schemaname, relname
-        """)
+        """, {"relations": _relations_param(relations)})
         
         io_stats = {}
         async for row in cur:
@@ -149,3 +156,71 @@ async def get_current_activity(connection: AsyncConnection):
                 'query_preview': row[6]
             })
         return activity
+
+
+# Секции контекста и функции их загрузки
+SECTION_LOADERS: Dict[str, Callable[..., Awaitable[Any]]] = {
+    "settings": get_db_settings,
+    "table_stats": get_table_statistics,
+    "index_stats": get_index_statistics,
+    "activity": get_current_activity,
+    "io_stats": get_io_statistics,
+}
+
+# Секции, статистику в которых можно ограничить набором отношений
+SCOPED_SECTIONS = frozenset({"table_stats", "index_stats", "io_stats"})
+
+
+def _relations_param(relations: Optional[Collection[str]]) -> Optional[list]:
+    return sorted(relations) if relations is not None else None
+
+
+async def load_section(
+    connection: AsyncConnection,
+    name: str,
+    relations: Optional[Collection[str]] = None
+) -> Any:
+    """Загружает одну секцию контекста, по возможности только для relations"""
+    if name in SCOPED_SECTIONS:
+        return await SECTION_LOADERS[name](connection, relations)
+    return await SECTION_LOADERS[name](connection)
+
+
+def filter_section(name: str, data: Any, relations: Collection[str]) -> Any:
+    """Оставляет в уже загруженной секции только записи по relations"""
+    if name not in SCOPED_SECTIONS:
+        return data
+    if name == "index_stats":
+        return [index for index in data if index["table"] in relations]
+    return {key: value for key, value in data.items() if key.rsplit(".", 1)[-1] in relations}
+
+
+class DatabaseContext(Mapping[str, Any]):
+    """
+    Ленивый контекст БД с интерфейсом словаря.
+    Секция загружается при первом обращении, статистика по таблицам, индексам
+    и вводу/выводу - только для отношений из плана запроса.
+    """
+
+    def __init__(self, loader: Callable[[str, FrozenSet[str]], Any], relations: Collection[str]):
+        self._loader = loader
+        self._loaded: Dict[str, Any] = {}
+        self.relations = frozenset(relations)
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in SECTION_LOADERS:
+            raise KeyError(name)
+        if name not in self._loaded:
+            self._loaded[name] = self._loader(name, self.relations)
+        return self._loaded[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(SECTION_LOADERS)
+
+    def __len__(self) -> int:
+        return len(SECTION_LOADERS)
+
+    @property
+    def loaded_sections(self) -> FrozenSet[str]:
+        """Секции, к которым уже обращались"""
+        return frozenset(self._loaded)
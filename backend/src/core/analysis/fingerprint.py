@@ -0,0 +1,63 @@
+import hashlib
+import re
+
+# Порядок альтернатив важен: комментарии и строки разбираются раньше чисел и слов
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+    |(?P<string>[EeBbXxNn]?'(?:[^']|'')*')
+    |(?P<dollar>\$(?P<tag>[A-Za-z_]\w*)?\$.*?\$(?P=tag)?\$)
+    |(?P<ident>"(?:[^"]|"")*")
+    |(?P<param>\$\d+)
+    |(?P<number>(?<![\w.])\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)
+    |(?P<word>[A-Za-z_][\w$]*)
+    |(?P<space>\s+)
+    """,
+    re.VERBOSE | re.DOTALL
+)
+_IN_LIST_RE = re.compile(r"\( \?(?: , \?)+ \)")
+_SPACE_AROUND_RE = re.compile(r"\s*([(),;=<>!+\-*/])\s*")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Нормализует запрос: литералы и параметры заменяются на ?, комментарии
+    убираются, ключевые слова и идентификаторы приводятся к нижнему регистру,
+    пробелы схлопываются. Списки IN (?, ?, ...) сворачиваются в (?).
+    """
+    parts = []
+    position = 0
+    for match in _TOKEN_RE.finditer(query):
+        # Операторы и скобки не попадают ни в одну группу - переносим их как есть
+        parts.append(query[position:match.start()])
+        position = match.end()
+
+        kind = match.lastgroup
+        if kind in ("comment", "space"):
+            parts.append(" ")
+        elif kind in ("string", "dollar", "param", "number"):
+            parts.append("?")
+        elif kind == "word":
+            parts.append(match.group().lower())
+        else:
+            parts.append(match.group())
+    parts.append(query[position:])
+
+    normalized = _SPACE_AROUND_RE.sub(r" \1 ", "".join(parts))
+    normalized = " ".join(normalized.split())
+    normalized = _IN_LIST_RE.sub("( ? )", normalized)
+    return normalized.rstrip("; ")
+
+
+def fingerprint(query: str) -> str:
+    """Отпечаток формы запроса: одинаков для запросов, отличающихся только литералами"""
+    return hashlib.blake2b(normalize_query(query).encode(), digest_size=16).hexdigest()
+
+
+def query_parameters(query: str) -> int:
+    """Число параметров $1, $2, ... в запросе (наибольший номер), без учёта строк и комментариев"""
+    parameters = 0
+    for match in _TOKEN_RE.finditer(query):
+        if match.lastgroup == "param":
+            parameters = max(parameters, int(match.group()[1:]))
+    return parameters
@@ -0,0 +1,87 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict
+from weakref import WeakKeyDictionary
+
+from psycopg import AsyncConnection, errors
+
+from core.metrics import metrics
+from core.settings import settings
+
+# EXPLAIN (GENERIC_PLAN) появился в PostgreSQL 16, plan_cache_mode - в 12
+GENERIC_PLAN_VERSION = 160000
+PLAN_CACHE_MODE_VERSION = 120000
+
+prepared_statements_total = metrics.counter(
+    "sql_analysis_prepared_statements_total",
+    "EXPLAIN EXECUTE of parameterized queries by prepared statement reuse",
+    ("outcome",)
+)
+
+
+def server_version(conn: AsyncConnection) -> int:
+    """Версия сервера из параметров соединения, без запроса к БД"""
+    info = getattr(conn, "info", None)
+    return getattr(info, "server_version", 0) or 0
+
+
+async def _fetch_plan(conn: AsyncConnection, statement: str) -> Dict[str, Any]:
+    async with conn.cursor() as cur:
+        # Без серверной подготовки psycopg: текст с $1 уходит простым протоколом, без Bind параметров
+        await cur.execute(statement, prepare=False)
+        result = await cur.fetchone()
+
+        # EXPLAIN (FORMAT JSON) возвращает список из одного плана
+        explain = result[0] # type: ignore
+        return explain[0] if isinstance(explain, list) else explain
+
+
+class GenericPlanner:
+    """
+    Планы запросов с параметрами $1, $2, ..., которые нельзя передать в обычный EXPLAIN.
+    На PostgreSQL 16+ - EXPLAIN (GENERIC_PLAN). На старых серверах запрос готовится
+    через PREPARE и объясняется EXPLAIN EXECUTE с NULL вместо параметров при
+    plan_cache_mode = force_generic_plan: общий план от значений не зависит.
+    Подготовленные выражения остаются на соединении и переиспользуются для
+    повторяющихся запросов, на одном соединении их не больше max_statements.
+    """
+
+    def __init__(self, max_statements: int):
+        self.max_statements = max_statements
+        # Соединение -> имена подготовленных на нём выражений в порядке использования
+        self._prepared: "WeakKeyDictionary[AsyncConnection, OrderedDict[str, None]]" = WeakKeyDictionary()
+
+    async def explain(self, conn: AsyncConnection, query: str, parameters: int) -> Dict[str, Any]:
+        if server_version(conn) >= GENERIC_PLAN_VERSION:
+            return await _fetch_plan(conn, f"EXPLAIN (GENERIC_PLAN, FORMAT JSON) {query}")
+        try:
+            return await self._explain_prepared(conn, query, parameters)
+        except errors.InvalidSqlStatementName:
+            # Выражения удалены на сервере (DISCARD ALL, сброс сессии) - готовим заново
+            self._prepared.pop(conn, None)
+            await conn.rollback()
+            return await self._explain_prepared(conn, query, parameters)
+
+    async def _explain_prepared(self, conn: AsyncConnection, query: str, parameters: int) -> Dict[str, Any]:
+        name = "sql_analysis_" + hashlib.blake2b(query.encode(), digest_size=8).hexdigest()
+        prepared = self._prepared.setdefault(conn, OrderedDict())
+
+        if name in prepared:
+            prepared.move_to_end(name)
+            prepared_statements_total.inc("reused")
+        else:
+            while len(prepared) >= self.max_statements:
+                oldest, _ = prepared.popitem(last=False)
+                await conn.execute(f"DEALLOCATE {oldest}", prepare=False)
+            await conn.execute(f"PREPARE {name} AS {query.strip().rstrip(';')}", prepare=False)
+            prepared[name] = None
+            prepared_statements_total.inc("prepared")
+
+        if server_version(conn) >= PLAN_CACHE_MODE_VERSION:
+            # Только до конца транзакции: на соединении не остаётся изменённых настроек
+            await conn.execute("SELECT set_config('plan_cache_mode', 'force_generic_plan', true)")
+        arguments = ", ".join(["NULL"] * parameters)
+        return await _fetch_plan(conn, f"EXPLAIN (FORMAT JSON) EXECUTE {name}({arguments})")
+
+
+generic_planner = GenericPlanner(settings.PREPARED_STATEMENTS_PER_CONNECTION)
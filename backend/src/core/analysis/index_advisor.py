@@ -0,0 +1,136 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+
+from core.analysis.plan_filter import conjunctive_comparisons
+from core.analysis.plan_index import PlanIndex
+from core.models.index_advice import IndexRecommendation
+
+_RANGE_OPERATORS = {"<", ">", "<=", ">=", "~~"}
+
+
+@dataclass(frozen=True)
+class IndexCandidate:
+    """
+    Кандидат в индекс по условию Filter одного узла Seq Scan: колонки равенства
+    (в индексе порядок между ними не важен) и не больше одной колонки диапазона,
+    которая идёт после них - дальше B-tree индекс уже не сужает поиск
+    """
+    relation: str
+    equality: FrozenSet[str]
+    range: Optional[str] = None
+
+    def columns(self, order: Optional[Mapping[str, int]] = None) -> List[str]:
+        counts = order or {}
+        columns = sorted(self.equality, key=lambda column: (-counts.get(column, 0), column))
+        return columns + [self.range] if self.range else columns
+
+    def serves(self, other: "IndexCandidate") -> bool:
+        """Индекс по self можно построить так, что он подойдёт и для other"""
+        if other.relation != self.relation or not other.equality <= self.equality:
+            return False
+        return other.range is None or (other.equality == self.equality and other.range == self.range)
+
+
+def candidates_from_plan(plan: PlanIndex) -> List[IndexCandidate]:
+    candidates = []
+    for node in plan.of_type("Seq Scan"):
+        filter_expr = node.raw.get("Filter")
+        if not node.relation or not filter_expr:
+            continue
+        equality: Set[str] = set()
+        ranges: List[str] = []
+        for column, operator in conjunctive_comparisons(filter_expr):
+            if operator == "=":
+                equality.add(column)
+            elif operator in _RANGE_OPERATORS and column not in ranges:
+                ranges.append(column)
+        range_column = next((column for column in ranges if column not in equality), None)
+        if equality or range_column:
+            candidates.append(IndexCandidate(node.relation, frozenset(equality), range_column))
+    return candidates
+
+
+def _covered(candidate: IndexCandidate, index_stats: Iterable[Mapping[str, Any]]) -> bool:
+    """Есть ли уже индекс, начинающийся с колонок кандидата"""
+    for index in index_stats:
+        columns = index.get("columns") or []
+        if index.get("table") != candidate.relation or len(columns) < len(candidate.equality):
+            continue
+        head = columns[:len(candidate.equality)]
+        if set(head) != candidate.equality:
+            continue
+        if candidate.range is None or (len(columns) > len(head) and columns[len(head)] == candidate.range):
+            return True
+    return False
+
+
+def _table_rows(relation: str, table_stats: Mapping[str, Any]) -> Optional[int]:
+    stats = table_stats.get(relation)
+    if stats is None:
+        stats = next((value for key, value in table_stats.items() if key.endswith(f".{relation}")), None)
+    return stats.get("row_count") if stats else None
+
+
+@dataclass
+class _Merged:
+    target: IndexCandidate
+    members: List[IndexCandidate] = field(default_factory=list)
+    queries: Dict[str, Tuple[float, int]] = field(default_factory=dict)  # отпечаток -> (стоимость, запросов)
+
+
+def advise_indexes(
+    plans: Mapping[str, Tuple[PlanIndex, int]],
+    index_stats: Iterable[Mapping[str, Any]],
+    table_stats: Mapping[str, Any],
+    limit: int = 20
+) -> Tuple[List[IndexRecommendation], int]:
+    """
+    Сводные рекомендации по индексам для пачки: plans - план и число запросов
+    на каждый отпечаток. Кандидаты, которые можно обслужить одним индексом,
+    объединяются, уже покрытые существующими индексами отбрасываются, остальные
+    ранжируются по суммарной стоимости планов запросов, которым они помогут.
+    Возвращает рекомендации и число отброшенных покрытых кандидатов.
+    """
+    index_stats = list(index_stats)
+    by_candidate: Dict[IndexCandidate, Dict[str, Tuple[float, int]]] = {}
+    for key, (plan, count) in plans.items():
+        cost = plan.root.cost if plan.root else 0.0
+        for candidate in candidates_from_plan(plan):
+            by_candidate.setdefault(candidate, {})[key] = (cost, count)
+
+    covered = {candidate for candidate in by_candidate if _covered(candidate, index_stats)}
+
+    # Широкие кандидаты первыми: узкий вливается в первый подходящий широкий
+    merged: List[_Merged] = []
+    remaining = sorted(
+        (candidate for candidate in by_candidate if candidate not in covered),
+        key=lambda c: (c.relation, -len(c.equality) - (c.range is not None), sorted(c.equality), c.range or "")
+    )
+    for candidate in remaining:
+        group = next((group for group in merged if group.target.serves(candidate)), None)
+        if group is None:
+            group = _Merged(candidate)
+            merged.append(group)
+        group.members.append(candidate)
+        group.queries.update(by_candidate[candidate])
+
+    recommendations = []
+    for group in merged:
+        # Колонки, нужные большему числу объединённых кандидатов, - в начало индекса
+        order: Dict[str, int] = {}
+        for member in group.members:
+            for column in member.equality:
+                order[column] = order.get(column, 0) + 1
+        columns = group.target.columns(order)
+        recommendations.append(IndexRecommendation(
+            relation=group.target.relation,
+            columns=columns,
+            statement=f"CREATE INDEX CONCURRENTLY ON {group.target.relation} ({', '.join(columns)});",
+            queries=sum(count for _, count in group.queries.values()),
+            total_cost=sum(cost * count for cost, count in group.queries.values()),
+            table_rows=_table_rows(group.target.relation, table_stats),
+            merged=[member.columns() for member in group.members]
+        ))
+
+    recommendations.sort(key=lambda r: (r.total_cost, r.table_rows or 0), reverse=True)
+    return recommendations[:limit], len(covered)
@@ -0,0 +1,104 @@
+import json
+import sqlite3
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from core.analysis.fingerprint import fingerprint
+
+SNAPSHOT_FORMAT_VERSION = "1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS context (section TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS plans (fingerprint TEXT PRIMARY KEY, plan TEXT NOT NULL);
+"""
+
+
+def json_default(value: Any) -> Any:
+    """Даты и время контекста БД для json.dumps(default=...)"""
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_object_hook(obj: Dict[str, Any]) -> Any:
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+class OfflineSnapshot:
+    """
+    Снимок контекста БД и записанных планов EXPLAIN в SQLite-файле.
+    Контекст читается при открытии, планы - по отпечатку запроса по требованию,
+    файл отображается в память, поэтому открытие не зависит от числа планов.
+    """
+
+    def __init__(self, db: sqlite3.Connection):
+        self._db = db
+        self.meta: Dict[str, str] = dict(db.execute("SELECT key, value FROM meta"))
+        # Снимок другой версии формата прочитался бы без ошибок, но с неверным контекстом
+        version = self.meta.get("format_version")
+        if version != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot format version {version!r}, expected {SNAPSHOT_FORMAT_VERSION!r}; "
+                "export the snapshot again with this version"
+            )
+        self.context: Dict[str, Any] = {
+            section: json.loads(data, object_hook=json_object_hook)
+            for section, data in db.execute("SELECT section, data FROM context")
+        }
+
+    @classmethod
+    def load(cls, path: str) -> "OfflineSnapshot":
+        if not Path(path).is_file():
+            raise FileNotFoundError(f"Snapshot file not found: {path}")
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        db.execute("PRAGMA mmap_size = 268435456")
+        try:
+            return cls(db)
+        except BaseException:
+            db.close()
+            raise
+
+    def plan(self, query: str) -> Optional[Dict[str, Any]]:
+        """Записанный план для запроса той же формы или None"""
+        row = self._db.execute(
+            "SELECT plan FROM plans WHERE fingerprint = ?", (fingerprint(query),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def write_snapshot(
+    path: str,
+    context: Dict[str, Any],
+    plans: Dict[str, Dict[str, Any]],
+    server_version: str = ""
+) -> None:
+    """Записывает контекст БД и планы (по отпечатку запроса) в файл снимка"""
+    Path(path).unlink(missing_ok=True)
+    db = sqlite3.connect(path)
+    try:
+        db.executescript(_SCHEMA)
+        db.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("format_version", SNAPSHOT_FORMAT_VERSION),
+            ("created_at", datetime.now().astimezone().isoformat()),
+            ("server_version", server_version),
+        ])
+        db.executemany("INSERT INTO context VALUES (?, ?)", [
+            (section, json.dumps(data, default=json_default)) for section, data in context.items()
+        ])
+        db.executemany("INSERT INTO plans VALUES (?, ?)", [
+            (key, json.dumps(plan, default=json_default)) for key, plan in plans.items()
+        ])
+        db.commit()
+    finally:
+        db.close()
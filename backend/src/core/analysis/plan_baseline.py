@@ -0,0 +1,182 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.analysis.plan_index import PlanIndex
+from core.models.plan_regression import PlanChange
+from core.settings import settings
+
+# Чем больше, тем хуже: чтение всей таблицы хуже чтения по индексу
+SCAN_RANK = {
+    "Index Only Scan": 0,
+    "Index Scan": 1,
+    "Bitmap Heap Scan": 2,
+    "Seq Scan": 3,
+}
+JOIN_TYPES = ("Nested Loop", "Hash Join", "Merge Join")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS baselines (
+    namespace TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    sql_query TEXT NOT NULL,
+    metrics TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (namespace, fingerprint)
+) WITHOUT ROWID;
+"""
+
+# SQLite ограничивает число параметров в запросе
+_BATCH = 500
+
+
+@dataclass
+class PlanMetrics:
+    """Ключевые метрики плана, с которыми сравниваются следующие запуски"""
+    cost: float  # Total Cost корня
+    rows: float  # Plan Rows корня
+    scans: Dict[str, str] = field(default_factory=dict)  # отношение -> худший тип сканирования
+    joins: Dict[str, int] = field(default_factory=dict)  # тип соединения -> число узлов
+
+    @classmethod
+    def of(cls, plan: PlanIndex) -> "PlanMetrics":
+        root = plan.root
+        scans: Dict[str, str] = {}
+        for node in plan.nodes:
+            if node.relation and node.node_type in SCAN_RANK:
+                current = scans.get(node.relation)
+                if current is None or SCAN_RANK[node.node_type] > SCAN_RANK[current]:
+                    scans[node.relation] = node.node_type
+        joins = {join: len(plan.of_type(join)) for join in JOIN_TYPES if plan.of_type(join)}
+        return cls(
+            cost=root.cost if root else 0.0,
+            rows=root.rows if root else 0.0,
+            scans=scans,
+            joins=joins
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), sort_keys=True)
+
+    @classmethod
+    def from_json(cls, data: str) -> "PlanMetrics":
+        return cls(**json.loads(data))
+
+
+def diff_plans(
+    baseline: PlanMetrics,
+    current: PlanMetrics,
+    cost_ratio: float,
+    min_cost: float
+) -> List[PlanChange]:
+    """
+    Структурная разница планов. Регрессии - только у планов не дешевле min_cost:
+    стоимость выросла больше чем в cost_ratio раз; если стоимость не упала -
+    отношение читается хуже, чем в базе (например, Seq Scan вместо Index Scan,
+    в том числе новое отношение с Seq Scan), стало больше Nested Loop.
+    Структурные изменения дешёвых или подешевевших планов (после ANALYZE маленькой
+    таблице Seq Scan выгоднее индекса) показываются без отметки регрессии.
+    """
+    changes = []
+    structural = current.cost >= min_cost and current.cost >= baseline.cost
+    if current.cost > baseline.cost:
+        ratio = current.cost / baseline.cost if baseline.cost > 0 else float("inf")
+        if ratio > cost_ratio and current.cost >= min_cost:
+            changes.append(PlanChange(
+                kind="cost",
+                before=f"{baseline.cost:.2f}",
+                after=f"{current.cost:.2f}",
+                regression=True,
+                message=f"Total Cost grew from {baseline.cost:.2f} to {current.cost:.2f} (x{ratio:.1f})"
+            ))
+
+    for relation in sorted(baseline.scans.keys() | current.scans.keys()):
+        before, after = baseline.scans.get(relation), current.scans.get(relation)
+        if before == after:
+            continue
+        if after is None:
+            regression = False
+            message = f"{relation} is no longer scanned (was {before})"
+        elif before is None:
+            regression = structural and after == "Seq Scan"
+            message = f"New {after} on {relation}"
+        else:
+            regression = structural and SCAN_RANK[after] > SCAN_RANK[before]
+            message = f"{after} on {relation} instead of {before}"
+        changes.append(PlanChange(
+            kind="scan", relation=relation, before=before, after=after, regression=regression, message=message
+        ))
+
+    for join in JOIN_TYPES:
+        before_count, after_count = baseline.joins.get(join, 0), current.joins.get(join, 0)
+        if before_count != after_count:
+            changes.append(PlanChange(
+                kind="join",
+                before=f"{join} x{before_count}",
+                after=f"{join} x{after_count}",
+                regression=structural and join == "Nested Loop" and after_count > before_count,
+                message=f"{join} joins: {before_count} -> {after_count}"
+            ))
+    return changes
+
+
+class PlanBaselineStore:
+    """
+    Базовые метрики планов по отпечаткам запросов в SQLite-файле, отдельно
+    для каждой цели (namespace). Базу обновляют явно - обычно запуском CI
+    на основной ветке, проверки на ветках с изменениями только сравнивают.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Соединение SQLite нельзя наследовать через fork - открываем своё в каждом процессе
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            db.executescript(_SCHEMA)
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    def get_many(self, namespace: str, fingerprints: List[str]) -> Dict[str, PlanMetrics]:
+        found: Dict[str, PlanMetrics] = {}
+        with self._lock:
+            db = self._connection()
+            for start in range(0, len(fingerprints), _BATCH):
+                batch = fingerprints[start:start + _BATCH]
+                # В текст запроса подставляются только знаки ?, значения передаются параметрами
+                placeholders = ", ".join("?" * len(batch))
+                for key, metrics in db.execute(
+                    f"SELECT fingerprint, metrics FROM baselines WHERE namespace = ? AND fingerprint IN ({placeholders})",  # nosec B608
+                    [namespace, *batch]
+                ):
+                    found[key] = PlanMetrics.from_json(metrics)
+        return found
+
+    def put_many(self, namespace: str, entries: Iterable[Tuple[str, str, PlanMetrics]]) -> int:
+        """Записи (отпечаток, пример запроса, метрики); возвращает число записанных"""
+        now = time.time()
+        rows = [(namespace, key, sql_query, metrics.to_json(), now) for key, sql_query, metrics in entries]
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany("INSERT OR REPLACE INTO baselines VALUES (?, ?, ?, ?, ?)", rows)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+
+# Без PLAN_BASELINE_PATH проверка регрессий планов через API недоступна
+plan_baselines = PlanBaselineStore(settings.PLAN_BASELINE_PATH) if settings.PLAN_BASELINE_PATH else None
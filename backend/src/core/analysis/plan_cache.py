@@ -0,0 +1,153 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Mapping, Optional, Tuple
+
+from core.analysis.context import filter_section
+from core.analysis.plan_index import PlanIndex
+from core.analysis.shared_cache import SharedCache, shared_cache
+from core.settings import settings
+
+StatsVersion = Tuple[Tuple[str, Any, Any], ...]
+
+
+def stats_version(relations: FrozenSet[str], table_stats: Mapping[str, Any]) -> StatsVersion:
+    """Версия статистики отношений: n_mod_since_analyze и last_analyze по каждой таблице"""
+    scoped = filter_section("table_stats", table_stats, relations)
+    return tuple(sorted(
+        (key, stats.get("mods_since_analyze"), stats.get("last_analyze"))
+        for key, stats in scoped.items()
+    ))
+
+
+@dataclass
+class CachedPlan:
+    plan: PlanIndex
+    relations: FrozenSet[str]
+    version: StatsVersion
+
+
+class PlanCache:
+    """
+    LRU-кэш планов EXPLAIN по отпечатку запроса.
+    Запись считается устаревшей, если у любой таблицы из плана изменились
+    n_mod_since_analyze или last_analyze. С общим кэшем (shared) промах в памяти
+    процесса сначала ищется в нём, а устаревший план перестраивает один воркер -
+    остальные до его записи получают прежний план.
+    """
+
+    def __init__(self, max_size: int, shared: Optional[SharedCache] = None, namespace: str = "default"):
+        self.max_size = max_size
+        self.shared = shared
+        self.namespace = namespace
+        self._entries: OrderedDict[str, CachedPlan] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.shared_hits = 0
+        self.stale_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _shared_key(self, key: str) -> str:
+        return f"plan:{self.namespace}:{key}"
+
+    def _read_shared(self, key: str) -> Optional[CachedPlan]:
+        """Чтение из общего кэша и построение индекса плана - в потоке, не в цикле событий"""
+        cached = self.shared.get(self._shared_key(key)) if self.shared is not None else None
+        if cached is None:
+            return None
+        plan, relations, version = cached[0]
+        # В JSON кортежи и множества хранятся списками
+        return CachedPlan(PlanIndex(plan), frozenset(relations), tuple(tuple(item) for item in version))
+
+    async def _from_shared(self, key: str) -> Optional[CachedPlan]:
+        if self.shared is None:
+            return None
+        entry = await asyncio.to_thread(self._read_shared, key)
+        if entry is None:
+            return None
+        self._store(key, entry)
+        self.shared_hits += 1
+        return entry
+
+    async def lookup(self, key: str) -> Optional[CachedPlan]:
+        """Запись без проверки актуальности и без учёта в счётчиках"""
+        entry = self._entries.get(key)
+        return entry if entry is not None else await self._from_shared(key)
+
+    async def get(self, key: str, entry: Optional[CachedPlan], table_stats: Mapping[str, Any]) -> Optional[PlanIndex]:
+        """Актуальный план записи, найденной lookup; None - промах или план устарел"""
+        if entry is None:
+            self.misses += 1
+            return None
+
+        version = stats_version(entry.relations, table_stats)
+        if entry.version != version:
+            if self.shared is not None:
+                # Другой воркер мог уже перестроить план
+                fresh = await self._from_shared(key)
+                if fresh is not None and fresh.version == version:
+                    self.hits += 1
+                    return fresh.plan
+                if not await asyncio.to_thread(self.shared.acquire, self._shared_key(key)):
+                    self.hits += 1
+                    self.stale_hits += 1
+                    return entry.plan
+            self._entries.pop(key, None)
+            self.invalidations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.plan
+
+    async def put(
+        self,
+        key: str,
+        plan: PlanIndex,
+        relations: FrozenSet[str],
+        table_stats: Mapping[str, Any]
+    ) -> None:
+        if not self.enabled:
+            return
+
+        version = stats_version(relations, table_stats)
+        self._store(key, CachedPlan(plan, relations, version))
+        if self.shared is not None:
+            # Индекс узлов строится заново при чтении, в общий кэш пишется только сам план
+            await asyncio.to_thread(
+                self.shared.put, self._shared_key(key), (dict(plan), sorted(relations), version)
+            )
+
+    def _store(self, key: str, entry: CachedPlan) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "shared_hits": self.shared_hits,
+            "stale_hits": self.stale_hits,
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+
+plan_cache = PlanCache(settings.PLAN_CACHE_SIZE, shared_cache)
@@ -0,0 +1,68 @@
+import re
+from typing import List, Optional, Tuple
+
+# Приведения типов в Filter: (status)::text = 'x'::text
+_CAST_RE = re.compile(r"::\"?\w+\"?(?:\s+varying|\s+precision|\s+with(?:out)?\s+time\s+zone)?(?:\[\])?")
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_COMPARISON_RE = re.compile(r"(\w+)\)?\s*(=|<>|!=|<=|>=|<|>|~~\*?)\s*")
+_AND_RE = re.compile(r"\s+AND\s+")
+_OR_RE = re.compile(r"\bOR\b")
+
+
+def normalize_filter(filter_expr: str) -> str:
+    """Условие Filter узла плана без строковых литералов и приведений типов"""
+    return _CAST_RE.sub("", _STRING_LITERAL_RE.sub("''", filter_expr))
+
+
+def filter_comparisons(filter_expr: Optional[str]) -> List[Tuple[str, str]]:
+    """Сравнения колонок в условии Filter: (колонка, оператор) в порядке появления"""
+    if not filter_expr:
+        return []
+    return _COMPARISON_RE.findall(normalize_filter(filter_expr))
+
+
+def _strip_parens(expr: str) -> str:
+    """Снимает внешние скобки, если они охватывают всё выражение"""
+    expr = expr.strip()
+    while expr.startswith("(") and expr.endswith(")"):
+        depth = 0
+        for i, char in enumerate(expr):
+            depth += char == "("
+            depth -= char == ")"
+            if depth == 0 and i < len(expr) - 1:
+                return expr
+        expr = expr[1:-1].strip()
+    return expr
+
+
+def _conjuncts(expr: str) -> List[str]:
+    """Части выражения, соединённые AND на верхнем уровне скобок"""
+    expr = _strip_parens(expr)
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(expr):
+        depth += char == "("
+        depth -= char == ")"
+        if depth == 0:
+            match = _AND_RE.match(expr, i)
+            if match:
+                parts.append(expr[start:i])
+                start = match.end()
+    parts.append(expr[start:])
+    if len(parts) == 1:
+        return [expr]
+    return [conjunct for part in parts for conjunct in _conjuncts(part)]
+
+
+def conjunctive_comparisons(filter_expr: Optional[str]) -> List[Tuple[str, str]]:
+    """
+    Сравнения, которые должны выполняться для каждой строки: из частей условия,
+    соединённых AND. Части с OR пропускаются - (a = 1) OR (b = 2) не сужается
+    одним индексом по (a, b)
+    """
+    if not filter_expr:
+        return []
+    comparisons: List[Tuple[str, str]] = []
+    for conjunct in _conjuncts(normalize_filter(filter_expr)):
+        if not _OR_RE.search(conjunct):
+            comparisons.extend(_COMPARISON_RE.findall(conjunct))
+    return comparisons
@@ -0,0 +1,108 @@
+from bisect import bisect_left
+from collections import defaultdict
+from functools import cached_property
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional
+
+
+class PlanNode(NamedTuple):
+    id: int
+    parent: Optional[int]
+    depth: int
+    node_type: str
+    relation: Optional[str]
+    alias: Optional[str]
+    rows: float  # Plan Rows
+    cost: float  # Total Cost
+    raw: Dict[str, Any]  # исходный узел плана
+
+
+class PlanIndex(dict):
+    """
+    План EXPLAIN с плоской таблицей узлов.
+    Остаётся словарём с исходным планом, поэтому правила, читающие plan['Plan'],
+    работают как раньше. Строится один раз на план: узлы индексируются по типу,
+    отношению, оценке строк и стоимости, у каждого узла есть ссылка на родителя.
+    """
+
+    def __init__(self, plan: Optional[Dict[str, Any]] = None):
+        super().__init__(plan or {})
+        self.nodes: List[PlanNode] = []
+        self._by_type: Dict[str, List[int]] = defaultdict(list)
+        self._by_relation: Dict[str, List[int]] = defaultdict(list)
+        self._children: Dict[int, List[int]] = defaultdict(list)
+
+        root = self.get("Plan")
+        if isinstance(root, dict):
+            self._build(root)
+
+    @classmethod
+    def of(cls, plan: Optional[Dict[str, Any]]) -> "PlanIndex":
+        return plan if isinstance(plan, PlanIndex) else cls(plan)
+
+    def _build(self, root: Dict[str, Any]) -> None:
+        stack = [(root, None, 0)]
+        while stack:
+            raw, parent, depth = stack.pop()
+            node = PlanNode(
+                id=len(self.nodes),
+                parent=parent,
+                depth=depth,
+                node_type=raw.get("Node Type", ""),
+                relation=raw.get("Relation Name"),
+                alias=raw.get("Alias"),
+                rows=float(raw.get("Plan Rows", 0) or 0),
+                cost=float(raw.get("Total Cost", 0) or 0),
+                raw=raw
+            )
+            self.nodes.append(node)
+            self._by_type[node.node_type].append(node.id)
+            if node.relation:
+                self._by_relation[node.relation].append(node.id)
+            if parent is not None:
+                self._children[parent].append(node.id)
+
+            # В обратном порядке, чтобы узлы нумеровались в порядке обхода плана
+            for child in reversed(raw.get("Plans", [])):
+                stack.append((child, node.id, depth + 1))
+
+    @property
+    def root(self) -> Optional[PlanNode]:
+        return self.nodes[0] if self.nodes else None
+
+    @property
+    def relations(self) -> FrozenSet[str]:
+        return frozenset(self._by_relation)
+
+    @property
+    def node_types(self) -> FrozenSet[str]:
+        return frozenset(self._by_type)
+
+    def of_type(self, *node_types: str) -> List[PlanNode]:
+        return [self.nodes[i] for node_type in node_types for i in self._by_type.get(node_type, ())]
+
+    def on_relation(self, relation: str) -> List[PlanNode]:
+        return [self.nodes[i] for i in self._by_relation.get(relation, ())]
+
+    def parent(self, node: PlanNode) -> Optional[PlanNode]:
+        return self.nodes[node.parent] if node.parent is not None else None
+
+    def children(self, node: PlanNode) -> List[PlanNode]:
+        return [self.nodes[i] for i in self._children.get(node.id, ())]
+
+    @cached_property
+    def _by_rows(self) -> List[PlanNode]:
+        return sorted(self.nodes, key=lambda node: node.rows)
+
+    @cached_property
+    def _by_cost(self) -> List[PlanNode]:
+        return sorted(self.nodes, key=lambda node: node.cost)
+
+    def rows_at_least(self, rows: float) -> List[PlanNode]:
+        """Узлы с оценкой строк не меньше rows"""
+        start = bisect_left(self._by_rows, rows, key=lambda node: node.rows)
+        return self._by_rows[start:]
+
+    def cost_at_least(self, cost: float) -> List[PlanNode]:
+        """Узлы со стоимостью не меньше cost"""
+        start = bisect_left(self._by_cost, cost, key=lambda node: node.cost)
+        return self._by_cost[start:]
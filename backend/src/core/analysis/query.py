@@ -0,0 +1,146 @@
+from bisect import bisect_right
+from functools import cached_property
+from typing import Any, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Pattern, Tuple
+
+import sqlparse
+from sqlparse.exceptions import SQLParseError
+from sqlparse.sql import Statement, Token
+
+
+class QueryToken(NamedTuple):
+    ttype: Any
+    value: str
+    offset: int  # смещение от начала запроса
+    line: int
+    col: int
+    statement: int  # номер выражения в запросе
+
+
+class ParsedQuery(str):
+    """
+    Запрос, разобранный один раз для всех правил.
+    Остаётся строкой, поэтому правила со старой сигнатурой (query, plan, context)
+    работают без изменений. Все представления вычисляются лениво и кэшируются.
+    """
+
+    @classmethod
+    def of(cls, query: str) -> "ParsedQuery":
+        return query if isinstance(query, ParsedQuery) else cls(query)
+
+    @cached_property
+    def _parsed(self) -> Tuple[List[Statement], Optional[SQLParseError]]:
+        try:
+            return list(sqlparse.parse(str(self))), None
+        except SQLParseError as e:
+            return [], e
+
+    @property
+    def statements(self) -> List[Statement]:
+        """
+        Выражения, разобранные sqlparse. Ошибка разбора тоже запоминается: слишком
+        длинный запрос разбирается один раз, а не заново в каждом правиле
+        """
+        statements, error = self._parsed
+        if error is not None:
+            raise error
+        return statements
+
+    @cached_property
+    def upper_text(self) -> str:
+        return self.upper()
+
+    @cached_property
+    def normalized(self) -> str:
+        """Запрос в одну строку со схлопнутыми пробелами"""
+        return " ".join(self.split())
+
+    @cached_property
+    def _line_starts(self) -> List[int]:
+        starts = [0]
+        position = self.find("\n")
+        while position != -1:
+            starts.append(position + 1)
+            position = self.find("\n", position + 1)
+        return starts
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        """Строка и колонка (с 1) по смещению в запросе"""
+        line = bisect_right(self._line_starts, offset)
+        return line, offset - self._line_starts[line - 1] + 1
+
+    @cached_property
+    def _tokens(self) -> Tuple[List[QueryToken], Dict[int, int], List[int]]:
+        tokens = []
+        offsets = {}
+        statement_offsets = []
+        offset = 0
+        for index, statement in enumerate(self.statements):
+            statement_start = None
+            for token in statement.flatten():
+                if statement_start is None and not token.is_whitespace:
+                    statement_start = offset
+                line, col = self.position(offset)
+                tokens.append(QueryToken(token.ttype, token.value, offset, line, col, index))
+                offsets[id(token)] = offset
+                offset += len(token.value)
+            statement_offsets.append(statement_start if statement_start is not None else offset)
+        return tokens, offsets, statement_offsets
+
+    @property
+    def tokens(self) -> List[QueryToken]:
+        """Поток токенов со смещениями, строками и колонками"""
+        return self._tokens[0]
+
+    @property
+    def statement_offsets(self) -> List[int]:
+        """Смещение первого значимого токена каждого выражения"""
+        return self._tokens[2]
+
+    def offset_of(self, token: Token) -> Optional[int]:
+        """Смещение токена sqlparse из self.statements"""
+        return self._tokens[1].get(id(token))
+
+    def position_of(self, token: Token) -> Tuple[int, int]:
+        offset = self.offset_of(token)
+        return self.position(offset) if offset is not None else (1, 1)
+
+    @cached_property
+    def statement_texts(self) -> List[str]:
+        """Непустые выражения запроса без завершающей ;"""
+        texts = []
+        for statement in self.statements:
+            text = str(statement).strip().rstrip(";").strip()
+            if text:
+                texts.append(text)
+        return texts
+
+    @cached_property
+    def keywords(self) -> FrozenSet[str]:
+        """Ключевые слова запроса в верхнем регистре (CROSS JOIN даёт CROSS, JOIN и CROSS JOIN)"""
+        keywords = set()
+        for statement in self.statements:
+            for token in statement.flatten():
+                if token.is_keyword:
+                    keywords.add(token.normalized)
+                    keywords.update(token.normalized.split())
+        return frozenset(keywords)
+
+    @cached_property
+    def token_types(self) -> FrozenSet[Any]:
+        """Типы токенов sqlparse, встречающиеся в запросе"""
+        return frozenset(token.ttype for token in self.tokens)
+
+    @cached_property
+    def _matches(self) -> Dict[Tuple[Pattern, bool], List[Any]]:
+        return {}
+
+    def finditer(self, pattern: Pattern, normalized: bool = False) -> Iterator[Any]:
+        """Совпадения предкомпилированного шаблона; результат кэшируется на запрос"""
+        key = (pattern, normalized)
+        if key not in self._matches:
+            text = self.normalized if normalized else str(self)
+            self._matches[key] = list(pattern.finditer(text))
+        return iter(self._matches[key])
+
+    def search(self, pattern: Pattern, normalized: bool = False) -> Optional[Any]:
+        return next(self.finditer(pattern, normalized), None)
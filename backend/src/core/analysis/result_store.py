@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from core.analysis.plan_cache import stats_version
+from core.settings import settings
+
+# Меняется, когда меняется формат хранимых результатов
+STORE_FORMAT_VERSION = "1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    relations TEXT NOT NULL,
+    catalog_version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at);
+"""
+
+# SQLite ограничивает число параметров в запросе
+_BATCH = 500
+
+StoredResult = Tuple[FrozenSet[str], str, str]  # отношения плана, версия каталога, JSON результата
+
+
+def _sources_version() -> str:
+    """
+    Хэш исходников анализатора и моделей результата: после обновления кода
+    сохранённые старой версией результаты не используются
+    """
+    core = Path(__file__).resolve().parent.parent
+    digest = hashlib.sha256()
+    for directory in (core / "analysis", core / "models"):
+        for path in sorted(directory.rglob("*.py")):
+            digest.update(str(path.relative_to(core)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+ANALYSIS_VERSION = _sources_version()
+
+
+def query_key(sql_query: str, namespace: str, rules_version: str, trace: bool) -> str:
+    """
+    Ключ результата: точный текст запроса (позиции диагностик и переписанный
+    запрос зависят от литералов), цель, версии кода анализатора и набора правил и trace
+    """
+    payload = "\0".join(
+        (STORE_FORMAT_VERSION, ANALYSIS_VERSION, namespace, rules_version, str(int(trace)), sql_query)
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def catalog_version(relations: FrozenSet[str], context: Mapping[str, Any]) -> str:
+    """
+    Версия каталога для отношений запроса: статистика таблиц (как у кэша планов),
+    их индексы и настройки сервера. Считается по уже загруженному контексту, без запросов к БД
+    """
+    indexes = sorted(
+        (index["schema"], index["table"], index["index"], tuple(index.get("columns") or ()))
+        for index in context.get("index_stats") or []
+        if index["table"] in relations
+    )
+    server_settings = sorted(
+        (name, value.get("setting")) for name, value in (context.get("settings") or {}).items()
+    )
+    payload = repr((stats_version(relations, context.get("table_stats") or {}), indexes, server_settings))
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class ResultStore:
+    """
+    Хранилище результатов анализа в SQLite-файле для инкрементального bulk-анализа.
+    Результат используется повторно, пока не изменились текст запроса, набор правил
+    и версия каталога по отношениям его плана. Размер ограничен max_entries:
+    вытесняются давно не использованные результаты.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Соединение SQLite нельзя наследовать через fork - открываем своё в каждом процессе
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            db.executescript(_SCHEMA)
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    def get_many(self, keys: List[str]) -> Dict[str, StoredResult]:
+        found: Dict[str, StoredResult] = {}
+        now = time.time()
+        with self._lock:
+            db = self._connection()
+            for start in range(0, len(keys), _BATCH):
+                batch = keys[start:start + _BATCH]
+                # В текст запроса подставляются только знаки ?, значения передаются параметрами
+                placeholders = ", ".join("?" * len(batch))
+                for key, relations, version, result in db.execute(
+                    f"SELECT key, relations, catalog_version, result FROM results WHERE key IN ({placeholders})",  # nosec B608
+                    batch
+                ):
+                    found[key] = (frozenset(json.loads(relations)), version, result)
+                db.execute(f"UPDATE results SET accessed_at = ? WHERE key IN ({placeholders})", [now, *batch])  # nosec B608
+        return found
+
+    def put_many(self, entries: Iterable[Tuple[str, str, FrozenSet[str], str, str]]) -> None:
+        """Записи (ключ, отпечаток, отношения, версия каталога, JSON результата)"""
+        now = time.time()
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (key, fingerprint, json.dumps(sorted(relations)), version, result, now, now)
+                        for key, fingerprint, relations, version, result in entries
+                    )
+                )
+                db.execute(
+                    "DELETE FROM results WHERE key IN ("
+                    "SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._connection().execute("SELECT count(*) FROM results").fetchone()[0]
+        return {"path": self.path, "entries": entries, "max_entries": self.max_entries}
+
+
+# Без RESULT_STORE_PATH bulk-эндпоинт анализирует все запросы заново
+result_store = ResultStore(
+    settings.RESULT_STORE_PATH,
+    settings.RESULT_STORE_MAX_ENTRIES
+) if settings.RESULT_STORE_PATH else None
@@ -1,30 +1,73 @@
-from typing import Any, Dict, List, Optional
-from importlib import import_module
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
+from core.analysis.plan_index import PlanIndex
+from core.analysis.query import ParsedQuery
+from core.metrics import rule_errors, rule_seconds
 from core.models.lint_diagnose import LintDiagnose
-from . import all_rules
+from core.models.rule_trace import RuleTrace
+from utils.logger import logger
+from . import registry
+from .triggers import rule_name
 
 
 def analyze_with_rules(
     query: str,
     plan: Optional[Dict[str, Any]] = None,
-    context: Optional[Dict[str, Any]] = None
-) -> List[LintDiagnose]:
+    context: Optional[Mapping[str, Any]] = None,
+    trace: Optional[List[RuleTrace]] = None,
+    timings: Optional[Dict[str, float]] = None
+) -> Tuple[str, List[LintDiagnose]]:
     """
-    Анализирует запрос с помощью всех загруженных правил
+    Анализирует запрос правилами, чьи условия запуска совпали с запросом и планом.
+    Если передан trace, в него записывается, какие правила запущены или пропущены и почему,
+    если timings - время каждого запущенного правила в секундах.
     """
     if context is None:
         context = {}
-    if plan is None:
-        plan = {}
 
+    # Запрос и план разбираются один раз; запрос заново - только если правило его переписало
+    query = ParsedQuery.of(query)
+    plan = PlanIndex.of(plan)
     lint_diagnoses = []
+
+    # Диспетчер берётся один раз: перезагрузка правил не затронет уже начатый анализ
+    dispatcher = registry.dispatcher
+    try:
+        selected, reasons = dispatcher.select(query, plan)
+    except Exception as e:
+        # Запрос не разобрался (например, лимит токенов sqlparse) - запускаем все правила,
+        # каждое упадёт или отработает само по себе, как без отбора по триггерам
+        logger.warning(f"Error selecting rules, running all: {e}")
+        selected = list(dispatcher.rules)
+        reasons = {id(rule_func): f"trigger selection failed: {e}" for rule_func in selected}
+    if trace is not None:
+        for rule_func in dispatcher.rules:
+            executed = id(rule_func) in reasons
+            trace.append(RuleTrace(
+                rule=rule_name(rule_func),
+                executed=executed,
+                reason=reasons[id(rule_func)] if executed else dispatcher.skip_reason(rule_func)
+            ))
     
-    for rule_func in all_rules:
+    for rule_func in selected:
+        name = rule_name(rule_func)
+        started = time.perf_counter()
         try:            
-            lint_diagnoses_new, query = rule_func(query, plan, context)
+            lint_diagnoses_new, optimized_query = rule_func(query, plan, context)
+            for diagnose in lint_diagnoses_new:
+                if diagnose.rule is None:
+                    diagnose.rule = name
             lint_diagnoses += lint_diagnoses_new
+            if optimized_query != query:
+                query = ParsedQuery.of(optimized_query)
         except Exception as e:
-            print(f"Error executing rule: {e}")
+            rule_errors.inc(name)
+            logger.warning(f"Error executing rule {name}: {e}")
+        finally:
+            elapsed = time.perf_counter() - started
+            rule_seconds.observe(elapsed, name)
+            if timings is not None:
+                timings[name] = elapsed
 
-    return query, lint_diagnoses
+    return str(query), lint_diagnoses
@@ -1,21 +1,31 @@
 # backend/src/core/analysis/rules/ast/join_optimizer.py
 from typing import Any, Dict, List, Tuple
 import re
+from core.analysis.query import ParsedQuery
+from core.analysis.rules.triggers import triggers
 from core.models.lint_diagnose import LintDiagnose
+from utils.logger import logger
 
+_CROSS_JOIN_RE = re.compile(r'CROSS JOIN\s+(\w+)', re.IGNORECASE)
+_JOIN_WITHOUT_CONDITION_RE = re.compile(r'JOIN\s+\w+(?:\s+\w+)?(?:\s+WHERE|\s+ORDER BY|\s+GROUP BY|$|;)', re.IGNORECASE)
+_FROM_ALIAS_RE = re.compile(r'FROM\s+(\w+)\s+(\w+)', re.IGNORECASE)
+
+@triggers(keywords=['JOIN'])
 def rule_join_optimizer(query: str, plan: Dict[str, Any], context: Dict[str, Any]) -> Tuple[List[LintDiagnose], str]:
     """Обнаруживает и оптимизирует сложные JOIN"""
+    query = ParsedQuery.of(query)
     recommendations = []
     optimized_query = query
     
     try:
         # 1. Cartesian JOIN (CROSS JOIN или JOIN без условия)
-        if 'CROSS JOIN' in query.upper():
-            cross_match = re.search(r'CROSS JOIN\s+(\w+)', query, re.IGNORECASE)
+        if 'CROSS JOIN' in query.upper_text:
+            cross_match = query.search(_CROSS_JOIN_RE)
             if cross_match:
+                line, col = query.position(cross_match.start())
                 diagnose = LintDiagnose(
-                    line=1,
-                    col=cross_match.start() + 1,
+                    line=line,
+                    col=col,
                     severity="HIGH",
                     message="CROSS JOIN может быть очень ресурсоемким",
                     recommendation="Убедитесь, что CROSS JOIN действительно необходим, или замените на INNER JOIN с условием"
@@ -23,11 +33,12 @@ def rule_join_optimizer(query: str, plan: Dict[str, Any], context: Dict[str, Any
                 recommendations.append(diagnose)
         
         # 2. JOIN без условия (неявный Cartesian)
-        join_without_on = re.search(r'JOIN\s+\w+(?:\s+\w+)?(?:\s+WHERE|\s+ORDER BY|\s+GROUP BY|$|;)', query, re.IGNORECASE)
-        if join_without_on and ' ON ' not in query.upper() and ' USING ' not in query.upper():
+        join_without_on = query.search(_JOIN_WITHOUT_CONDITION_RE)
+        if join_without_on and ' ON ' not in query.upper_text and ' USING ' not in query.upper_text:
+            line, col = query.position(join_without_on.start())
             diagnose = LintDiagnose(
-                line=1,
-                col=join_without_on.start() + 1,
+                line=line,
+                col=col,
                 severity="HIGH",
                 message="JOIN без условия может создавать Cartesian product",
                 recommendation="Добавьте условие ON или USING для JOIN"
@@ -35,7 +46,7 @@ def rule_join_optimizer(query: str, plan: Dict[str, Any], context: Dict[str, Any
             recommendations.append(diagnose)
         
         # 3. Слишком много JOIN в одном запросе
-        join_count = query.upper().count(' JOIN ')
+        join_count = query.upper_text.count(' JOIN ')
         if join_count > 3:
             diagnose = LintDiagnose(
                 line=1,
@@ -51,14 +62,14 @@ def rule_join_optimizer(query: str, plan: Dict[str, Any], context: Dict[str, Any
                 optimized_query = convert_joins_to_cte(query)
     
     except Exception as e:
-        print(f"Error in join_optimizer rule: {e}")
+        logger.warning(f"Error in join_optimizer rule: {e}")
     
     return recommendations, optimized_query
 
 def convert_joins_to_cte(query: str) -> str:
     """Преобразует сложные JOIN в CTE для улучшения читаемости"""
     # Простая эвристика: находим основной FROM и преобразуем в CTE
-    from_match = re.search(r'FROM\s+(\w+)\s+(\w+)', query, re.IGNORECASE)
+    from_match = _FROM_ALIAS_RE.search(query)
     if from_match:
         table, alias = from_match.groups()
         cte_query = f"""
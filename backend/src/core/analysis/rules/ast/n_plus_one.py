@@ -1,27 +1,34 @@
 # backend/src/core/analysis/rules/ast/n_plus_one_optimizer.py
 from typing import Any, Dict, List, Tuple
 import re
+from core.analysis.query import ParsedQuery
+from core.analysis.rules.triggers import triggers
 from core.models.lint_diagnose import LintDiagnose
+from utils.logger import logger
 
+_ID_CONDITION_RE = re.compile(r'WHERE\s+(\w+\.)?id\s*=\s*(\d+)', re.IGNORECASE)
+_FROM_RE = re.compile(r'FROM\s+(\w+)', re.IGNORECASE)
+_IN_SELECT_RE = re.compile(r'IN\s*\(\s*SELECT', re.IGNORECASE)
+_IN_SUBQUERY_RE = re.compile(r'(\w+)\s+IN\s*\(\s*SELECT\s+(\w+)\s+FROM\s+(\w+)(?:\s+WHERE\s+(.*?))?\s*\)', re.IGNORECASE)
+
+@triggers(keywords=['IN'], multi_statement=True)
 def rule_n_plus_one_optimizer(query: str, plan: Dict[str, Any], context: Dict[str, Any]) -> Tuple[List[LintDiagnose], str]:
     """Обнаруживает и оптимизирует N+1 проблемы"""
+    query = ParsedQuery.of(query)
     recommendations = []
     optimized_query = query
     
     try:
-        # Нормализуем запрос
-        normalized_query = ' '.join(query.replace('\n', ' ').split())
+        normalized_query = query.normalized
         
         # 1. Множественные SELECT запросы с похожими условиями
-        if normalized_query.count('SELECT') > 1 and normalized_query.count(';') >= 1:
-            # Разделяем запросы
-            queries = [q.strip() for q in normalized_query.split(';') if q.strip()]
-            select_queries = [q for q in queries if q.upper().startswith('SELECT')]
+        if len(query.statement_texts) > 1:
+            select_queries = [q for q in query.statement_texts if q.upper().startswith('SELECT')]
             
             # Ищем запросы с условиями WHERE по ID
             id_queries = []
             for q in select_queries:
-                id_match = re.search(r'WHERE\s+(\w+\.)?id\s*=\s*(\d+)', q, re.IGNORECASE)
+                id_match = _ID_CONDITION_RE.search(q)
                 if id_match:
                     id_queries.append((q, id_match.group(2)))
             
@@ -29,7 +36,7 @@ def rule_n_plus_one_optimizer(query: str, plan: Dict[str, Any], context: Dict[st
             if len(id_queries) >= 2:
                 # Извлекаем таблицу и условия
                 first_query = id_queries[0][0]
-                table_match = re.search(r'FROM\s+(\w+)', first_query, re.IGNORECASE)
+                table_match = _FROM_RE.search(first_query)
                 
                 if table_match:
                     table_name = table_match.group(1)
@@ -38,9 +45,10 @@ def rule_n_plus_one_optimizer(query: str, plan: Dict[str, Any], context: Dict[st
                     # Создаем оптимизированный запрос
                     optimized_query = f"SELECT * FROM {table_name} WHERE id IN ({', '.join(ids)})"
                     
+                    line, col = query.position(max(query.find(first_query), 0))
                     diagnose = LintDiagnose(
-                        line=1,
-                        col=1,
+                        line=line,
+                        col=col,
                         severity="HIGH",
                         message="Обнаружена N+1 проблема: множественные запросы по разным ID",
                         recommendation=f"Объединено в один запрос с IN условием"
@@ -48,10 +56,9 @@ def rule_n_plus_one_optimizer(query: str, plan: Dict[str, Any], context: Dict[st
                     recommendations.append(diagnose)
         
         # 2. IN с подзапросом (может быть неэффективным)
-        if re.search(r'IN\s*\(\s*SELECT', normalized_query, re.IGNORECASE):
+        if query.search(_IN_SELECT_RE, normalized=True):
             # Пытаемся преобразовать IN (SELECT) в JOIN
-            in_match = re.search(r'(\w+)\s+IN\s*\(\s*SELECT\s+(\w+)\s+FROM\s+(\w+)(?:\s+WHERE\s+(.*?))?\s*\)', 
-                                normalized_query, re.IGNORECASE)
+            in_match = query.search(_IN_SUBQUERY_RE, normalized=True)
             
             if in_match:
                 left_col, right_col, table, where_condition = in_match.groups()
@@ -65,9 +72,12 @@ INNER JOIN {table} ON {join_condition}
 {"WHERE " + where_condition if where_condition else ""}
 """.strip()
                 
+                # Позицию берём из исходного текста, а не из нормализованного
+                raw_match = query.search(_IN_SUBQUERY_RE)
+                line, col = query.position(raw_match.start()) if raw_match else (1, 1)
                 diagnose = LintDiagnose(
-                    line=1,
-                    col=in_match.start() + 1,
+                    line=line,
+                    col=col,
                     severity="MEDIUM",
                     message="IN с подзапросом может быть неэффективным",
                     recommendation="Заменено на JOIN для лучшей производительности"
@@ -75,6 +85,6 @@ INNER JOIN {table} ON {join_condition}
                 recommendations.append(diagnose)
     
     except Exception as e:
-        print(f"Error in n_plus_one_optimizer rule: {e}")
+        logger.warning(f"Error in n_plus_one_optimizer rule: {e}")
     
     return recommendations, optimized_query
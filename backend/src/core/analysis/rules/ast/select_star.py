@@ -2,37 +2,32 @@ from typing import Any, Dict, List
 
 import sqlparse
 
+from core.analysis.query import ParsedQuery
+from core.analysis.rules.triggers import triggers
 from core.models.lint_diagnose import LintDiagnose
+from utils.logger import logger
 
 
+@triggers(token_types=[sqlparse.tokens.Wildcard])
 def rule_select_star(query: str, plan: Dict[str, Any], context: Dict[str, Any]) -> List[LintDiagnose]:
     """
     Обнаруживает использование SELECT * в запросах
     """
+    query = ParsedQuery.of(query)
     recommendations = []
     optimized_query = query
 
     try:
-        parsed = sqlparse.parse(query)
-
-        for statement in parsed:
+        for statement in query.statements:
             for token in statement.tokens:
                 if (hasattr(token, 'ttype') and
                     token.ttype is sqlparse.tokens.Wildcard and
                     str(token).strip() == "*"):
 
-
-                    col = 1
-
-                    if hasattr(statement, 'token_index'):
-                        token_index = statement.token_index(token)
-                        if token_index != -1:
-                            col = query.find('*', max(0, query.find('select') + 6))
-                            if col == -1:
-                                col = 1
+                    line, col = query.position_of(token)
 
                     diagnose = LintDiagnose(
-                        line=1,
+                        line=line,
                         col=col,
                         severity="MEDIUM",
                         message="Обнаружено использование SELECT * в запросе",
@@ -43,6 +38,6 @@ def rule_select_star(query: str, plan: Dict[str, Any], context: Dict[str, Any])
                     break
 
     except Exception as e:
-        print(f"Error in select_star rule: {e}")
+        logger.warning(f"Error in select_star rule: {e}")
 
     return recommendations, optimized_query #ty: ignore
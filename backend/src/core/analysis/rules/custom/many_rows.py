@@ -1,17 +1,28 @@
 # backend/src/core/analysis/rules/custom/many_rows.py
+import re
 from typing import Any, Dict, List, Tuple
+from core.analysis.plan_index import PlanIndex
+from core.analysis.query import ParsedQuery
 from core.models.lint_diagnose import LintDiagnose
+from utils.logger import logger
+
+# Лексическая проверка: правилу по плану не нужен полный разбор sqlparse
+_LIMIT_RE = re.compile(r"\bLIMIT\b")
 
 def rule_many_rows(query: str, plan: Dict[str, Any], context: Dict[str, Any]) -> Tuple[List[LintDiagnose], str]:
     """Обнаруживает запросы, возвращающие много строк"""
+    query = ParsedQuery.of(query)
     recommendations = []
     optimized_query = query
     
     try:
-        if plan and 'Plan' in plan:
-            plan_rows = plan['Plan'].get('Plan Rows', 0)
+        root = PlanIndex.of(plan).root
+        if root is not None:
+            plan_rows = int(root.rows)
             
-            if plan_rows > 1000 and 'LIMIT' not in query.upper():
+            # Подстрока ищется быстро; регулярное выражение - только чтобы отсеять имена вроде LIMITS
+            has_limit = "LIMIT" in query.upper_text and _LIMIT_RE.search(query.upper_text)
+            if plan_rows > 1000 and not has_limit:
                 diagnose = LintDiagnose(
                     line=1,
                     col=1,
@@ -22,6 +33,6 @@ def rule_many_rows(query: str, plan: Dict[str, Any], context: Dict[str, Any]) ->
                 recommendations.append(diagnose)
     
     except Exception as e:
-        print(f"Error in many_rows rule: {e}")
+        logger.warning(f"Error in many_rows rule: {e}")
     
     return recommendations, optimized_query
@@ -1,56 +1,84 @@
 # backend/src/core/analysis/rules/custom/seq_scan_optimizer.py
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import re
+from core.analysis.plan_filter import filter_comparisons
+from core.analysis.plan_index import PlanIndex
+from core.analysis.query import ParsedQuery
+from core.analysis.rules.triggers import triggers
 from core.models.lint_diagnose import LintDiagnose
+from utils.logger import logger
 
+_WHERE_RE = re.compile(r'WHERE\s+(.*?)(?:\s+ORDER BY|\s+GROUP BY|\s+LIMIT|$)', re.IGNORECASE)
+_CONDITION_RE = re.compile(r'(\w+)\s*[=<>!]+\s*')
+
+@triggers(node_types=['Seq Scan'])
 def rule_seq_scan_optimizer(query: str, plan: Dict[str, Any], context: Dict[str, Any]) -> Tuple[List[LintDiagnose], str]:
     """Обнаруживает Seq Scan и рекомендует индексы, а также оптимизирует запрос"""
+    query = ParsedQuery.of(query)
     recommendations = []
     optimized_query = query
     
     try:
-        if plan and 'Plan' in plan:
-            plan_str = str(plan)
-            
-            # Ищем Seq Scan в плане выполнения
-            if 'Seq Scan' in plan_str:
-                # Извлекаем имя таблицы
-                table_match = re.search(r'Relation Name\": \"(\w+)\"', plan_str)
-                table_name = table_match.group(1) if table_match else "unknown"
-                
-                # Анализируем WHERE условия для рекомендаций по индексам
-                where_conditions = extract_where_conditions(query)
-                
-                # Создаем рекомендацию
+        plan = PlanIndex.of(plan)
+        seq_scans = plan.of_type("Seq Scan")
+
+        if seq_scans:
+            # Анализируем WHERE условия для рекомендаций по индексам
+            where_conditions = extract_where_conditions(query)
+            hinted_columns = []
+
+            # Рекомендация на каждый Seq Scan в плане, а не только на первый
+            for node in seq_scans:
+                table_name = node.relation or "unknown"
+                # Колонки из фильтра узла точнее, чем разбор WHERE всего запроса
+                columns = extract_filter_columns(node.raw.get("Filter")) or where_conditions
+                line, col = find_relation(query, node.relation)
+
                 diagnose = LintDiagnose(
-                    line=1,
-                    col=1,
+                    line=line,
+                    col=col,
                     severity="HIGH",
                     message=f"Seq Scan обнаружен на таблице {table_name}",
-                    recommendation=f"Добавьте индекс на колонки, используемые в условиях WHERE: {', '.join(where_conditions)}"
+                    recommendation=f"Добавьте индекс на колонки, используемые в условиях WHERE: {', '.join(columns)}"
                 )
                 recommendations.append(diagnose)
-                
-                # Пытаемся оптимизировать запрос, добавляя подсказки для использования индекса
-                if where_conditions:
-                    optimized_query = add_index_hints(query, where_conditions)
+                hinted_columns += [column for column in columns if column not in hinted_columns]
+
+            # Пытаемся оптимизировать запрос, добавляя подсказки для использования индекса
+            if hinted_columns:
+                optimized_query = add_index_hints(query, hinted_columns)
     
     except Exception as e:
-        print(f"Error in seq_scan_optimizer rule: {e}")
+        logger.warning(f"Error in seq_scan_optimizer rule: {e}")
     
     return recommendations, optimized_query
 
 def extract_where_conditions(query: str) -> List[str]:
     """Извлекает условия WHERE из запроса"""
     conditions = []
-    where_match = re.search(r'WHERE\s+(.*?)(?:\s+ORDER BY|\s+GROUP BY|\s+LIMIT|$)', query, re.IGNORECASE)
+    where_match = ParsedQuery.of(query).search(_WHERE_RE)
     if where_match:
         where_clause = where_match.group(1)
         # Ищем простые условия с колонками
-        condition_pattern = r'(\w+)\s*[=<>!]+\s*'
-        conditions = re.findall(condition_pattern, where_clause)
+        conditions = _CONDITION_RE.findall(where_clause)
     return conditions
 
+def extract_filter_columns(filter_expr: Optional[str]) -> List[str]:
+    """Извлекает колонки из условия Filter узла плана (без приведений типов вроде ::text)"""
+    columns = []
+    for column, _ in filter_comparisons(filter_expr):
+        if column not in columns:
+            columns.append(column)
+    return columns
+
+def find_relation(query: ParsedQuery, relation: Optional[str]) -> Tuple[int, int]:
+    """Позиция первого упоминания таблицы в запросе"""
+    if relation:
+        match = re.search(rf'\b{re.escape(relation)}\b', query, re.IGNORECASE)
+        if match:
+            return query.position(match.start())
+    return 1, 1
+
 def add_index_hints(query: str, conditions: List[str]) -> str:
     """Добавляет комментарии с подсказками по индексам (в реальной системе это были бы настоящие хинты)"""
     # В PostgreSQL нет прямых хинтов как в MySQL, но мы можем добавить комментарии с рекомендациями
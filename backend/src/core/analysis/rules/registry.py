@@ -0,0 +1,280 @@
+import asyncio
+import hashlib
+import json
+import sys
+import threading
+from datetime import datetime, timezone
+from importlib import import_module
+from importlib.metadata import entry_points
+from importlib.util import find_spec, module_from_spec
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.logger import logger
+from .triggers import RuleDispatcher
+
+RULE_PREFIX = "rule_"
+# Внешние пакеты регистрируют модули с правилами в этой группе entry points
+ENTRY_POINT_GROUP = "sql_analysis.rules"
+MANIFEST_VERSION = 1
+
+
+class RuleLoadError(Exception):
+    """Правила не удалось загрузить: ошибка импорта или конфликт идентификаторов"""
+
+
+class DuplicateRuleError(RuleLoadError):
+    pass
+
+
+def rule_id(rule_func: Callable) -> str:
+    """Идентификатор правила - имя функции, уникален среди всех модулей"""
+    return getattr(rule_func, "__name__", repr(rule_func))
+
+
+def _stat(path: Optional[str]) -> Tuple[int, int]:
+    if path is None:
+        return 0, 0
+    stat = Path(path).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _module_rules(module: ModuleType) -> List[Callable]:
+    """Правила, объявленные в самом модуле (импортированные из других не считаются)"""
+    return [
+        attr for name, attr in vars(module).items()
+        if name.startswith(RULE_PREFIX) and callable(attr)
+        and getattr(attr, "__module__", None) == module.__name__
+    ]
+
+
+def _rules_version(rules: Dict[str, List[Callable]]) -> str:
+    """Хэш исходников модулей и порядка правил: одинаков для одного и того же кода, mtime не влияет"""
+    digest = hashlib.sha256()
+    for name, module_rules in rules.items():
+        digest.update(name.encode())
+        path = getattr(sys.modules.get(name), "__file__", None)
+        if path:
+            digest.update(Path(path).read_bytes())
+        digest.update(",".join(rule_id(rule_func) for rule_func in module_rules).encode())
+    return digest.hexdigest()[:16]
+
+
+def _check_duplicates(rules_by_module: Dict[str, List[Callable]]) -> None:
+    owners: Dict[str, str] = {}
+    for module_name, rules in rules_by_module.items():
+        for rule_func in rules:
+            owner = owners.setdefault(rule_id(rule_func), module_name)
+            if owner != module_name:
+                raise DuplicateRuleError(
+                    f"Rule {rule_id(rule_func)} is defined in both {owner} and {module_name}"
+                )
+
+
+class RuleRegistry:
+    """
+    Реестр правил. Модули с правилами - файлы подпакетов и модули из entry points.
+    Манифест хранит для каждого модуля размер, mtime и имена правил: при запуске
+    правила неизменённых модулей берутся по имени без обхода модуля. Изменённые
+    модули перезагружаются на месте: новый диспетчер подменяет старый целиком,
+    а выполняющиеся запросы дорабатывают со старым.
+    """
+
+    def __init__(self, package: str, subpackages: List[str], manifest_path: Path):
+        self.package = package
+        self.subpackages = subpackages
+        self.manifest_path = manifest_path
+        self.dispatcher = RuleDispatcher([])
+        self.version = ""
+        self.loaded_at: Optional[datetime] = None
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        # модуль -> (mtime_ns, size) и правила модуля
+        self._stats: Dict[str, Tuple[int, int]] = {}
+        self._rules: Dict[str, List[Callable]] = {}
+        self._rejected: Optional[Dict[str, Tuple[int, int]]] = None
+        self._lock = threading.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+
+    @property
+    def rules(self) -> List[Callable]:
+        return self.dispatcher.rules
+
+    def _discover(self) -> Dict[str, Optional[str]]:
+        """Имена модулей с правилами и пути к их файлам, в детерминированном порядке"""
+        package_dir = Path(sys.modules[self.package].__file__).parent  # type: ignore
+        modules: Dict[str, Optional[str]] = {}
+        for subpackage in self.subpackages:
+            for py_file in sorted((package_dir / subpackage).glob("*.py")):
+                if not py_file.stem.startswith("_"):
+                    modules[f"{self.package}.{subpackage}.{py_file.stem}"] = str(py_file)
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            spec = find_spec(entry_point.module)
+            if spec is None:
+                logger.error(f"Rule plugin {entry_point.name}: module {entry_point.module} not found")
+                continue
+            modules[entry_point.module] = spec.origin if spec.has_location else None
+        return modules
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            manifest = json.loads(self.manifest_path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return manifest.get("modules", {})
+
+    def _manifest(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "mtime_ns": self._stats[name][0],
+                "size": self._stats[name][1],
+                "rules": [rule_id(rule_func) for rule_func in rules],
+            }
+            for name, rules in self._rules.items()
+        }
+
+    def _write_manifest(self) -> None:
+        manifest = {"version": MANIFEST_VERSION, "modules": self._manifest()}
+        try:
+            self.manifest_path.write_text(json.dumps(manifest, indent=2))
+        except OSError as e:
+            logger.warning(f"Failed to write rule manifest {self.manifest_path}: {e}")
+
+    def load(self) -> None:
+        """Первичная загрузка правил; конфликт идентификаторов - ошибка запуска"""
+        manifest = self._read_manifest()
+        stats: Dict[str, Tuple[int, int]] = {}
+        rules: Dict[str, List[Callable]] = {}
+        for name, path in self._discover().items():
+            # Модуль с ошибкой импорта перезагрузится, когда его файл изменят
+            stats[name] = _stat(path)
+            try:
+                module = import_module(name)
+            except Exception as e:
+                logger.error(f"Error importing rule module {name}: {e}")
+                continue
+            cached = manifest.get(name)
+            if cached and (cached["mtime_ns"], cached["size"]) == stats[name] and all(
+                hasattr(module, rule) for rule in cached["rules"]
+            ):
+                rules[name] = [getattr(module, rule) for rule in cached["rules"]]
+            else:
+                rules[name] = _module_rules(module)
+
+        _check_duplicates(rules)
+        self._swap(stats, rules)
+        if self._manifest() != manifest:
+            self._write_manifest()
+
+    def _swap(self, stats: Dict[str, Tuple[int, int]], rules: Dict[str, List[Callable]]) -> None:
+        self._stats = stats
+        self._rules = rules
+        # Одно присваивание: запрос берёт диспетчер один раз и видит либо старый, либо новый набор
+        self.dispatcher = RuleDispatcher([rule_func for module_rules in rules.values() for rule_func in module_rules])
+        self.version = _rules_version(rules)
+        self.loaded_at = datetime.now(timezone.utc)
+
+    @staticmethod
+    def _exec_fresh(name: str, path: str) -> ModuleType:
+        """
+        Исполняет модуль заново в новом объекте модуля: функции старой версии
+        сохраняют свои глобальные переменные, пока их дорабатывают запросы
+        """
+        spec = find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError(name)
+        module = module_from_spec(spec)
+        # Модуль должен быть в sys.modules во время исполнения (например, для dataclass);
+        # при ошибке reload_changed вернёт прежний
+        sys.modules[name] = module
+        # Компилируем из исходника: кэш .pyc, который использует spec.loader.exec_module,
+        # проверяется по mtime с точностью до секунды и пропустил бы быструю правку.
+        # Исполняется файл модуля правил из пакета - то же, что делает обычный импорт
+        code = compile(Path(path).read_bytes(), path, "exec")
+        exec(code, module.__dict__)  # nosec B102
+        return module
+
+    def reload_changed(self) -> List[str]:
+        """
+        Перезагружает добавленные, изменённые и удалённые модули правил.
+        При ошибке остаётся прежний набор правил и выбрасывается RuleLoadError.
+        Возвращает имена затронутых модулей.
+        """
+        with self._lock:
+            discovered = self._discover()
+            stats = {name: _stat(path) for name, path in discovered.items()}
+            changed = [name for name in discovered if self._stats.get(name) != stats[name]]
+            removed = [name for name in self._stats if name not in discovered]
+            # Отклонённую версию файлов не перезагружаем повторно, пока их не изменят
+            if not changed and not removed or stats == self._rejected:
+                return []
+
+            rules = {name: module_rules for name, module_rules in self._rules.items() if name in discovered}
+            previous = {name: sys.modules.get(name) for name in changed}
+            try:
+                for name in changed:
+                    path = discovered[name]
+                    if path is None:
+                        raise RuleLoadError(f"Rule module {name} has no source file to reload")
+                    module = self._exec_fresh(name, path)
+                    rules[name] = _module_rules(module)
+                # Порядок модулей - как при обнаружении
+                rules = {name: rules[name] for name in discovered if name in rules}
+                _check_duplicates(rules)
+            except Exception as e:
+                for name, module in previous.items():
+                    if module is None:
+                        sys.modules.pop(name, None)
+                    else:
+                        sys.modules[name] = module
+                self._rejected = stats
+                self.last_error = str(e)
+                logger.error(f"Rule reload rejected, keeping previous rules: {e}")
+                if isinstance(e, RuleLoadError):
+                    raise
+                raise RuleLoadError(f"{type(e).__name__}: {e}") from e
+
+            for name in removed:
+                sys.modules.pop(name, None)
+            self._swap(stats, rules)
+            self.reloads += 1
+            self._rejected = None
+            self.last_error = None
+            self._write_manifest()
+            affected = changed + removed
+            logger.info(f"Rules reloaded: {', '.join(affected)}")
+            return affected
+
+    async def _watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload_changed)
+            except RuleLoadError:
+                pass  # уже записано в лог, проверим снова на следующем шаге
+
+    def start(self, interval: float) -> None:
+        """Фоновая проверка изменений модулей правил каждые interval секунд (0 - выключено)"""
+        if interval > 0:
+            self._watcher = asyncio.create_task(self._watch(interval), name="rule-reloader")
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "loaded_at": self.loaded_at,
+            "version": self.version,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+            "modules": {
+                name: [rule_id(rule_func) for rule_func in rules]
+                for name, rules in self._rules.items()
+            },
+        }
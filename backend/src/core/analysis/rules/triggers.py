@@ -0,0 +1,107 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from core.analysis.plan_index import PlanIndex
+from core.analysis.query import ParsedQuery
+
+
+@dataclass(frozen=True)
+class RuleTriggers:
+    """
+    Условия запуска правила. Правило запускается, если сработало хотя бы одно:
+    в запросе есть ключевое слово или тип токена, в плане есть тип узла,
+    или в запросе несколько выражений (multi_statement).
+    """
+    keywords: FrozenSet[str] = frozenset()
+    token_types: FrozenSet[Any] = frozenset()
+    node_types: FrozenSet[str] = frozenset()
+    multi_statement: bool = False
+
+
+def triggers(
+    keywords: Iterable[str] = (),
+    token_types: Iterable[Any] = (),
+    node_types: Iterable[str] = (),
+    multi_statement: bool = False
+) -> Callable[[Callable], Callable]:
+    """Декоратор, объявляющий условия запуска правила"""
+    def decorator(rule_func: Callable) -> Callable:
+        rule_func.triggers = RuleTriggers(  # type: ignore
+            keywords=frozenset(keyword.upper() for keyword in keywords),
+            token_types=frozenset(token_types),
+            node_types=frozenset(node_types),
+            multi_statement=multi_statement
+        )
+        return rule_func
+    return decorator
+
+
+def rule_name(rule_func: Callable) -> str:
+    return f"{rule_func.__module__}.{getattr(rule_func, '__name__', repr(rule_func))}"
+
+
+class RuleDispatcher:
+    """
+    Индекс правил по условиям запуска, строится один раз при загрузке правил.
+    Для запроса выбираются только правила, чьи условия совпали; правила без
+    объявленных условий запускаются всегда.
+    """
+
+    def __init__(self, rules: List[Callable]):
+        self.rules = rules
+        self._always: List[Callable] = []
+        self._multi_statement: List[Callable] = []
+        self._by_keyword: Dict[str, List[Callable]] = defaultdict(list)
+        self._by_token_type: Dict[Any, List[Callable]] = defaultdict(list)
+        self._by_node_type: Dict[str, List[Callable]] = defaultdict(list)
+
+        for rule_func in rules:
+            rule_triggers: Optional[RuleTriggers] = getattr(rule_func, "triggers", None)
+            if rule_triggers is None:
+                self._always.append(rule_func)
+                continue
+            for keyword in rule_triggers.keywords:
+                self._by_keyword[keyword].append(rule_func)
+            for token_type in rule_triggers.token_types:
+                self._by_token_type[token_type].append(rule_func)
+            for node_type in rule_triggers.node_types:
+                self._by_node_type[node_type].append(rule_func)
+            if rule_triggers.multi_statement:
+                self._multi_statement.append(rule_func)
+
+    def select(self, query: ParsedQuery, plan: PlanIndex) -> Tuple[List[Callable], Dict[int, str]]:
+        """
+        Правила для запроса в порядке регистрации и причина запуска каждого
+        (ключ словаря - id функции правила)
+        """
+        reasons: Dict[int, str] = {}
+
+        def add(rule_funcs: Iterable[Callable], reason: str) -> None:
+            for rule_func in rule_funcs:
+                reasons.setdefault(id(rule_func), reason)
+
+        add(self._always, "no triggers declared")
+        for keyword in query.keywords & self._by_keyword.keys():
+            add(self._by_keyword[keyword], f"keyword {keyword}")
+        for token_type in query.token_types & self._by_token_type.keys():
+            add(self._by_token_type[token_type], f"token type {token_type}")
+        for node_type in plan.node_types & self._by_node_type.keys():
+            add(self._by_node_type[node_type], f"plan node {node_type}")
+        if len(query.statement_texts) > 1:
+            add(self._multi_statement, "multiple statements")
+
+        selected = [rule_func for rule_func in self.rules if id(rule_func) in reasons]
+        return selected, reasons
+
+    @staticmethod
+    def skip_reason(rule_func: Callable) -> str:
+        rule_triggers: RuleTriggers = getattr(rule_func, "triggers")
+        expected = [
+            *sorted(rule_triggers.keywords),
+            *(str(token_type) for token_type in rule_triggers.token_types),
+            *(f"plan node {node_type}" for node_type in sorted(rule_triggers.node_types)),
+        ]
+        if rule_triggers.multi_statement:
+            expected.append("multiple statements")
+        return f"no matching triggers (expected any of: {', '.join(expected)})"
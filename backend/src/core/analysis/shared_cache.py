@@ -0,0 +1,151 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from core.analysis.offline import json_default, json_object_hook
+from core.settings import settings
+from utils.logger import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);
+"""
+
+# Время последнего чтения обновляется не чаще, чтобы чтения не становились записями
+_TOUCH_INTERVAL = 60.0
+
+
+class SharedCache:
+    """
+    Кэш в локальном SQLite-файле (WAL), общий для всех воркеров на хосте.
+    Размер ограничен max_bytes: вытесняются давно не читанные записи.
+    Обновление записи защищено арендой: пока один воркер обновляет запись,
+    остальные читают предыдущую версию. Значения хранятся в JSON: кортежи
+    возвращаются списками, даты и время восстанавливаются.
+    """
+
+    def __init__(self, path: str, max_bytes: int, lease_seconds: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Соединение SQLite нельзя наследовать через fork - открываем своё в каждом процессе
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            db.executescript(_SCHEMA)
+            self._db, self._pid = db, os.getpid()
+            self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        return self._db
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Значение и время записи (time.time()) или None"""
+        try:
+            with self._lock:
+                db = self._connection()
+                row = db.execute(
+                    "SELECT value, stored_at, accessed_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                if now - row[2] > _TOUCH_INTERVAL:
+                    db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            return json.loads(row[0], object_hook=json_object_hook), row[1]
+        except Exception as e:
+            logger.warning(f"Shared cache read failed for {key}: {e}")
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        """Записывает значение, снимает аренду этого воркера и вытесняет лишнее"""
+        blob = json.dumps(value, default=json_default).encode()
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._connection()
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    db.execute(
+                        "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                        (key, blob, len(blob), now, now)
+                    )
+                    db.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+                    db.execute("""
+                        DELETE FROM entries WHERE key IN (
+                            SELECT key FROM (
+                                SELECT key, sum(size) OVER (ORDER BY accessed_at DESC, key) AS total
+                                FROM entries
+                            ) WHERE total > ?
+                        )
+                    """, (self.max_bytes,))
+                    db.execute("COMMIT")
+                except BaseException:
+                    db.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache write failed for {key}: {e}")
+
+    def acquire(self, key: str) -> bool:
+        """
+        Аренда на обновление записи. False - запись уже обновляет другой воркер.
+        Если воркер упал, аренда истекает через lease_seconds.
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                cursor = self._connection().execute("""
+                    INSERT INTO leases VALUES (?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                    WHERE leases.expires_at < ? OR leases.owner = excluded.owner
+                """, (key, self.owner, now + self.lease_seconds, now))
+                return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            # Без кэша каждый воркер обновляет запись сам
+            logger.warning(f"Shared cache lease failed for {key}: {e}")
+            return True
+
+    def release(self, key: str) -> None:
+        try:
+            with self._lock:
+                self._connection().execute(
+                    "DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache release failed for {key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT count(*), coalesce(sum(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# Без SHARED_CACHE_PATH кэши остаются только в памяти процесса
+shared_cache = SharedCache(
+    settings.SHARED_CACHE_PATH,
+    settings.SHARED_CACHE_MAX_BYTES,
+    settings.SHARED_CACHE_LEASE
+) if settings.SHARED_CACHE_PATH else None
@@ -0,0 +1,173 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from psycopg_pool import AsyncConnectionPool
+
+from core.analysis.context import SECTION_LOADERS
+from core.analysis.shared_cache import SharedCache, shared_cache
+from core.pool import pool
+from core.settings import settings
+from utils.logger import logger
+
+
+@dataclass(frozen=True)
+class SectionSnapshot:
+    """Неизменяемый снимок одной секции контекста"""
+    data: Any
+    loaded_at: float  # time.monotonic() момента загрузки
+    refreshed_at: datetime
+    duration: float  # время загрузки секции, сек
+
+
+class ContextSnapshotService:
+    """
+    Держит в памяти снимок контекста БД и обновляет его в фоне.
+    Каждая секция обновляется по своему TTL, новый снимок подменяет старый целиком,
+    поэтому запросы читают контекст без обращений к БД. С общим кэшем (shared)
+    секцию из каталога читает один воркер на хосте, остальные берут её из кэша.
+    """
+
+    def __init__(
+        self,
+        pool: AsyncConnectionPool,
+        ttls: Dict[str, float],
+        shared: Optional[SharedCache] = None,
+        namespace: str = "default"
+    ):
+        self._pool = pool
+        self._ttls = ttls
+        self._shared = shared
+        self._namespace = namespace
+        self._sections: Dict[str, SectionSnapshot] = {}
+        self._errors: Dict[str, str] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def ready(self) -> bool:
+        """Все секции загружены хотя бы один раз"""
+        return all(name in self._sections for name in self._ttls)
+
+    async def start(self) -> None:
+        """Первичная загрузка всех секций и запуск фоновых обновлений"""
+        await asyncio.gather(*(self.refresh(name) for name in self._ttls))
+        self._tasks = [
+            asyncio.create_task(self._refresh_loop(name), name=f"context-refresh-{name}")
+            for name in self._ttls
+        ]
+        logger.info("Context snapshot service started")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Context snapshot service stopped")
+
+    def _shared_key(self, name: str) -> str:
+        return f"context:{self._namespace}:{name}"
+
+    async def _adopt_shared(self, name: str) -> bool:
+        """
+        Берёт секцию из общего кэша, если там версия новее своей.
+        True - секция устарела и обновлять её из БД должен этот воркер.
+        """
+        key = self._shared_key(name)
+        cached = await asyncio.to_thread(self._shared.get, key)  # type: ignore
+        if cached is not None:
+            (data, refreshed_at, duration), stored_at = cached
+            age = max(0.0, time.time() - stored_at)
+            current = self._sections.get(name)
+            if current is None or current.refreshed_at < refreshed_at:
+                section = SectionSnapshot(data, time.monotonic() - age, refreshed_at, duration)
+                self._sections = {**self._sections, name: section}
+                self._errors.pop(name, None)
+            if age < self._ttls[name]:
+                return False
+        # Не получили аренду - секцию обновляет другой воркер, пока читаем прежнюю версию
+        return await asyncio.to_thread(self._shared.acquire, key)  # type: ignore
+
+    async def refresh(self, name: str) -> None:
+        """Перечитывает одну секцию и атомарно подменяет её в снимке"""
+        if self._shared is not None and not await self._adopt_shared(name):
+            return
+
+        started = time.monotonic()
+        try:
+            async with self._pool.connection() as conn:
+                data = await SECTION_LOADERS[name](conn)
+        except Exception as e:
+            self._errors[name] = str(e)
+            logger.error(f"Failed to refresh context section {name}: {e}")
+            if self._shared is not None:
+                await asyncio.to_thread(self._shared.release, self._shared_key(name))
+            return
+
+        finished = time.monotonic()
+        section = SectionSnapshot(
+            data=data,
+            loaded_at=finished,
+            refreshed_at=datetime.now(timezone.utc),
+            duration=finished - started
+        )
+        # Подменяем словарь целиком: читатели всегда видят согласованный снимок
+        self._sections = {**self._sections, name: section}
+        self._errors.pop(name, None)
+        if self._shared is not None:
+            await asyncio.to_thread(
+                self._shared.put, self._shared_key(name), (data, section.refreshed_at, section.duration)
+            )
+
+    def _next_refresh(self, name: str) -> float:
+        ttl = self._ttls[name]
+        if self._shared is None:
+            return ttl
+        # Секция из общего кэша могла прийти не новой - проверяем, когда она устареет
+        section = self._sections.get(name)
+        retry = min(ttl, 1.0)
+        return max(ttl - (time.monotonic() - section.loaded_at), retry) if section else retry
+
+    async def _refresh_loop(self, name: str) -> None:
+        while True:
+            await asyncio.sleep(self._next_refresh(name))
+            await self.refresh(name)
+
+    def get(self) -> Dict[str, Any]:
+        """Текущий контекст БД из памяти"""
+        sections = self._sections
+        return {name: section.data for name, section in sections.items()}
+
+    def section(self, name: str) -> Optional[Any]:
+        """Данные одной секции или None, если она ещё не загружена"""
+        section = self._sections.get(name)
+        return section.data if section else None
+
+    def status(self) -> Dict[str, Dict[str, Optional[Any]]]:
+        """Устаревание и время обновления по каждой секции"""
+        sections = self._sections
+        now = time.monotonic()
+        status = {}
+        for name, ttl in self._ttls.items():
+            section = sections.get(name)
+            status[name] = {
+                "ttl": ttl,
+                "age": now - section.loaded_at if section else None,
+                "stale": section is None or now - section.loaded_at > ttl,
+                "refreshed_at": section.refreshed_at if section else None,
+                "refresh_duration": section.duration if section else None,
+                "last_error": self._errors.get(name),
+            }
+        return status
+
+
+CONTEXT_TTLS = {
+    "settings": settings.CONTEXT_TTL_SETTINGS,
+    "table_stats": settings.CONTEXT_TTL_TABLE_STATS,
+    "index_stats": settings.CONTEXT_TTL_INDEX_STATS,
+    "io_stats": settings.CONTEXT_TTL_IO_STATS,
+    "activity": settings.CONTEXT_TTL_ACTIVITY,
+}
+
+context_snapshot = ContextSnapshotService(pool, CONTEXT_TTLS, shared_cache)
@@ -0,0 +1,160 @@
+import csv
+import io
+import re
+from typing import Dict, List, Optional, Tuple
+
+from psycopg import AsyncConnection
+
+from core.analysis.analyzer import SQLAnalyzer
+from core.models.lint_request import LintRequests
+from core.models.workload import (
+    WorkloadFinding,
+    WorkloadReport,
+    WorkloadStatement,
+    WorkloadStatementReport,
+)
+
+ORDER_COLUMNS = {"total": "total_time_ms", "mean": "mean_time_ms"}
+
+# Только выражения, для которых можно получить план; служебные (SET, BEGIN, ...) пропускаются
+_EXPLAINABLE_RE = re.compile(r"^\s*(select|with|insert|update|delete|values|table)\b", re.IGNORECASE)
+
+
+async def read_pg_stat_statements(
+    connection: AsyncConnection,
+    order_by: str = "total",
+    limit: int = 50
+) -> Tuple[List[WorkloadStatement], float]:
+    """
+    Топ запросов текущей БД из pg_stat_statements по общему или среднему времени
+    и суммарное время всей нагрузки в мс
+    """
+    async with connection.cursor() as cur:
+        await cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'")
+        if await cur.fetchone() is None:
+            raise ValueError("pg_stat_statements extension is not installed in this database")
+
+        # До PostgreSQL 13 колонки назывались total_time и mean_time
+        total, mean = (
+            ("total_exec_time", "mean_exec_time")
+            if connection.info.server_version >= 130000
+            else ("total_time", "mean_time")
+        )
+        dbid = "(SELECT oid FROM pg_database WHERE datname = current_database())"
+
+        # Суммарное время - по всей нагрузке БД, до отбора объяснимых выражений
+        await cur.execute(f"SELECT coalesce(sum({total}), 0) FROM pg_stat_statements WHERE dbid = {dbid}")  # nosec B608
+        row = await cur.fetchone()
+        workload_time = float(row[0]) if row else 0.0
+
+        # Имена колонок выбираются из констант выше, limit передаётся параметром.
+        # \y в регулярных выражениях PostgreSQL - граница слова, как \b в _EXPLAINABLE_RE
+        await cur.execute(f"""
+            SELECT queryid::text, query, calls, {total}, {mean}, rows
+            FROM pg_stat_statements
+            WHERE dbid = {dbid}
+              AND query ~* '^\\s*(select|with|insert|update|delete|values|table)\\y'
+            ORDER BY {total if order_by == "total" else mean} DESC
+            LIMIT %(limit)s
+        """, {"limit": limit})  # nosec B608
+
+        statements = []
+        async for row in cur:
+            statements.append(WorkloadStatement(
+                queryid=row[0],
+                query=row[1],
+                calls=row[2],
+                total_time_ms=row[3],
+                mean_time_ms=row[4],
+                rows=row[5]
+            ))
+        return statements, workload_time
+
+
+def read_statements_csv(
+    text: str,
+    order_by: str = "total",
+    limit: int = 50
+) -> Tuple[List[WorkloadStatement], float]:
+    """
+    То же из CSV-выгрузки pg_stat_statements (\\copy ... WITH CSV HEADER).
+    Нужны колонки query, calls и total_exec_time (или total_time).
+    На некорректных данных - ValueError с номером строки
+    """
+    statements = []
+    workload_time = 0.0
+    reader = csv.DictReader(io.StringIO(text))
+    try:
+        for row in reader:
+            total_time = float(row.get("total_exec_time") or row.get("total_time") or 0.0)
+            workload_time += total_time
+            query = row.get("query") or ""
+            if not _EXPLAINABLE_RE.match(query):
+                continue
+            calls = int(row.get("calls") or 0)
+            mean_time = row.get("mean_exec_time") or row.get("mean_time")
+            statements.append(WorkloadStatement(
+                queryid=row.get("queryid") or None,
+                query=query,
+                calls=calls,
+                total_time_ms=total_time,
+                mean_time_ms=float(mean_time) if mean_time else (total_time / calls if calls else 0.0),
+                rows=int(row["rows"]) if row.get("rows") else None
+            ))
+    except (csv.Error, ValueError) as e:
+        raise ValueError(f"Invalid CSV at line {reader.line_num}: {e}") from e
+
+    statements.sort(key=lambda statement: getattr(statement, ORDER_COLUMNS[order_by]), reverse=True)
+    return statements[:limit], workload_time
+
+
+async def analyze_workload(
+    analyzer: SQLAnalyzer,
+    statements: List[WorkloadStatement],
+    workload_time: float,
+    order_by: str = "total",
+    concurrency: Optional[int] = None
+) -> WorkloadReport:
+    """
+    Анализирует запросы нагрузки параллельно и взвешивает каждую диагностику
+    временем запросов, в которых она найдена
+    """
+    results = await analyzer.analyze_many(
+        LintRequests(sql_query=[statement.query for statement in statements]),
+        concurrency=concurrency
+    )
+
+    def share(time_ms: float) -> float:
+        return time_ms / workload_time if workload_time > 0 else 0.0
+
+    reports = []
+    findings: Dict[Tuple[Optional[str], str, str], WorkloadFinding] = {}
+    for rank, (statement, result) in enumerate(zip(statements, results), start=1):
+        reports.append(WorkloadStatementReport.model_construct(
+            rank=rank,
+            share=share(statement.total_time_ms),
+            result=result,
+            **statement.model_dump()
+        ))
+
+        # Одна и та же диагностика в запросе учитывается один раз
+        for key in {(d.rule, d.severity, d.message) for d in result.lint_diagnoses}:
+            finding = findings.get(key)
+            if finding is None:
+                finding = findings[key] = WorkloadFinding(
+                    rule=key[0], severity=key[1], message=key[2],
+                    statements=0, affected_time_ms=0.0, share=0.0
+                )
+            finding.statements += 1
+            finding.affected_time_ms += statement.total_time_ms
+
+    for finding in findings.values():
+        finding.share = share(finding.affected_time_ms)
+
+    return WorkloadReport.model_construct(
+        order_by=order_by,
+        workload_time_ms=workload_time,
+        analyzed_time_ms=sum(statement.total_time_ms for statement in statements),
+        findings=sorted(findings.values(), key=lambda finding: finding.affected_time_ms, reverse=True),
+        statements=reports
+    )
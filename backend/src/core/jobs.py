@@ -0,0 +1,440 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.admission import DeadlineExceeded, is_transient
+from core.metrics import metrics
+from core.models.analysis_result import AnalysisResult
+from core.models.job import JobResultItem, JobStatus
+from core.models.lint_request import LintRequests
+from core.settings import settings
+from core.targets import Target, targets
+from utils.logger import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    target TEXT NOT NULL,
+    trace INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    owner TEXT,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    claimed_at REAL,
+    claimed_done INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    sql_query TEXT NOT NULL,
+    result TEXT,
+    PRIMARY KEY (job_id, position)
+) WITHOUT ROWID;
+"""
+
+_STATUS_COLUMNS = (
+    "id, target, state, total, done, failed, created_at, started_at, finished_at, claimed_at, claimed_done, error"
+)
+
+jobs_finished_total = metrics.counter(
+    "sql_analysis_jobs_finished_total", "Bulk jobs that stopped, by final state", ("state",)
+)
+
+
+def _timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value, timezone.utc) if value is not None else None
+
+
+def _status(row: tuple) -> JobStatus:
+    job_id, target, state, total, done, failed, created_at, started_at, finished_at, claimed_at, claimed_done, error = row
+    eta = None
+    # Скорость считается по текущему запуску: после возобновления старые результаты не в счёт
+    if state == "running" and claimed_at is not None and done > claimed_done:
+        rate = (done - claimed_done) / max(time.time() - claimed_at, 1e-3)
+        eta = (total - done) / rate
+    return JobStatus(
+        id=job_id,
+        target=target,
+        state=state,
+        total=total,
+        done=done,
+        failed=failed,
+        created_at=datetime.fromtimestamp(created_at, timezone.utc),
+        started_at=_timestamp(started_at),
+        finished_at=_timestamp(finished_at),
+        eta_seconds=eta,
+        error=error
+    )
+
+
+class JobStore:
+    """
+    Задания bulk-анализа и их результаты в SQLite-файле: переживают перезапуск
+    и общие для всех воркеров uvicorn. Задание обрабатывает тот, кто взял его
+    в аренду; аренда продлевается, пока обработчик жив.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Соединение SQLite нельзя наследовать через fork - открываем своё в каждом процессе
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            db.executescript(_SCHEMA)
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def create(self, target: str, sql_queries: List[str], trace: bool) -> JobStatus:
+        job_id = uuid.uuid4().hex
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO jobs (id, target, trace, state, total, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, target, int(trace), len(sql_queries), time.time())
+            )
+            db.executemany(
+                "INSERT INTO items (job_id, position, sql_query) VALUES (?, ?, ?)",
+                ((job_id, position, sql_query) for position, sql_query in enumerate(sql_queries))
+            )
+        return self.get(job_id)  # type: ignore
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        with self._lock:
+            # Список колонок - константа модуля, id передаётся параметром
+            row = self._connection().execute(
+                f"SELECT {_STATUS_COLUMNS} FROM jobs WHERE id = ?", (job_id,)  # nosec B608
+            ).fetchone()
+        return _status(row) if row else None
+
+    def results(self, job_id: str, offset: int, limit: int) -> List[JobResultItem]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT position, sql_query, result FROM items WHERE job_id = ? AND position >= ? "
+                "ORDER BY position LIMIT ?",
+                (job_id, offset, limit)
+            ).fetchall()
+        return [
+            JobResultItem(
+                position=position,
+                sql_query=sql_query,
+                result=AnalysisResult.model_validate_json(result) if result is not None else None
+            )
+            for position, sql_query, result in rows
+        ]
+
+    def claim(self, owner: str, lease_seconds: float) -> Optional[Tuple[str, str, bool]]:
+        """
+        Берёт в аренду самое старое задание в очереди или задание, чей
+        обработчик перестал продлевать аренду. Возвращает id, цель и trace
+        """
+        now = time.time()
+        with self._transaction() as db:
+            # RETURNING нужно дочитать до COMMIT
+            rows = db.execute("""
+                UPDATE jobs SET
+                    state = 'running', owner = ?, lease_until = ?,
+                    started_at = coalesce(started_at, ?), claimed_at = ?, claimed_done = done
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE state = 'queued' OR (state = 'running' AND lease_until < ?)
+                    ORDER BY created_at LIMIT 1
+                )
+                RETURNING id, target, trace
+            """, (owner, now + lease_seconds, now, now, now)).fetchall()
+        return rows[0] if rows else None
+
+    def extend(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Продлевает аренду; False - задание отменено или перешло к другому обработчику"""
+        with self._transaction() as db:
+            return db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND state = 'running'",
+                (time.time() + lease_seconds, job_id, owner)
+            ).rowcount == 1
+
+    def pending(self, job_id: str, after: int, limit: int) -> List[Tuple[int, str]]:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT position, sql_query FROM items WHERE job_id = ? AND position > ? AND result IS NULL "
+                "ORDER BY position LIMIT ?",
+                (job_id, after, limit)
+            ).fetchall()
+
+    def save(self, job_id: str, owner: str, results: List[Tuple[int, str, bool]]) -> bool:
+        """
+        Сохраняет результаты (позиция, JSON, ошибка ли). Возвращает, продолжать ли
+        обработку: False - задание отменено или перешло к другому обработчику
+        """
+        with self._transaction() as db:
+            saved = failed = 0
+            for position, result, is_error in results:
+                # Результат, уже записанный другим обработчиком, не перезаписываем и не считаем
+                if db.execute(
+                    "UPDATE items SET result = ? WHERE job_id = ? AND position = ? AND result IS NULL",
+                    (result, job_id, position)
+                ).rowcount:
+                    saved += 1
+                    failed += is_error
+            db.execute("UPDATE jobs SET done = done + ?, failed = failed + ? WHERE id = ?", (saved, failed, job_id))
+            row = db.execute("SELECT owner, state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row == (owner, "running")
+
+    def finish(self, job_id: str, owner: str, state: str, error: Optional[str] = None) -> None:
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET state = ?, error = ?, finished_at = ?, owner = NULL, lease_until = NULL "
+                "WHERE id = ? AND owner = ? AND state = 'running'",
+                (state, error, time.time(), job_id, owner)
+            )
+
+    def release(self, job_id: str, owner: str) -> None:
+        """Возвращает задание в очередь, например при остановке воркера"""
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET state = 'queued', owner = NULL, lease_until = NULL "
+                "WHERE id = ? AND owner = ? AND state = 'running'",
+                (job_id, owner)
+            )
+
+    def cancel(self, job_id: str) -> bool:
+        with self._transaction() as db:
+            return db.execute(
+                "UPDATE jobs SET state = 'cancelled', finished_at = ?, owner = NULL, lease_until = NULL "
+                "WHERE id = ? AND state IN ('queued', 'running')",
+                (time.time(), job_id)
+            ).rowcount == 1
+
+    def resume(self, job_id: str) -> bool:
+        """Возвращает в очередь отменённое или упавшее задание; готовые результаты сохраняются"""
+        with self._transaction() as db:
+            return db.execute(
+                "UPDATE jobs SET state = 'queued', error = NULL, finished_at = NULL "
+                "WHERE id = ? AND state IN ('cancelled', 'failed')",
+                (job_id,)
+            ).rowcount == 1
+
+    def prune(self, older_than: float) -> int:
+        """Удаляет завершённые задания, закончившиеся раньше older_than (time.time())"""
+        with self._transaction() as db:
+            expired = [row[0] for row in db.execute(
+                "SELECT id FROM jobs WHERE state IN ('done', 'cancelled', 'failed') AND finished_at < ?",
+                (older_than,)
+            )]
+            for job_id in expired:
+                db.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+                db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return len(expired)
+
+
+class JobRunner:
+    """
+    Фоновые обработчики заданий внутри приложения. Задание анализируется
+    порциями по JOB_CHUNK_SIZE запросов не больше чем на JOB_CONCURRENCY
+    соединениях пула цели, остальная ёмкость пула остаётся интерактивным запросам.
+    После каждой порции результаты сохраняются, поэтому после падения или
+    отмены задание продолжается с необработанных запросов.
+    """
+
+    def __init__(self, store: JobStore):
+        self.store = store
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self._current: Dict[str, asyncio.Task] = {}
+
+    @property
+    def running(self) -> int:
+        return len(self._current)
+
+    def start(self) -> None:
+        # Владелец - процесс: при запуске нескольких воркеров uvicorn у каждого свой
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        if settings.JOB_RETENTION > 0:
+            pruned = self.store.prune(time.time() - settings.JOB_RETENTION)
+            if pruned:
+                logger.info(f"Pruned {pruned} finished jobs")
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"job-worker-{i}")
+            for i in range(settings.JOB_WORKERS)
+        ]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, target: str, sql_queries: List[str], trace: bool) -> JobStatus:
+        job = await asyncio.to_thread(self.store.create, target, sql_queries, trace)
+        self._wakeup.set()
+        return job
+
+    async def cancel(self, job_id: str) -> bool:
+        """
+        Отменяет задание в очереди или в работе. Обработчик в этом процессе
+        прерывается сразу, в другом - при следующем продлении аренды
+        """
+        if not await asyncio.to_thread(self.store.cancel, job_id):
+            return False
+        jobs_finished_total.inc("cancelled")
+        self._interrupt(job_id)
+        return True
+
+    async def resume(self, job_id: str) -> bool:
+        if not await asyncio.to_thread(self.store.resume, job_id):
+            return False
+        self._wakeup.set()
+        return True
+
+    def _interrupt(self, job_id: str) -> None:
+        task = self._current.get(job_id)
+        if task is not None:
+            task.cancel()
+
+    async def _work(self) -> None:
+        while True:
+            self._wakeup.clear()
+            claimed = await asyncio.to_thread(self.store.claim, self.owner, settings.JOB_LEASE)
+            if claimed is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.JOB_POLL_INTERVAL)
+                except TimeoutError:
+                    pass
+                continue
+
+            job_id, target_name, trace = claimed
+            task = asyncio.create_task(self._run(job_id, target_name, bool(trace)), name=f"job-{job_id}")
+            self._current[job_id] = task
+            try:
+                await asyncio.wait([task])
+            except asyncio.CancelledError:
+                # Остановка приложения: задание возвращается в очередь и продолжится после запуска
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await asyncio.to_thread(self.store.release, job_id, self.owner)
+                raise
+            finally:
+                self._current.pop(job_id, None)
+            if task.cancelled():
+                logger.info(f"Job {job_id} cancelled")
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE / 3)
+            if not await asyncio.to_thread(self.store.extend, job_id, self.owner, settings.JOB_LEASE):
+                # Задание отменили через другой воркер
+                self._interrupt(job_id)
+                return
+
+    async def _run(self, job_id: str, target_name: str, trace: bool) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            target = await targets.get(target_name)
+            with target.in_use():
+                concurrency = max(1, min(settings.JOB_CONCURRENCY, target.max_connections))
+                after = -1
+                while True:
+                    chunk = await asyncio.to_thread(self.store.pending, job_id, after, settings.JOB_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if not await self._run_chunk(job_id, target, trace, concurrency, chunk):
+                        return
+                    after = chunk[-1][0]
+            await asyncio.to_thread(self.store.finish, job_id, self.owner, "done")
+            jobs_finished_total.inc("done")
+            logger.info(f"Job {job_id} done")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = getattr(e, "detail", None) or str(e)
+            logger.error(f"Job {job_id} failed: {error}")
+            await asyncio.to_thread(self.store.finish, job_id, self.owner, "failed", error)
+            jobs_finished_total.inc("failed")
+        finally:
+            heartbeat.cancel()
+
+
+    async def _run_chunk(
+        self,
+        job_id: str,
+        target: Target,
+        trace: bool,
+        concurrency: int,
+        chunk: List[Tuple[int, str]]
+    ) -> bool:
+        """
+        Анализ порции с сохранением результатов. Запросы, не проанализированные из-за
+        перегрузки, дедлайна или недоступности БД, повторяются с нарастающей паузой.
+        Если БД так и не стала доступна, задание завершается с ошибкой, а эти запросы
+        остаются без результата - resume проанализирует их. Запрос, который превышает
+        дедлайн при каждой попытке, сохраняется с ошибкой. False - задание отменено.
+        """
+        pending = chunk
+        for attempt in range(settings.JOB_RETRIES + 1):
+            errors: Dict[str, Exception] = {}
+            results = await target.analyzer.analyze_many(
+                # Запросы проверены при создании задания
+                LintRequests.model_construct(sql_query=[sql_query for _, sql_query in pending]),
+                trace,
+                concurrency,
+                errors=errors
+            )
+            last_attempt = attempt == settings.JOB_RETRIES
+            saved, retry = [], []
+            for (position, sql_query), result in zip(pending, results):
+                error = errors.get(sql_query)
+                if error is not None and is_transient(error) and not (last_attempt and isinstance(error, DeadlineExceeded)):
+                    retry.append((position, sql_query))
+                else:
+                    saved.append((position, result.model_dump_json(), result.error is not None))
+            if saved and not await asyncio.to_thread(self.store.save, job_id, self.owner, saved):
+                return False
+            if not retry:
+                return True
+            if last_attempt:
+                raise RuntimeError(
+                    f"{len(retry)} queries could not be analyzed: {errors[retry[0][1]]}. Resume the job to retry them"
+                )
+            delay = settings.JOB_RETRY_BACKOFF * 2 ** attempt
+            logger.warning(f"Job {job_id}: retrying {len(retry)} queries in {delay:g}s: {errors[retry[0][1]]}")
+            await asyncio.sleep(delay)
+            pending = retry
+        return True
+
+
+job_store = JobStore(settings.JOBS_PATH)
+jobs = JobRunner(job_store)
+
+metrics.gauge(
+    "sql_analysis_jobs_running", "Bulk jobs processed by this worker right now",
+    lambda: jobs.running
+)
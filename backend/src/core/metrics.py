@@ -0,0 +1,193 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # по меткам: счётчики попаданий в каждый бакет (последний - +Inf), сумма
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            counts, total = self._values.setdefault(label_values, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, float("inf")), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    labels = _format_labels(self.labels, label_values, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {total[0]}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Значение читается в момент отдачи метрик"""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.read()}"]
+
+
+class MetricsRegistry:
+    """Метрики процесса в текстовом формате Prometheus; запись потокобезопасна"""
+
+    def __init__(self):
+        self._metrics: List[object] = []
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, read: Callable[[], float]) -> Gauge:
+        metric = Gauge(name, help, read)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())  # type: ignore
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    "sql_analysis_stage_seconds", "Time spent in each analysis stage", ("stage",)
+)
+rule_seconds = metrics.histogram(
+    "sql_analysis_rule_seconds", "Time spent in each rule function", ("rule",)
+)
+rule_errors = metrics.counter(
+    "sql_analysis_rule_errors_total", "Rule functions that raised", ("rule",)
+)
+pool_wait_seconds = metrics.histogram(
+    "sql_analysis_pool_wait_seconds", "Time waiting for a pool connection"
+)
+analyses_total = metrics.counter(
+    "sql_analysis_queries_total", "Analyzed queries by outcome", ("outcome",)
+)
+slow_analyses_total = metrics.counter(
+    "sql_analysis_slow_queries_total", "Analyses slower than SLOW_ANALYSIS_THRESHOLD"
+)
+
+
+class Timings:
+    """
+    Разбивка времени анализа одного запроса по стадиям и правилам.
+    Стадии-ожидания (очередь пула процессов) показываются, но не входят в active
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.rules: Dict[str, float] = {}
+        self.waiting = 0.0
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float, wait: bool = False) -> None:
+        """Время стадии, измеренное отдельно (например, в другом процессе)"""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        stage_seconds.observe(seconds, name)
+        if wait:
+            self.waiting += seconds
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def active(self) -> float:
+        """Время анализа без ожидания в очередях"""
+        return self.elapsed - self.waiting
+
+    def summary(self, top_rules: int = 3) -> str:
+        parts = [f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.stages.items()]
+        slowest = sorted(self.rules.items(), key=lambda item: item[1], reverse=True)[:top_rules]
+        if slowest:
+            parts.append("slowest rules: " + ", ".join(
+                f"{name}={seconds * 1000:.1f}ms" for name, seconds in slowest
+            ))
+        return "; ".join(parts)
+
+
+def record_pool_wait(seconds: float, timings: Optional[Timings] = None) -> None:
+    """Учёт ожидания соединения из пула"""
+    pool_wait_seconds.observe(seconds)
+    if timings is not None:
+        timings.stages["pool_wait"] = timings.stages.get("pool_wait", 0.0) + seconds
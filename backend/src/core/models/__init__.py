@@ -1,10 +1,31 @@
 from .analysis_result import AnalysisResult
+from .execution_comparison import ExecutionComparison, ExecutionStats
+from .index_advice import BulkIndexAdvice, IndexRecommendation
+from .job import JobResultItem, JobResults, JobStatus
 from .lint_diagnose import LintDiagnose
 from .lint_request import LintRequest
+from .plan_regression import PlanChange, PlanRegression, PlanRegressionReport
+from .rule_trace import RuleTrace
+from .workload import WorkloadFinding, WorkloadReport, WorkloadStatement, WorkloadStatementReport
 
 __all__ = [
     LintRequest,
     LintDiagnose,
-    AnalysisResult
+    AnalysisResult,
+    RuleTrace,
+    ExecutionComparison,
+    ExecutionStats,
+    WorkloadStatement,
+    WorkloadStatementReport,
+    WorkloadFinding,
+    WorkloadReport,
+    IndexRecommendation,
+    BulkIndexAdvice,
+    JobStatus,
+    JobResultItem,
+    JobResults,
+    PlanChange,
+    PlanRegression,
+    PlanRegressionReport
 ]
 
@@ -1,10 +1,20 @@
 from pydantic import BaseModel
 
-from typing import List
+from typing import List, Optional
 
+from core.models.execution_comparison import ExecutionComparison
 from core.models.lint_diagnose import LintDiagnose
+from core.models.rule_trace import RuleTrace
 
 
 class AnalysisResult(BaseModel):
     lint_diagnoses: List[LintDiagnose] # Only errors with available fixes
     summary_recommendation: str # IDEA: generate summary with AI
+    error: Optional[str] = None # Set when the query could not be analyzed (bulk only)
+    rules_trace: Optional[List[RuleTrace]] = None # Which rules ran or were skipped, on request
+    comparison: Optional[ExecutionComparison] = None # Measured original vs rewritten query, on request
+
+
+class StreamAnalysisResult(AnalysisResult):
+    index: int # Position of the query in the input stream
+    request_id: Optional[str] = None
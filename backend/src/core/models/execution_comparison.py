@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+
+from typing import Optional
+
+
+class ExecutionStats(BaseModel):
+    runs: int
+    median_ms: float # Execution Time из EXPLAIN ANALYZE, медиана по запускам
+    min_ms: float
+    planning_ms: float # медиана Planning Time
+    shared_hit_blocks: int # буферы последнего запуска
+    shared_read_blocks: int
+    temp_blocks: int # temp read + temp written
+
+
+class ExecutionComparison(BaseModel):
+    original: Optional[ExecutionStats] = None
+    rewritten: Optional[ExecutionStats] = None
+    speedup: Optional[float] = None # original.median_ms / rewritten.median_ms
+    verdict: str # faster | same | slower | failed
+    rewrite_accepted: bool
+    error: Optional[str] = None
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+
+from typing import List, Optional
+
+from core.models.analysis_result import AnalysisResult
+
+
+class IndexRecommendation(BaseModel):
+    relation: str
+    columns: List[str]
+    statement: str # CREATE INDEX для применения
+    queries: int # Сколько запросов пачки получат пользу
+    total_cost: float # Сумма Total Cost планов этих запросов
+    table_rows: Optional[int] = None # n_live_tup из table_stats
+    merged: List[List[str]] # Исходные кандидаты, объединённые в этот индекс
+
+
+class BulkIndexAdvice(BaseModel):
+    indexes: List[IndexRecommendation] # По убыванию total_cost
+    covered: int # Кандидатов, уже покрытых существующими индексами
+    results: List[AnalysisResult]
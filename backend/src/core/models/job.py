@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from core.models.analysis_result import AnalysisResult
+
+JobState = Literal["queued", "running", "done", "cancelled", "failed"]
+
+
+class JobStatus(BaseModel):
+    id: str
+    target: str
+    state: JobState
+    total: int # Запросов в задании
+    done: int # Из них проанализировано
+    failed: int # Из них с ошибкой анализа (error в результате)
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    eta_seconds: Optional[float] = None # Оценка по скорости текущего запуска
+    error: Optional[str] = None # Почему задание остановилось (state = failed)
+
+
+class JobResultItem(BaseModel):
+    position: int # Номер запроса во входной пачке
+    sql_query: str
+    result: Optional[AnalysisResult] = None # None - ещё не проанализирован
+
+
+class JobResults(BaseModel):
+    job: JobStatus
+    offset: int
+    items: List[JobResultItem]
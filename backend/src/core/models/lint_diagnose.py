@@ -8,3 +8,4 @@ class LintDiagnose(BaseModel):
     severity: str  # = Field(regex="^(HIGH|MEDIUM|LOW)$")
     message: str
     recommendation: Optional[str]
+    rule: Optional[str] = None # Rule that produced the diagnose, filled in by analyze_with_rules
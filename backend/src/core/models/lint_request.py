@@ -1,10 +1,12 @@
-from typing import List
+import json
+from typing import List, Optional
 
 from pydantic import BaseModel, Field, field_validator
 
 
 class LintRequest(BaseModel):
     sql_query: str = Field(..., example="SELECT * FROM users WHERE email = 'a@b.com'")
+    request_id: Optional[str] = None # Echoed back by the streaming endpoint
 
     @field_validator("sql_query")
     def sql_not_empty(cls, v):
@@ -23,3 +25,11 @@ class LintRequests(BaseModel):
             if not v or not v.strip():
                 raise ValueError("SQL must be non-empty")
         return fv
+
+
+def parse_ndjson_line(line: str) -> LintRequest:
+    """Строка NDJSON: объект вида {"sql_query": ..., "request_id": ...} или просто строка с SQL"""
+    data = json.loads(line)
+    if isinstance(data, str):
+        data = {"sql_query": data}
+    return LintRequest.model_validate(data)
@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+
+from typing import List, Literal, Optional
+
+from core.models.analysis_result import AnalysisResult
+
+
+class PlanChange(BaseModel):
+    kind: Literal["cost", "scan", "join"]
+    relation: Optional[str] = None # Для kind = scan
+    before: Optional[str] = None # None - в базовом плане не было
+    after: Optional[str] = None # None - в текущем плане нет
+    regression: bool # Изменение к худшему
+    message: str
+
+
+class PlanRegression(BaseModel):
+    fingerprint: str
+    sql_query: str # Первый запрос пачки с этим отпечатком
+    queries: int # Сколько запросов пачки с этим отпечатком
+    baseline_cost: float # Total Cost корня базового плана
+    cost: float
+    baseline_rows: float # Plan Rows корня базового плана
+    rows: float
+    changes: List[PlanChange] # Все структурные изменения, не только ухудшения
+
+
+class PlanRegressionReport(BaseModel):
+    regressions: List[PlanRegression] # По убыванию роста стоимости
+    checked: int # Отпечатков, сравнённых с базой
+    new: int # Отпечатков без сохранённой базы
+    updated: int # Сколько баз записано (update_baseline)
+    results: List[AnalysisResult]
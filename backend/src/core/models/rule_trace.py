@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+
+class RuleTrace(BaseModel):
+    rule: str
+    executed: bool
+    reason: str
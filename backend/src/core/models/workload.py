@@ -0,0 +1,37 @@
+from pydantic import BaseModel
+
+from typing import List, Optional
+
+from core.models.analysis_result import AnalysisResult
+
+
+class WorkloadStatement(BaseModel):
+    queryid: Optional[str] = None
+    query: str
+    calls: int
+    total_time_ms: float
+    mean_time_ms: float
+    rows: Optional[int] = None
+
+
+class WorkloadStatementReport(WorkloadStatement):
+    rank: int
+    share: float # Доля времени всей нагрузки, которую занимает запрос
+    result: AnalysisResult
+
+
+class WorkloadFinding(BaseModel):
+    rule: Optional[str]
+    severity: str
+    message: str
+    statements: int # Сколько запросов из топа затронуто
+    affected_time_ms: float # Суммарное время этих запросов
+    share: float # Доля времени всей нагрузки
+
+
+class WorkloadReport(BaseModel):
+    order_by: str
+    workload_time_ms: float # Время всех запросов нагрузки, не только проанализированных
+    analyzed_time_ms: float
+    findings: List[WorkloadFinding] # По убыванию затронутого времени
+    statements: List[WorkloadStatementReport]
@@ -1,18 +1,47 @@
+from core.metrics import metrics
 from core.settings import settings
+from psycopg.conninfo import make_conninfo
 from psycopg_pool import AsyncConnectionPool
-from utils.logger import logger
 
-pool = AsyncConnectionPool(
-    f"host={settings.DB_HOSTNAME} dbname={settings.DB_NAME} user={settings.DB_USERNAME} password={settings.DB_PASSWORD}",
-    open=False,
-    min_size=1
-)
 
-async def get_conn():
-    if pool.closed:
-        logger.warning("Pool is closed. Opening it...")
-        await pool.open()
-        await pool.wait()
+def create_pool(conninfo: str, min_size: int, max_size: int) -> AsyncConnectionPool:
+    """Пул с общими для всех целевых БД лимитами очереди, ожидания и statement_timeout"""
+    return AsyncConnectionPool(
+        # make_conninfo экранирует значения и пропускает незаданные (None)
+        make_conninfo(
+            conninfo,
+            # Страховка на стороне сервера, если клиентская отмена по дедлайну не дошла
+            options=f"-c statement_timeout={int(settings.ANALYSIS_DEADLINE * 1000)}"
+        ),
+        open=False,
+        min_size=min_size,
+        max_size=max_size,
+        max_waiting=settings.DB_POOL_MAX_WAITING,
+        timeout=settings.DB_POOL_TIMEOUT,
+        max_idle=settings.DB_POOL_MAX_IDLE
+    )
+
+
+pool = create_pool(
+    make_conninfo(
+        host=settings.DB_HOSTNAME,
+        dbname=settings.DB_NAME,
+        user=settings.DB_USERNAME,
+        password=settings.DB_PASSWORD
+    ),
+    min_size=settings.DB_POOL_MIN_SIZE,
+    max_size=settings.DB_POOL_MAX_SIZE
+)
 
-    async with pool.connection() as conn:
-        yield conn
+metrics.gauge(
+    "sql_analysis_pool_size", "Open connections in the pool",
+    lambda: pool.get_stats().get("pool_size", 0)
+)
+metrics.gauge(
+    "sql_analysis_pool_available", "Idle connections in the pool",
+    lambda: pool.get_stats().get("pool_available", 0)
+)
+metrics.gauge(
+    "sql_analysis_pool_waiting", "Requests queued for a connection",
+    lambda: pool.get_stats().get("requests_waiting", 0)
+)
@@ -1,12 +1,117 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
+# Каталог приложения (с main.py): /app в образе, backend/src при локальном запуске
+APP_DIR = Path(__file__).resolve().parents[1]
+
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
-    DB_NAME: str
-    DB_USERNAME: str
-    DB_PASSWORD: str
+    # Не обязательны: офлайн-анализ по снимку (cli.py --snapshot) работает без БД
+    DB_NAME: Optional[str] = None
+    DB_USERNAME: Optional[str] = None
+    DB_PASSWORD: Optional[str] = None
     DB_HOSTNAME: str = "postgres"
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    # Максимум запросов в очереди за соединением (0 - без ограничения); сверх - 429
+    DB_POOL_MAX_WAITING: int = 64
+    # Сколько секунд ждать соединение из пула; дольше - 429
+    DB_POOL_TIMEOUT: float = 10.0
+    # Простаивающие дольше соединения закрываются (пул не опускается ниже DB_POOL_MIN_SIZE)
+    DB_POOL_MAX_IDLE: float = 600.0
+    # Дополнительные целевые БД: имя -> DSN (JSON в переменной окружения), выбираются параметром target
+    DB_TARGETS: Dict[str, str] = {}
+    # Размер пула каждой дополнительной БД
+    DB_TARGET_POOL_MAX_SIZE: int = 4
+    # Лимит соединений всех пулов вместе; при нехватке закрывается давно не использованный пул
+    DB_TARGETS_MAX_CONNECTIONS: int = 100
+    # Пул дополнительной БД закрывается после стольких секунд без запросов
+    DB_TARGET_IDLE_TIMEOUT: float = 600.0
+    # Retry-After (в секундах) в ответе 429
+    OVERLOAD_RETRY_AFTER: int = 2
+    # Дедлайн анализа одного запроса в секундах (0 - без дедлайна); он же statement_timeout соединений
+    ANALYSIS_DEADLINE: float = 30.0
+
+    # Размер LRU-кэша планов EXPLAIN (0 - кэш выключен)
+    PLAN_CACHE_SIZE: int = 1024
+    # Подготовленных выражений для запросов с параметрами на одном соединении (PostgreSQL до 16)
+    PREPARED_STATEMENTS_PER_CONNECTION: int = 256
+
+    # SQLite-файл кэша контекста и планов, общего для воркеров на хосте (не задан - кэш только в процессе)
+    SHARED_CACHE_PATH: Optional[str] = None
+    SHARED_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    # Сколько секунд запись считается обновляемой воркером, взявшим аренду, если он не ответил
+    SHARED_CACHE_LEASE: float = 30.0
+
+    # Максимум одновременно анализируемых запросов в bulk
+    ANALYSIS_CONCURRENCY: int = 8
+    # Запросов одного отпечатка на одном соединении; большие группы делятся и анализируются параллельно
+    ANALYSIS_GROUP_SIZE: int = 16
+    # Максимум запросов потокового bulk, принятых, но ещё не отправленных клиенту
+    STREAM_WINDOW: int = 256
+
+    # SQLite-файл результатов для инкрементального bulk-анализа (не задан - всё анализируется заново)
+    RESULT_STORE_PATH: Optional[str] = None
+    RESULT_STORE_MAX_ENTRIES: int = 1_000_000
+
+    # SQLite-файл базовых метрик планов по отпечаткам для проверки регрессий планов
+    PLAN_BASELINE_PATH: Optional[str] = None
+    # Регрессия, если Total Cost плана вырос больше чем во столько раз
+    PLAN_REGRESSION_COST_RATIO: float = 2.0
+    # Рост стоимости дешёвых планов (меньше этой стоимости) не считается регрессией
+    PLAN_REGRESSION_MIN_COST: float = 100.0
+
+    # Фоновые задания bulk-анализа: SQLite-файл заданий и результатов.
+    # Относительный путь - от каталога приложения, а не от текущего каталога процесса
+    JOBS_PATH: str = "jobs.db"
+    # Сколько заданий один воркер обрабатывает одновременно
+    JOB_WORKERS: int = 1
+    # Соединений пула на одно задание (не больше размера пула цели)
+    JOB_CONCURRENCY: int = 4
+    # Запросов в порции: после каждой порции результаты сохраняются
+    JOB_CHUNK_SIZE: int = 100
+    JOB_MAX_QUERIES: int = 100_000
+    # Повторы запросов, не проанализированных из-за перегрузки или недоступности БД, и пауза перед первым
+    JOB_RETRIES: int = 3
+    JOB_RETRY_BACKOFF: float = 1.0
+    # Аренда задания в секундах: если обработчик не продлил её, задание берёт другой воркер
+    JOB_LEASE: float = 60.0
+    JOB_POLL_INTERVAL: float = 2.0
+    # Завершённые задания удаляются через столько секунд (0 - хранятся всегда)
+    JOB_RETENTION: float = 7 * 24 * 3600
+
+    # Анализ дольше порога (в секундах) пишется в лог с разбивкой по стадиям (0 - выключено)
+    SLOW_ANALYSIS_THRESHOLD: float = 1.0
+
+    # Сравнение исходного и переписанного запроса через EXPLAIN (ANALYZE, BUFFERS)
+    COMPARE_RUNS: int = 5
+    COMPARE_STATEMENT_TIMEOUT_MS: int = 5000
+    # Разница медиан меньше этой доли считается шумом
+    COMPARE_TOLERANCE: float = 0.05
+
+    # Как часто (в секундах) проверять изменения модулей правил и перезагружать их (0 - выключено)
+    RULES_RELOAD_INTERVAL: float = 2.0
+    # Путь к манифесту правил (кэш списка правил по модулям); по умолчанию - во временном
+    # каталоге: каталог установленного пакета в образе может быть только для чтения
+    RULES_MANIFEST: str = os.path.join(tempfile.gettempdir(), "sql-analysis-rules-manifest.json")
+
+    # TTL (в секундах) для фонового обновления секций контекста БД
+    CONTEXT_TTL_SETTINGS: float = 300.0
+    CONTEXT_TTL_TABLE_STATS: float = 60.0
+    CONTEXT_TTL_INDEX_STATS: float = 60.0
+    CONTEXT_TTL_IO_STATS: float = 60.0
+    CONTEXT_TTL_ACTIVITY: float = 5.0
+
+    @field_validator("JOBS_PATH")
+    @classmethod
+    def _resolve_jobs_path(cls, value: str) -> str:
+        return str(APP_DIR / value) if not os.path.isabs(value) else value
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,216 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from fastapi import Depends, HTTPException
+from psycopg_pool import AsyncConnectionPool, PoolTimeout, TooManyRequests
+
+from core.analysis.analyzer import SQLAnalyzer
+from core.analysis.plan_cache import PlanCache, plan_cache
+from core.analysis.shared_cache import shared_cache
+from core.analysis.snapshot import CONTEXT_TTLS, ContextSnapshotService, context_snapshot
+from core.metrics import metrics, record_pool_wait
+from core.pool import create_pool, pool
+from core.settings import settings
+from utils.logger import logger
+
+DEFAULT_TARGET = "default"
+
+
+class Target:
+    """Целевая БД: свой пул, снимок контекста, кэш планов и анализатор"""
+
+    def __init__(
+        self,
+        name: str,
+        pool: AsyncConnectionPool,
+        context_snapshot: ContextSnapshotService,
+        plan_cache: PlanCache
+    ):
+        self.name = name
+        self.pool = pool
+        self.context_snapshot = context_snapshot
+        self.plan_cache = plan_cache
+        self.analyzer = SQLAnalyzer(pool=pool, context_snapshot=context_snapshot, plan_cache=plan_cache)
+        self.active = 0
+        self.last_used = time.monotonic()
+        self._snapshot_start: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def open(cls, name: str, dsn: str) -> "Target":
+        target_pool = create_pool(dsn, min_size=1, max_size=settings.DB_TARGET_POOL_MAX_SIZE)
+        await target_pool.open()
+        try:
+            await target_pool.wait(timeout=settings.DB_POOL_TIMEOUT)
+        except PoolTimeout:
+            await target_pool.close()
+            raise HTTPException(status_code=503, detail=f"Target database {name} is unavailable")
+
+        target = cls(
+            name,
+            target_pool,
+            # Кэш общий для воркеров, записи каждой цели - в своём пространстве имён
+            ContextSnapshotService(target_pool, CONTEXT_TTLS, shared_cache, name),
+            PlanCache(settings.PLAN_CACHE_SIZE, shared_cache, name)
+        )
+        # Пока снимок не загружен, контекст читается лениво из каталога
+        target._snapshot_start = asyncio.create_task(target.context_snapshot.start())
+        logger.info(f"Target {name} opened")
+        return target
+
+    @property
+    def max_connections(self) -> int:
+        return self.pool.max_size
+
+    @contextmanager
+    def in_use(self) -> Iterator[None]:
+        """Пока цель используется запросом, её пул не закрывается"""
+        self.active += 1
+        self.last_used = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.last_used = time.monotonic()
+
+    async def close(self) -> None:
+        if self._snapshot_start is not None:
+            self._snapshot_start.cancel()
+            await asyncio.gather(self._snapshot_start, return_exceptions=True)
+        await self.context_snapshot.stop()
+        await self.pool.close()
+        logger.info(f"Target {self.name} closed")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "active_requests": self.active,
+            "idle_seconds": time.monotonic() - self.last_used,
+            "context_ready": self.context_snapshot.ready,
+            "pool": self.pool.get_stats(),
+        }
+
+
+class TargetRegistry:
+    """
+    Пулы целевых БД, создаются при первом обращении. Сумма max_size всех пулов
+    не превышает DB_TARGETS_MAX_CONNECTIONS: при нехватке закрываются давно
+    не использованные цели без активных запросов. Цели, простаивающие дольше
+    DB_TARGET_IDLE_TIMEOUT, закрываются в фоне. Цель по умолчанию не закрывается.
+    """
+
+    def __init__(self, default: Target):
+        self.default = default
+        self._targets: OrderedDict[str, Target] = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._reaper: Optional[asyncio.Task] = None
+
+    @property
+    def total_connections(self) -> int:
+        return self.default.max_connections + sum(t.max_connections for t in self._targets.values())
+
+    @property
+    def open_count(self) -> int:
+        return 1 + len(self._targets)
+
+    def names(self) -> List[str]:
+        return [DEFAULT_TARGET, *sorted(settings.DB_TARGETS)]
+
+    async def get(self, name: Optional[str] = None) -> Target:
+        if not name or name == DEFAULT_TARGET:
+            return self.default
+
+        target = self._targets.get(name)
+        if target is None:
+            if name not in settings.DB_TARGETS:
+                raise HTTPException(status_code=404, detail=f"Unknown target database: {name}")
+            async with self._lock:
+                target = self._targets.get(name)
+                if target is None:
+                    await self._make_room(settings.DB_TARGET_POOL_MAX_SIZE)
+                    target = await Target.open(name, settings.DB_TARGETS[name])
+                    self._targets[name] = target
+
+        self._targets.move_to_end(name)
+        target.last_used = time.monotonic()
+        return target
+
+    async def _make_room(self, connections: int) -> None:
+        """Закрывает давно не использованные цели, пока новый пул не поместится в лимит"""
+        while self.total_connections + connections > settings.DB_TARGETS_MAX_CONNECTIONS:
+            victim = next((t for t in self._targets.values() if t.active == 0), None)
+            if victim is None:
+                raise TooManyRequests("All target database pools are busy")
+            await self._evict(victim)
+
+    async def _evict(self, target: Target) -> None:
+        # Сначала убираем из реестра: новые запросы цель уже не получат
+        del self._targets[target.name]
+        await target.close()
+
+    async def _reap_idle(self) -> None:
+        interval = max(1.0, min(60.0, settings.DB_TARGET_IDLE_TIMEOUT / 2))
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for target in list(self._targets.values()):
+                if target.active == 0 and now - target.last_used > settings.DB_TARGET_IDLE_TIMEOUT:
+                    async with self._lock:
+                        if self._targets.get(target.name) is target and target.active == 0:
+                            await self._evict(target)
+
+    def start(self) -> None:
+        self._reaper = asyncio.create_task(self._reap_idle(), name="target-reaper")
+
+    async def close(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+        for target in list(self._targets.values()):
+            await self._evict(target)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "total_connections": self.total_connections,
+            "max_connections": settings.DB_TARGETS_MAX_CONNECTIONS,
+            "targets": {
+                name: self.default.status() if name == DEFAULT_TARGET else (
+                    self._targets[name].status() if name in self._targets else None
+                )
+                for name in self.names()
+            },
+        }
+
+
+# Цель по умолчанию - БД из настроек DB_*, её пулом и снимком управляет lifespan
+default_target = Target(DEFAULT_TARGET, pool, context_snapshot, plan_cache)
+targets = TargetRegistry(default_target)
+
+metrics.gauge(
+    "sql_analysis_target_pools", "Open target database pools",
+    lambda: targets.open_count
+)
+metrics.gauge(
+    "sql_analysis_target_connections", "Connections reserved by all target pools (sum of max_size)",
+    lambda: targets.total_connections
+)
+
+
+async def get_target(target: Optional[str] = None) -> AsyncIterator[Target]:
+    """Зависимость FastAPI: целевая БД из параметра запроса target"""
+    resolved = await targets.get(target)
+    with resolved.in_use():
+        yield resolved
+
+
+async def get_conn(target: Target = Depends(get_target)):
+    if target.pool.closed:
+        logger.warning("Pool is closed. Opening it...")
+        await target.pool.open()
+        await target.pool.wait()
+
+    started = time.perf_counter()
+    async with target.pool.connection() as conn:
+        record_pool_wait(time.perf_counter() - started)
+        yield conn
@@ -1,29 +1,41 @@
 from contextlib import asynccontextmanager
 
+from api.metrics import metrics
 from api.v1.router import v1
+from core.admission import install_admission_handlers
+from core.analysis.rules import registry as rule_registry
+from core.analysis.snapshot import context_snapshot
+from core.jobs import jobs
 from core.pool import pool
+from core.settings import settings
+from core.targets import targets
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from utils.logger import logger
 
-stats_cache = None
-
-
 
 # TODO: Refactor: move lifespan manager to lifespan.py
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Application starting up...")
-    global stats_cache
     await pool.open()
     await pool.wait()
     logger.info("Pool opened")
+    await context_snapshot.start()
+    targets.start()
+    rule_registry.start(settings.RULES_RELOAD_INTERVAL)
+    jobs.start()
 
     yield
     logger.info("Application shutdown initiated.")
     logger.info("Application shutting down...")
     try:
         logger.info("Gracefully stopping...")
+        # Незавершённые задания возвращаются в очередь до закрытия пулов
+        await jobs.stop()
+        await rule_registry.stop()
+        await targets.close()
+        await context_snapshot.stop()
         logger.info("Closing pool...")
         await pool.close()
     except Exception as e:
@@ -31,9 +43,11 @@ async def lifespan(app: FastAPI):
 
 
 app = FastAPI(lifespan=lifespan)
+install_admission_handlers(app)
 
 # including routers
 app.include_router(v1)
+app.include_router(metrics)
 
 
 # убрать при деплое
@@ -0,0 +1,76 @@
+from core.analysis.index_advisor import advise_indexes, candidates_from_plan
+from core.analysis.plan_index import PlanIndex
+
+
+def _seq_scan(filter_expr: str, cost: float = 1000.0, relation: str = "users") -> PlanIndex:
+    return PlanIndex({"Plan": {
+        "Node Type": "Seq Scan",
+        "Relation Name": relation,
+        "Total Cost": cost,
+        "Plan Rows": 10,
+        "Filter": filter_expr,
+    }})
+
+
+def test_index_candidate_ignores_casts():
+    [candidate] = candidates_from_plan(_seq_scan("((status)::text = 'active'::text)"))
+    assert candidate.equality == frozenset({"status"})
+
+
+def test_index_candidate_skips_or():
+    assert candidates_from_plan(_seq_scan("((a = 1) OR (b = 2))")) == []
+    [candidate] = candidates_from_plan(_seq_scan("((a = 1) AND ((b = 2) OR (c = 3)))"))
+    assert candidate.equality == frozenset({"a"})
+
+
+def test_advise_merges_candidates_served_by_one_index():
+    plans = {
+        "q1": (_seq_scan("(a = 1)", cost=100.0), 2),
+        "q2": (_seq_scan("((a = 1) AND (b = 2))", cost=300.0), 1),
+        "q3": (_seq_scan("((b = 2) AND (a = 1) AND (d = 3))", cost=50.0), 1),
+        "q4": (_seq_scan("(x = 1)", cost=10.0, relation="orders"), 1),
+    }
+    recommendations, covered = advise_indexes(plans, [], {"public.users": {"row_count": 5000}})
+
+    assert covered == 0
+    [merged, orders] = recommendations
+    # Узкие кандидаты вливаются в самый широкий, который их обслуживает
+    assert merged.merged == [["a", "b", "d"], ["a", "b"], ["a"]]
+    # a нужна всем трём кандидатам, b - двум: они в начале индекса
+    assert merged.columns == ["a", "b", "d"]
+    assert merged.statement == "CREATE INDEX CONCURRENTLY ON users (a, b, d);"
+    assert merged.queries == 4
+    assert merged.total_cost == 100.0 * 2 + 300.0 + 50.0
+    assert merged.table_rows == 5000
+    assert orders.columns == ["x"] and orders.table_rows is None
+
+
+def test_advise_keeps_range_candidates_apart():
+    plans = {
+        "q1": (_seq_scan("((a = 1) AND (b = 2))", cost=300.0), 1),
+        "q2": (_seq_scan("((a = 1) AND (c > 5))", cost=500.0), 1),
+    }
+    recommendations, _ = advise_indexes(plans, [], {})
+    # Индекс (a, b) не сужает поиск по диапазону c - рекомендаций две, по убыванию стоимости
+    assert [r.columns for r in recommendations] == [["a", "c"], ["a", "b"]]
+
+
+def test_advise_skips_covered_candidates():
+    plans = {
+        "q1": (_seq_scan("(a = 1)"), 1),
+        "q2": (_seq_scan("((b = 2) AND (a = 1))"), 1),
+        "q3": (_seq_scan("((a = 1) AND (c > 5))"), 1),
+    }
+    index_stats = [
+        {"table": "users", "columns": ["b", "a"]},
+        {"table": "orders", "columns": ["a", "c"]},
+    ]
+    recommendations, covered = advise_indexes(plans, index_stats, {})
+    # (b, a) покрывает только (a, b): для a = 1 он начинается не с той колонки
+    assert covered == 1
+    assert [r.merged for r in recommendations] == [[["a", "c"], ["a"]]]
+
+    index_stats.append({"table": "users", "columns": ["a", "c", "d"]})
+    recommendations, covered = advise_indexes(plans, index_stats, {})
+    assert covered == 3
+    assert recommendations == []
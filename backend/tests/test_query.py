@@ -0,0 +1,20 @@
+import pytest
+import sqlparse
+from sqlparse.exceptions import SQLParseError
+
+from core.analysis.query import ParsedQuery
+
+
+def test_parse_error_is_cached(monkeypatch):
+    calls = []
+
+    def parse(sql):
+        calls.append(sql)
+        raise SQLParseError("Maximum number of tokens exceeded (10000).")
+
+    monkeypatch.setattr(sqlparse, "parse", parse)
+    query = ParsedQuery("SELECT 1")
+    for _ in range(3):
+        with pytest.raises(SQLParseError):
+            query.statements
+    assert len(calls) == 1
@@ -0,0 +1,27 @@
+from core.analysis.plan_index import PlanIndex
+from core.analysis.rules.custom.seq_scan_rule import extract_filter_columns, rule_seq_scan_optimizer
+
+
+def _seq_scan(filter_expr: str) -> PlanIndex:
+    return PlanIndex({"Plan": {
+        "Node Type": "Seq Scan",
+        "Relation Name": "users",
+        "Total Cost": 1000.0,
+        "Plan Rows": 10,
+        "Filter": filter_expr,
+    }})
+
+
+def test_filter_columns_ignore_casts():
+    assert extract_filter_columns("((status)::text = 'active'::text)") == ["status"]
+    assert extract_filter_columns(
+        "(((email)::character varying = 'a@b.c'::character varying) AND (created_at > '2024-01-01'::timestamp without time zone))"
+    ) == ["email", "created_at"]
+
+
+def test_seq_scan_recommends_cast_column():
+    query = "SELECT * FROM users WHERE status = 'active'"
+    diagnoses, _ = rule_seq_scan_optimizer(query, _seq_scan("((status)::text = 'active'::text)"), {})
+    assert len(diagnoses) == 1
+    assert diagnoses[0].recommendation.endswith(": status")
+